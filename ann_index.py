@@ -0,0 +1,250 @@
+"""Approximate nearest-neighbour (IVF) search over the face gallery
+
+The gallery vectors are split into `nlist` clusters with k-means. A query
+only scans the rows of its `nprobe` closest clusters, then the shortlist is
+re-ranked with exact float32 distances from the gallery matrix.
+
+Run this file directly for a recall-versus-latency report:
+
+    python ann_index.py --database face_database/face_database.db
+    python ann_index.py --synthetic 50000
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+
+def _sq_distances(a, b, b_sq_norms=None):
+    """Squared euclidean distances between rows of a and rows of b"""
+    if b_sq_norms is None:
+        b_sq_norms = np.einsum('ij,ij->i', b, b)
+    a_sq = np.einsum('ij,ij->i', a, a)
+    sq = a_sq[:, None] + b_sq_norms[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(sq, 0, out=sq)
+
+
+def _assign(vectors, centroids, chunk=8192):
+    """Nearest centroid per vector, chunked to bound memory"""
+    c_norms = np.einsum('ij,ij->i', centroids, centroids)
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        block = vectors[start:start + chunk]
+        out[start:start + chunk] = np.argmin(_sq_distances(block, centroids, c_norms), axis=1)
+    return out
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Plain Lloyd k-means, returns float32 centroids"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k).astype(np.float32)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a FaceGallery"""
+
+    def __init__(self, gallery, nlist=None, nprobe=16, train_size=20000,
+                 iterations=10, rebuild_factor=2.0, seed=0):
+        self.gallery = gallery
+        self.requested_nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.rebuild_factor = rebuild_factor
+        self.seed = seed
+
+        self.centroids = None
+        self.lists = []
+        self.trained_size = 0
+        self.build()
+
+    def _default_nlist(self, n):
+        return int(np.clip(4 * np.sqrt(n), 1, 4096))
+
+    def build(self):
+        """(Re)train centroids and fill the inverted lists"""
+        vectors = self.gallery.vectors
+        n = len(vectors)
+        if n == 0:
+            self.centroids = None
+            self.lists = []
+            self.trained_size = 0
+            return
+
+        nlist = self.requested_nlist or self._default_nlist(n)
+        rng = np.random.default_rng(self.seed)
+        if n > self.train_size:
+            sample = vectors[rng.choice(n, self.train_size, replace=False)]
+        else:
+            sample = vectors
+        self.centroids = kmeans(sample, nlist, self.iterations, self.seed)
+
+        labels = _assign(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.trained_size = n
+
+    def on_add(self, start, end):
+        """Index gallery rows [start, end) appended by add_person"""
+        if self.centroids is None or end > self.rebuild_factor * self.trained_size:
+            self.build()
+            return
+        labels = _assign(self.gallery.matrix[start:end], self.centroids)
+        for row, label in zip(range(start, end), labels):
+            self.lists[label] = np.append(self.lists[label], np.int32(row))
+
+    def on_remove(self, keep):
+        """Follow the gallery's order-preserving compaction"""
+        if self.centroids is None:
+            return
+        remap = (np.cumsum(keep) - 1).astype(np.int32)
+        self.lists = [remap[rows[keep[rows]]] for rows in self.lists]
+
+    def candidates(self, query, nprobe=None):
+        """Gallery rows stored in the nprobe closest lists"""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        c_dist = _sq_distances(query[None, :], self.centroids)[0]
+        probe = np.argpartition(c_dist, nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[i] for i in probe])
+
+    def search(self, queries, nprobe=None):
+        """Best (row, distance) per query, row is -1 when nothing was found"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        dists = np.full(len(queries), np.inf, dtype=np.float32)
+        if self.centroids is None:
+            return rows, dists
+
+        for i, query in enumerate(queries):
+            cand = self.candidates(query, nprobe)
+            if len(cand) == 0:
+                continue
+            # Exact float32 rerank of the shortlist
+            sq = _sq_distances(query[None, :], self.gallery.matrix[cand],
+                               self.gallery.sq_norms[cand])[0]
+            best = int(np.argmin(sq))
+            rows[i] = cand[best]
+            dists[i] = np.sqrt(sq[best])
+        return rows, dists
+
+
+def recall_latency_report(gallery, queries, nprobes=(1, 2, 4, 8, 16, 32, 64), tolerance=0.6):
+    """Compare IVF settings against the exact scan, returns a list of dicts"""
+    queries = np.asarray(queries, dtype=np.float32)
+
+    def exact(q):
+        d = gallery.distances(q)[0]
+        row = int(np.argmin(d))
+        return row, float(d[row])
+
+    exact_times = []
+    truth = []
+    for q in queries:
+        t0 = time.perf_counter()
+        truth.append(exact(q))
+        exact_times.append(time.perf_counter() - t0)
+    exact_ms = 1000 * np.median(exact_times)
+
+    def decision(row, dist):
+        if row < 0 or dist > tolerance:
+            return None
+        return int(gallery.ids[row])
+
+    index = gallery.ann or IVFIndex(gallery)
+    rows_report = []
+    for nprobe in nprobes:
+        times, hits, agree = [], 0, 0
+        for q, (t_row, t_dist) in zip(queries, truth):
+            t0 = time.perf_counter()
+            rows, dists = index.search(q[None, :], nprobe=nprobe)
+            times.append(time.perf_counter() - t0)
+            hits += int(rows[0] == t_row)
+            agree += int(decision(rows[0], dists[0]) == decision(t_row, t_dist))
+        p50 = 1000 * np.median(times)
+        rows_report.append({
+            'nprobe': nprobe,
+            'recall_at_1': hits / len(queries),
+            'decision_agreement': agree / len(queries),
+            'p50_ms': p50,
+            'p95_ms': 1000 * np.percentile(times, 95),
+            'speedup': exact_ms / p50 if p50 > 0 else float('inf'),
+        })
+    return exact_ms, rows_report
+
+
+def main():
+    from gallery import FaceGallery, make_synthetic_faces
+
+    parser = argparse.ArgumentParser(description="IVF recall vs latency report")
+    parser.add_argument("--database", help="face_database.db (or legacy .pkl) to index")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic people")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    args = parser.parse_args()
+
+    if args.database and args.database.endswith('.pkl'):
+        with open(args.database, 'rb') as f:
+            registered_faces = pickle.load(f)
+    elif args.database:
+        from storage import FaceStore
+        registered_faces = FaceStore(args.database).load_all()
+    else:
+        registered_faces = make_synthetic_faces(args.synthetic or 10000)
+
+    gallery = FaceGallery.from_registered_faces(registered_faces)
+    if len(gallery) == 0:
+        print("❌ Gallery is empty!")
+        return
+
+    t0 = time.perf_counter()
+    gallery.enable_ann(nlist=args.nlist)
+    build_s = time.perf_counter() - t0
+
+    # Half genuine probes (stored samples + noise), half impostors
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(gallery), args.queries, replace=True)
+    queries = gallery.vectors[rows] + rng.normal(0, 0.02, (args.queries, gallery.vectors.shape[1]))
+    impostors = rng.random(args.queries) < 0.5
+    queries[impostors] = rng.normal(0, 0.06, (int(impostors.sum()), gallery.vectors.shape[1]))
+
+    exact_ms, report = recall_latency_report(gallery, queries, args.nprobe, args.tolerance)
+
+    print("\n" + "="*70)
+    print(f"📈 IVF RECALL vs LATENCY | {len(gallery)} vectors, "
+          f"{len(gallery.ann.centroids)} lists, build {build_s:.1f}s")
+    print("="*70)
+    print(f"Exact scan p50: {exact_ms:.3f} ms")
+    print(f"{'nprobe':<8} {'recall@1':<10} {'agreement':<11} {'p50 ms':<9} {'p95 ms':<9} {'speedup':<8}")
+    print("-"*70)
+    for row in report:
+        print(f"{row['nprobe']:<8} {row['recall_at_1']:<10.3f} {row['decision_agreement']:<11.3f} "
+              f"{row['p50_ms']:<9.3f} {row['p95_ms']:<9.3f} {row['speedup']:<8.1f}")
+    print("="*70)
+
+    good = [row for row in report if row['decision_agreement'] >= 0.99]
+    if good:
+        print(f"✅ Suggested nprobe: {good[0]['nprobe']} (>= 99% same decision as exact @ {args.tolerance})")
+    else:
+        print("⚠️ No setting reached 99% agreement, use exact search or a larger nprobe")
+
+
+if __name__ == "__main__":
+    main()
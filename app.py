@@ -1,28 +1,151 @@
-import cv2 # open-cv for computer vision tasks
-import face_recognition
+import time
+_IMPORT_START = time.perf_counter()
+
 import numpy as np
-import pickle
 import os
 from datetime import datetime
 from pathlib import Path
-import time
+import argparse
+import atexit
+import signal
+import threading
+
+from attendance_writer import AttendanceWriter
+from compact_gallery import CompactGallery
+from collections import deque
+from cooldown import Cooldowns
+from gallery import FaceGallery
+from tracker import FaceTracker, FrameOrder
+from storage import FaceStore
+from attendance_index import AttendanceIndex, print_report
+from metrics import COUNT_BUCKETS, JsonDumper, MetricsRegistry, MetricsServer
+
+# The vision stack (OpenCV, dlib models) is only needed to register/verify,
+# load_vision() imports it on first use or from the warm-up thread
+cv2 = None
+face_recognition = None
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+STARTUP_PHASES = ('import', 'database', 'gallery', 'constructor', 'vision_import', 'warmup')
+
+# Registration keeps the best samples out of a larger set of good-quality frames,
+# no two of them near-duplicates (see quality.pick_diverse)
+REGISTRATION_SAMPLES = 5
+REGISTRATION_CANDIDATES = 40  # give up after this many without enough distinct samples
+REGISTRATION_SPACING = 0.15  # seconds between candidates
+REGISTRATION_MIN_GAP = 1.0  # seconds between kept samples with the same pose
 
 class ProFaceAttendanceSystem:
-    def __init__(self):
+    def __init__(self, search_mode="exact", ann_nprobe=16, detection_budget_ms=60,
+                 camera_sources=None, headless=False, quality_gate=True, motion_gate=True,
+                 idle_fps=5.0, quantize="int8", rerank=32, shards=None, partition="hash",
+                 fsync="batch", crowd_workers=0, record_path=None, replay_speed="original"):
+        t0 = time.perf_counter()
+        self.startup_times = {'import': IMPORT_SECONDS}
         self.data_dir = "face_database"
         self.attendance_dir = "attendance_logs"
         Path(self.data_dir).mkdir(exist_ok=True)
         Path(self.attendance_dir).mkdir(exist_ok=True)
         
-        self.database_file = os.path.join(self.data_dir, "face_encodings.pkl")
-        self.registered_faces = self.load_database()
+        self.database_file = os.path.join(self.data_dir, "face_database.db")
+        self.legacy_database_file = os.path.join(self.data_dir, "face_encodings.pkl")
+        self.store = FaceStore(self.database_file, legacy_pickle=self.legacy_database_file)
+        
+        # People metadata only: the menu needs names and counts, not vectors
+        self.search_mode = search_mode
+        self.gallery_dir = os.path.join(self.data_dir, "gallery")
+        self.registered_faces = self.load_database(encodings=False)
+        self.startup_times['database'] = time.perf_counter() - t0
+        
+        # Vectorized gallery of all registered encodings, built in the background
+        # (started at the end of __init__); self.gallery waits for it on first use
+        self.gallery_options = {'quantize': quantize, 'rerank': rerank, 'shards': shards,
+                                'partition': partition, 'ann_nprobe': ann_nprobe}
+        self.match_tolerance = 0.6
+        self.ann_min_vectors = 20000  # approximate (IVF) search for very large galleries
+        self._gallery = None
+        self.gallery_thread = None
+        self.gallery_error = None
         
-        # Today's attendance cache
+        # Today's attendance cache, switched by roll_day() after midnight.
+        # clock() is the wall clock of the attendance rules (soak runs drive it)
+        self.clock = time.time
+        self.attendance_day = self.get_today()
         self.today_attendance = self.load_today_attendance()
+        # Attendance sets of other days marked from recordings (batch.py)
+        self.other_days_attendance = {}
         
-        # For smoothing detection
-        self.last_detection_time = {}
+        # Indexed attendance history, opened on first report
+        self.attendance_index = None
+        
+        # For smoothing detection (expiring, so weeks of uptime keep them small)
         self.detection_cooldown = 3  # seconds
+        self.message_interval = 10  # seconds between "already attended" prints
+        self.last_detection_time = Cooldowns(ttl=self.detection_cooldown)
+        self.last_shown_message = Cooldowns(ttl=self.message_interval)
+        self.stop_requested = False
+        
+        # (roll_no, seconds from first frame to check-in) of recent check-ins
+        self.checkin_latency = deque(maxlen=1024)
+        
+        # Guards attendance state shared by recognition workers
+        self.lock = threading.RLock()
+        self.recognition_workers = 2
+        
+        # Track faces so identities are not re-encoded on every frame
+        self.tracker = FaceTracker(reverify_interval=5.0)
+        # Detection order when tracking is off
+        self.frame_order = FrameOrder()
+        
+        # Downscaled/ROI detection tuned to a per-frame time budget (built by load_vision)
+        self.detector = None
+        self.detection_budget_ms = detection_budget_ms
+        
+        # Size/blur/brightness/pose check before encoding (built by load_vision)
+        self.use_quality_gate = quality_gate
+        self.quality_gate = None
+        
+        # Capture sources, more than one switches verification to multi-camera
+        self.camera_sources = camera_sources or [0]
+        # Save verification sessions to .frec recordings, pace .frec sources on replay
+        self.record_path = record_path
+        self.replay_speed = replay_speed
+        self.recorders = []
+        
+        # Skip detection on empty scenes and slow capture to idle_fps meanwhile
+        self.motion_gate = motion_gate
+        self.idle_fps = idle_fps
+        
+        # Stage latencies and counters, served by start_metrics()
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge('gallery_vectors', lambda: len(self._gallery), help_text="encodings in the gallery")
+        self.metrics.gauge('registered_people', lambda: len(self.registered_faces), help_text="registered people")
+        self.metrics.gauge('attendance_today', lambda: len(self.today_attendance), help_text="people marked today")
+        self.metrics_exporters = []
+        
+        # Log lines and check-in rows are written by a background thread
+        self.attendance_writer = AttendanceWriter(self.store, self.metrics, fsync=fsync)
+        atexit.register(self.attendance_writer.close)
+        for phase in STARTUP_PHASES:
+            self.metrics.gauge('startup_seconds', lambda phase=phase: self.startup_times[phase],
+                               labels={'phase': phase}, help_text="startup time per phase")
+        
+        # Cached HUD layers (built by load_display); headless units skip drawing entirely
+        self.headless = headless
+        self.verify_hud = None
+        self.register_hud = None
+        self.display_lock = threading.Lock()
+        
+        # Vision stack loading/warm-up, see start_warmup()
+        self.vision_lock = threading.Lock()
+        self.crowd_workers = crowd_workers
+        self.crowd = None
+        self.warmup_thread = None
+        self.vision_error = None
+        
+        # Last, once every attribute the build thread touches (lock, store) exists
+        self.start_gallery()
+        self.startup_times['constructor'] = time.perf_counter() - t0
         
         # Display startup banner
         self.show_startup_banner()
@@ -41,28 +164,208 @@ class ProFaceAttendanceSystem:
         print("="*70)
         print(f"📊 Total Registered Users: {len(self.registered_faces)}")
         print(f"📅 Today's Attendance: {len(self.today_attendance)}")
+        print(f"⏱️ Startup: {self.startup_times['import'] + self.startup_times['constructor']:.2f}s "
+              f"(database {self.startup_times['database']:.2f}s)")
         print("="*70)
     
+    def load_display(self):
+        """Import OpenCV and build the HUD layers (once), all that drawing needs"""
+        global cv2
+        with self.display_lock:
+            if self.verify_hud is not None:
+                return
+            import cv2 as cv2_module
+            from overlay import HudRenderer
+            cv2 = cv2_module
+            self.verify_hud = HudRenderer(header_h=140, footer_h=80)
+            self.register_hud = HudRenderer(header_h=150, footer_h=60, shade_footer=False)
+    
+    def load_vision(self):
+        """Import OpenCV/face_recognition and build the detector and HUDs (once)"""
+        global cv2, face_recognition
+        with self.vision_lock:
+            if self.detector is not None:
+                return
+            t0 = time.perf_counter()
+            self.load_display()
+            import face_recognition as face_recognition_module  # loads the dlib models
+            from detection import AdaptiveDetector
+            from quality import QualityGate
+            face_recognition = face_recognition_module
+            
+            if self.use_quality_gate:
+                self.quality_gate = QualityGate()
+            
+            self.detector = AdaptiveDetector(budget_ms=self.detection_budget_ms)
+            if self.crowd_workers:
+                # Every worker loads its own copy of the dlib models
+                from crowd import CrowdEncoder
+                self.crowd = CrowdEncoder(workers=self.crowd_workers)
+                atexit.register(self.crowd.close)
+            self.startup_times['vision_import'] = time.perf_counter() - t0
+    
+    def _build_gallery(self):
+        t0 = time.perf_counter()
+        options = self.gallery_options
+        try:
+            if self.search_mode == "quantized":
+                # Maps the compact gallery files, the encodings are only read to rebuild them
+                version = self.store.encodings_version()
+                gallery = CompactGallery.open(self.gallery_dir, version, rerank=options['rerank'])
+                if gallery is None:
+                    print("📦 Building compact gallery...")
+                    gallery = CompactGallery.build(self.gallery_dir, self.store.load_all(), version,
+                                                   dtype=options['quantize'], rerank=options['rerank'])
+            else:
+                full = self.store.load_all()
+                with self.lock:
+                    for roll_no, data in self.registered_faces.items():
+                        if roll_no in full:
+                            data['encodings'] = full[roll_no]['encodings']
+                if self.search_mode == "sharded":
+                    # Worker processes scanning shared-memory shards of the gallery
+                    from sharded_gallery import ShardedGallery
+                    gallery = ShardedGallery.from_registered_faces(self.registered_faces, options['shards'],
+                                                                   options['partition'])
+                else:
+                    gallery = FaceGallery.from_registered_faces(self.registered_faces)
+                    if self.search_mode == "ivf":
+                        gallery.enable_ann(min_size=self.ann_min_vectors, nprobe=options['ann_nprobe'])
+            self._gallery = gallery
+            self.startup_times['gallery'] = time.perf_counter() - t0
+        except Exception as e:  # reported when the gallery is actually needed
+            self.gallery_error = e
+    
+    def start_gallery(self):
+        """Load the encodings and build the gallery in the background"""
+        if self.gallery_thread is None:
+            self.gallery_thread = threading.Thread(target=self._build_gallery, name="gallery-build",
+                                                   daemon=True)
+            self.gallery_thread.start()
+    
+    def ensure_gallery(self):
+        """Wait for the gallery; a failed build is retried on the next call"""
+        if self._gallery is not None:
+            return self._gallery
+        self.start_gallery()
+        if self.gallery_thread.is_alive():
+            print("⏳ Loading face gallery...")
+            self.gallery_thread.join()
+        if self.gallery_error is not None:
+            error, self.gallery_error, self.gallery_thread = self.gallery_error, None, None
+            raise error
+        return self._gallery
+    
+    @property
+    def gallery(self):
+        return self.ensure_gallery()
+    
+    def _warmup(self):
+        try:
+            self.load_vision()
+            t0 = time.perf_counter()
+            # One detection and one encoding pass so the first live frame has no cold start
+            from detection import detect_scaled
+            frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+            detect_scaled(frame, scale=0.5, upsample=0)
+            face_recognition.face_encodings(frame, [(260, 740, 460, 540)])
+            self.startup_times['warmup'] = time.perf_counter() - t0
+        except Exception as e:  # reported when vision is actually needed
+            self.vision_error = e
+    
+    def start_warmup(self):
+        """Load and warm up the vision stack in the background (menu stays responsive)"""
+        if self.warmup_thread is None:
+            self.warmup_thread = threading.Thread(target=self._warmup, name="vision-warmup", daemon=True)
+            self.warmup_thread.start()
+    
+    def ensure_vision(self):
+        """Wait for the vision stack before a register/verify session
+        
+        A failed load is raised once and retried on the next call (e.g. after
+        the missing package was installed or the camera driver came back).
+        """
+        self.start_warmup()
+        if self.warmup_thread.is_alive():
+            print("⏳ Loading face models...")
+            self.warmup_thread.join()
+        if self.vision_error is not None:
+            error, self.vision_error, self.warmup_thread = self.vision_error, None, None
+            raise error
+    
+    def start_metrics(self, port=0, json_path=None, interval=10.0):
+        """Serve /metrics on localhost and/or dump JSON snapshots periodically"""
+        if port:
+            server = MetricsServer(self.metrics, port=port).start()
+            self.metrics_exporters.append(server)
+            print(f"📡 Metrics: http://127.0.0.1:{server.port}/metrics")
+        if json_path:
+            self.metrics_exporters.append(JsonDumper(self.metrics, json_path, interval).start())
+            print(f"📡 Metrics snapshot every {interval:.0f}s → {json_path}")
+    
+    def stop_metrics(self):
+        for exporter in self.metrics_exporters:
+            exporter.stop()
+        self.metrics_exporters = []
+    
     def save_database(self):
-        """Save face encodings"""
-        with open(self.database_file, 'wb') as f:
-            pickle.dump(self.registered_faces, f)
+        """Save all face encodings (full rewrite, prefer row updates)"""
+        if self.search_mode == "quantized":
+            raise RuntimeError("registered_faces holds no encodings in quantized mode, "
+                               "use store.save_person()")
+        self.ensure_gallery()  # fills in the encodings
+        self.store.save_all(self.registered_faces)
     
-    def load_database(self):
+    def load_database(self, encodings=True):
         """Load face encodings"""
-        if os.path.exists(self.database_file):
-            with open(self.database_file, 'rb') as f:
-                return pickle.load(f)
-        return {}
+        return self.store.load_all(encodings)
     
-    def get_today_log_file(self):
+    def close_gallery(self):
+        """Stop the shard workers of a sharded gallery (and the crowd encoders)
+        
+        A compact gallery folds its delta into a new generation here, so the
+        next start maps one set of files.
+        """
+        if self.search_mode == "sharded":
+            self.gallery.close()
+        elif self.search_mode == "quantized":
+            self.gallery.compact(self.store.encodings_version())
+        if self.crowd is not None:
+            self.crowd.close()
+    
+    def sync_gallery(self):
+        """Persist registrations/deletions in the compact gallery's delta file"""
+        if self.search_mode == "quantized":
+            self.gallery.save(self.store.encodings_version())
+    
+    def get_today(self, now=None):
+        """Date of `now` (default: the clock) as YYYY-MM-DD"""
+        now = now or datetime.fromtimestamp(self.clock())
+        return now.strftime("%Y-%m-%d")
+    
+    def get_today_log_file(self, now=None):
         """Get today's attendance log file"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        return os.path.join(self.attendance_dir, f"attendance_{today}.txt")
+        return os.path.join(self.attendance_dir, f"attendance_{self.get_today(now)}.txt")
+    
+    def roll_day(self, now=None):
+        """Switch the attendance cache to a new day, True when the day changed"""
+        today = self.get_today(now)
+        if today == self.attendance_day:
+            return False
+        with self.lock:
+            if today == self.attendance_day:
+                return False
+            self.attendance_day = today
+            self.today_attendance = self.load_today_attendance(now)
+            self.last_shown_message.clear()
+        self.metrics.inc('day_rollovers')
+        print(f"\n📅 New day {today}: attendance list reset "
+              f"({len(self.today_attendance)} already in the log)")
+        return True
     
-    def load_today_attendance(self):
+    def load_today_attendance(self, now=None):
         """Load today's attendance records"""
-        log_file = self.get_today_log_file()
+        log_file = self.get_today_log_file(now)
         attended = set()
         
         if os.path.exists(log_file):
@@ -75,34 +378,88 @@ class ProFaceAttendanceSystem:
         
         return attended
     
-    def mark_attendance(self, roll_no, name, confidence):
-        """Mark attendance (only once per day)"""
-        # Check if already attended today
-        if roll_no in self.today_attendance:
-            return False, "Already attended today"
-        
-        # Save to file
-        log_file = self.get_today_log_file()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def mark_attendance(self, roll_no, name, confidence, when=None):
+        """Mark attendance (only once per day)
         
-        with open(log_file, 'a') as f:
-            f.write(f"{timestamp} | {roll_no} | {name} | {confidence:.2f}%\n")
-        
-        # Update cache
-        self.today_attendance.add(roll_no)
-        
-        # Update database with last attendance
-        if roll_no in self.registered_faces:
-            self.registered_faces[roll_no]['last_attendance'] = timestamp
-            self.save_database()
+        `when` (datetime) marks a sighting at another time, e.g. a frame of a
+        recorded video, in the log of that day. Default: now.
+        """
+        # One lock for every camera/worker keeps the daily dedup exact
+        with self.lock:
+            # Log file, timestamp and dedup set all belong to the same day
+            now = datetime.fromtimestamp(self.clock())
+            self.roll_day(now)
+            when = when or now
+            day = self.get_today(when)
+            if day == self.attendance_day:
+                attended = self.today_attendance
+            else:
+                attended = self.other_days_attendance.get(day)
+                if attended is None:
+                    self.attendance_writer.flush()  # queued lines of that day count too
+                    attended = self.other_days_attendance[day] = self.load_today_attendance(when)
+            
+            # Check if already attended that day
+            if roll_no in attended:
+                return False, "Already attended today" if day == self.attendance_day \
+                    else f"Already attended on {day}"
+            
+            log_file = self.get_today_log_file(when)
+            timestamp = when.strftime("%Y-%m-%d %H:%M:%S")
+            
+            # Cache and counters change now, the disk writes are queued
+            attended.add(roll_no)
+            registered = roll_no in self.registered_faces
+            if registered:
+                person = self.registered_faces[roll_no]
+                if (person.get('last_attendance') or '') < timestamp:
+                    person['last_attendance'] = timestamp
+                person['total_attendance'] = person.get('total_attendance', 0) + 1
+            with self.metrics.time('persistence'):
+                self.attendance_writer.append(
+                    log_file, f"{timestamp} | {roll_no} | {name} | {confidence:.2f}%\n",
+                    roll_no if registered else None, timestamp)
+            self.metrics.inc('attendance_marked')
         
         return True, "Attendance marked successfully"
     
+    def open_camera(self, source=None, record=False):
+        """Open a capture source (device index, RTSP/HTTP URL, video file or .frec recording)"""
+        from sources import Recorder, open_source
+        if source is None:
+            source = self.camera_sources[0]
+        
+        cap = open_source(source, self.replay_speed)
+        if record and self.record_path:
+            path = self.record_path
+            if len(self.camera_sources) > 1:
+                root, ext = os.path.splitext(path)
+                path = f"{root}-cam{self.camera_sources.index(source) + 1}{ext}"
+            cap = Recorder(cap, path)
+            self.recorders.append(cap)
+            print(f"🎬 Recording {source} → {path}")
+        return cap
+    
+    def report_recordings(self):
+        """Print and forget the recorders of the session that just ended"""
+        for recorder in self.recorders:
+            print(f"🎬 Recorded {recorder.describe()}")
+        self.recorders = []
+    
+    def make_motion_gate(self, source):
+        """MotionGate for a capture source, None when gating is off"""
+        if not self.motion_gate:
+            return None
+        from motion import MotionGate
+        # Recordings are not throttled, an idle stretch just skips detection
+        return MotionGate(idle_fps=0 if os.path.isfile(str(source)) else self.idle_fps)
+    
     def register_face(self):
         """Register new face"""
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.ensure_vision()
+        self.ensure_gallery()
+        from quality import crop_face, pick_diverse
+        cap = self.open_camera()
         
         print("\n" + "="*70)
         print("📸 REGISTRATION MODULE | Developed by @aaka8h")
@@ -124,90 +481,80 @@ class ProFaceAttendanceSystem:
         
         print("\n" + "="*70)
         print("Instructions:")
-        print("  • Look straight at camera")
+        print("  • Look at the camera and turn your head slowly a little left and right")
         print("  • Ensure good lighting")
-        print("  • Press SPACE to capture (5 samples needed)")
-        print("  • Try different angles for better accuracy")
-        print("  • Press ESC to cancel")
+        print(f"  • {REGISTRATION_SAMPLES} good-quality samples with different poses "
+              f"(or {REGISTRATION_MIN_GAP:.0f}s apart) are kept")
+        print("  • Press Ctrl+C to cancel" if self.headless else "  • Press ESC to cancel")
         print("="*70)
         
-        face_encodings = []
+        # Good-quality candidates (score, time, pose, face crop, box in crop); the best
+        # distinct ones are encoded at the end
+        candidates = []
+        kept = []
+        last_taken = 0.0
         
-        while len(face_encodings) < 5:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame = cv2.flip(frame, 1)
-            h, w = frame.shape[:2]
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Create professional UI with branding
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (w, 150), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_frame)
-            
-            # Draw guide box
-            guide_size = 300
-            gx1 = (w - guide_size) // 2
-            gy1 = (h - guide_size) // 2
-            gx2 = gx1 + guide_size
-            gy2 = gy1 + guide_size
-            
-            cv2.rectangle(frame, (gx1, gy1), (gx2, gy2), (0, 255, 255), 2)
-            cv2.putText(frame, "Align face in box", (gx1, gy1 - 10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-            
-            # Draw detected faces
-            for (top, right, bottom, left) in face_locations:
-                color = (0, 255, 0) if len(face_locations) == 1 else (0, 165, 255)
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            
-            # Header info with branding
-            cv2.putText(frame, f"Registering: {name}", (20, 40),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
-            cv2.putText(frame, f"Department: {department}", (20, 80),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (200, 200, 200), 2)
-            cv2.putText(frame, "by @aaka8h", (20, 115),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (100, 200, 255), 2)
-            
-            # Progress bar
-            progress = len(face_encodings) / 5
-            bar_width = 400
-            bar_x = w - bar_width - 20
-            cv2.rectangle(frame, (bar_x, 110), (bar_x + bar_width, 140), (50, 50, 50), -1)
-            cv2.rectangle(frame, (bar_x, 110), (bar_x + int(bar_width * progress), 140), (0, 255, 0), -1)
-            cv2.putText(frame, f"Samples: {len(face_encodings)}/5", (bar_x + 120, 132),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Footer
-            cv2.putText(frame, "Press SPACE to capture | ESC to cancel", (20, h - 20),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-            
-            cv2.imshow("📸 FACE REGISTRATION | @aaka8h", frame)
-            
-            key = cv2.waitKey(1) & 0xFF
-            
-            if key == 32:  # SPACE
+        try:
+            while len(kept) < REGISTRATION_SAMPLES and len(candidates) < REGISTRATION_CANDIDATES:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                
+                frame = cv2.flip(frame, 1)
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                
+                # Detect faces
+                face_locations = self.detector.detect(rgb_frame)
+                
+                hint = None
                 if len(face_locations) == 1:
-                    encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                    if encodings:
-                        face_encodings.append(encodings[0])
-                        print(f"  ✅ Sample {len(face_encodings)}/5 captured")
-                        time.sleep(0.5)
-                elif len(face_locations) == 0:
-                    print("  ⚠️ No face detected!")
+                    quality = self.quality_gate.assess(rgb_frame, face_locations[0]) \
+                        if self.quality_gate else {'ok': True, 'score': 0.0, 'yaw': None, 'roll': None}
+                    now = time.time()
+                    if not quality['ok']:
+                        hint = quality['reason']
+                    elif now - last_taken >= REGISTRATION_SPACING:
+                        crop, location = crop_face(rgb_frame, face_locations[0])
+                        candidates.append({'score': quality['score'], 'time': now, 'yaw': quality['yaw'],
+                                           'roll': quality['roll'], 'crop': crop, 'location': location})
+                        kept = pick_diverse(candidates, REGISTRATION_SAMPLES, min_gap=REGISTRATION_MIN_GAP)
+                        last_taken = now
+                elif face_locations:
+                    hint = "show only one face"
+                
+                if self.headless:
+                    key = 0xFF
                 else:
-                    print("  ⚠️ Multiple faces detected! Show only ONE face")
-            
-            elif key == 27:  # ESC
-                print("\n❌ Registration cancelled")
-                cap.release()
+                    self.draw_registration_ui(frame, face_locations, name, department,
+                                              len(kept), hint)
+                    cv2.imshow("📸 FACE REGISTRATION | @aaka8h", frame)
+                    key = cv2.waitKey(1) & 0xFF
+                
+                if key == 27:  # ESC
+                    print("\n❌ Registration cancelled")
+                    cap.release()
+                    cv2.destroyAllWindows()
+                    return
+        except KeyboardInterrupt:
+            print("\n❌ Registration cancelled")
+            cap.release()
+            return
+        
+        if len(kept) < REGISTRATION_SAMPLES:
+            print(f"\n❌ Only {len(kept)} distinct good-quality samples in {len(candidates)} frames, "
+                  f"registration aborted (turn your head slowly while registering)")
+            cap.release()
+            if not self.headless:
                 cv2.destroyAllWindows()
-                return
+            return
+        
+        # Encode only the kept samples
+        face_encodings = []
+        for candidate in kept:
+            encodings = face_recognition.face_encodings(candidate['crop'], [candidate['location']])
+            if encodings:
+                face_encodings.append(encodings[0])
+        print(f"  ✅ Kept {len(face_encodings)} distinct samples of {len(candidates)}")
         
         # Save to database
         self.registered_faces[roll_no] = {
@@ -220,7 +567,9 @@ class ProFaceAttendanceSystem:
             'total_attendance': 0
         }
         
-        self.save_database()
+        self.gallery.add_person(roll_no, self.registered_faces[roll_no])
+        self.store.save_person(roll_no, self.registered_faces[roll_no])
+        self.sync_gallery()
         
         print("\n" + "="*70)
         print("✅ REGISTRATION SUCCESSFUL!")
@@ -232,7 +581,314 @@ class ProFaceAttendanceSystem:
         print("="*70)
         
         cap.release()
-        cv2.destroyAllWindows()
+        if not self.headless:
+            cv2.destroyAllWindows()
+    
+    def draw_registration_ui(self, frame, face_locations, name, department, samples, hint=None):
+        """Guide box, detected faces, header and progress for registration"""
+        hud = self.register_hud
+        w, h = hud.begin(frame)
+        
+        # Draw guide box
+        guide_size = 300
+        gx1 = (w - guide_size) // 2
+        gy1 = (h - guide_size) // 2
+        gx2 = gx1 + guide_size
+        gy2 = gy1 + guide_size
+        
+        cv2.rectangle(frame, (gx1, gy1), (gx2, gy2), (0, 255, 255), 2)
+        cv2.putText(frame, hint.capitalize() if hint else "Align face in box", (gx1, gy1 - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255) if hint else (0, 255, 255), 2)
+        
+        # Draw detected faces
+        for (top, right, bottom, left) in face_locations:
+            color = (0, 255, 0) if len(face_locations) == 1 else (0, 165, 255)
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        
+        # Header info with branding (static for the whole registration)
+        hud.text(frame, 'title', 'header', (name, department), [
+            (f"Registering: {name}", (20, 40), 1.2, (255, 255, 255), 3),
+            (f"Department: {department}", (20, 80), 0.8, (200, 200, 200), 2),
+            ("by @aaka8h", (20, 115), 0.6, (100, 200, 255), 2)])
+        
+        # Progress bar
+        progress = samples / REGISTRATION_SAMPLES
+        bar_width = 400
+        bar_x = w - bar_width - 20
+        cv2.rectangle(frame, (bar_x, 110), (bar_x + bar_width, 140), (50, 50, 50), -1)
+        cv2.rectangle(frame, (bar_x, 110), (bar_x + int(bar_width * progress), 140), (0, 255, 0), -1)
+        hud.text(frame, 'samples', 'header', samples, [
+            (f"Samples: {samples}/{REGISTRATION_SAMPLES}", (bar_x + 120, 132), 0.7, (255, 255, 255), 2)])
+        
+        # Footer
+        hud.text(frame, 'footer', 'footer', w, [
+            ("Turn your head slowly, samples are taken automatically | ESC to cancel", (20, hud.footer_h - 20),
+             0.7, (255, 255, 0), 2)])
+    
+    def recognize_faces(self, rgb_frame, tracker=None, detector=None, captured_at=None, seq=None):
+        """Detect faces, then encode and match only the ones that need it
+        
+        Each camera passes its own tracker/detector, the defaults serve the
+        single-camera loop. captured_at (time of the frame's capture) starts
+        the time-to-attendance clock of new tracks. Detection and tracking run
+        one frame at a time in `seq` order, only encoding and matching overlap
+        between workers; returns None for a frame that arrived too late.
+        """
+        tracker = tracker or self.tracker
+        detector = detector or self.detector
+        metrics = self.metrics
+        order = tracker.order if tracker is not None else self.frame_order
+        with order.lock:
+            if not order.admit(seq):
+                metrics.inc('frames_stale')
+                return None
+            with metrics.time('detection'):
+                face_locations = detector.detect(rgb_frame)
+            if tracker is not None:
+                now = time.time()
+                tracks = tracker.update(face_locations, now)
+        metrics.observe('faces_per_frame', len(face_locations), buckets=COUNT_BUCKETS)
+        
+        if tracker is None:
+            if not face_locations:
+                return []
+            kept, rejected = self.quality_filter(rgb_frame, face_locations, range(len(face_locations)))
+            faces = [{'location': location, 'person': None, 'distance': None, 'track': None,
+                      'quality': rejected.get(i)} for i, location in enumerate(face_locations)]
+            if kept:
+                with metrics.time('encoding'):
+                    face_encodings = self.encode_faces(rgb_frame, [face_locations[i] for i in kept])
+                kept, face_encodings = self.drop_failed(kept, face_encodings)
+            if kept:
+                with metrics.time('matching'):
+                    matches = self.gallery.match_many(face_encodings, tolerance=self.match_tolerance)
+                metrics.inc('faces_encoded', len(kept))
+                for i, (person, distance) in zip(kept, matches):
+                    faces[i].update(person=person, distance=distance)
+            return faces
+        
+        # New tracks and tracks due for re-verification get encoded, if the
+        # face is good enough to embed (otherwise retried on the next frame)
+        for track in tracks:
+            if track.first_frame_at is None:
+                track.first_frame_at = captured_at or now
+        pending = [i for i, track in enumerate(tracks) if tracker.needs_encoding(track, now)]
+        pending, rejected = self.quality_filter(rgb_frame, face_locations, pending)
+        
+        if pending:
+            with metrics.time('encoding'):
+                face_encodings = self.encode_faces(rgb_frame, [face_locations[i] for i in pending])
+            # Failed faces stay unassigned and are retried on the next frame
+            pending, face_encodings = self.drop_failed(pending, face_encodings)
+        if pending:
+            with metrics.time('matching'):
+                matches = self.gallery.match_many(face_encodings, tolerance=self.match_tolerance)
+            metrics.inc('faces_encoded', len(pending))
+            for i, (person, distance) in zip(pending, matches):
+                tracks[i].assign(person, distance, now)
+            tracker.record_encodings(len(pending))
+        
+        return [{'location': location, 'person': track.person, 'distance': track.distance,
+                 'track': track, 'quality': rejected.get(i)}
+                for i, (location, track) in enumerate(zip(face_locations, tracks))]
+    
+    def encode_faces(self, rgb_frame, locations):
+        """Encodings in location order, spread over the crowd workers for groups"""
+        if self.crowd is not None:
+            return self.crowd.encode(rgb_frame, locations)
+        return face_recognition.face_encodings(rgb_frame, locations)
+    
+    def drop_failed(self, indexes, face_encodings):
+        """Indexes and encodings without the faces that could not be encoded (None)"""
+        kept = [(i, encoding) for i, encoding in zip(indexes, face_encodings) if encoding is not None]
+        if len(kept) < len(indexes):
+            self.metrics.inc('faces_encoding_failed', len(indexes) - len(kept))
+        return [i for i, _ in kept], [encoding for _, encoding in kept]
+    
+    def quality_filter(self, rgb_frame, face_locations, indexes):
+        """Keep the faces worth encoding, returns (kept indexes, {index: reason})"""
+        if self.quality_gate is None or not indexes:
+            return list(indexes), {}
+        kept, rejected = [], {}
+        with self.metrics.time('quality'):
+            for i in indexes:
+                quality = self.quality_gate.assess(rgb_frame, face_locations[i])
+                if quality['ok']:
+                    kept.append(i)
+                else:
+                    rejected[i] = quality['reason']
+        if rejected:
+            self.metrics.inc('faces_low_quality', len(rejected))
+        return kept, rejected
+    
+    def handle_match(self, person, distance, track=None):
+        """Apply cooldown and attendance rules to a recognised person
+        
+        Returns the display info for the face, with the 'outcome' decided under
+        the attendance lock ('marked' or 'already_attended'). During the
+        cooldown a tracked face keeps its last info, an untracked one returns None.
+        """
+        roll_no = person['roll_no']
+        name = person['name']
+        department = person['department']
+        confidence = (1 - distance) * 100
+        
+        with self.lock:
+            # Check cooldown (per track when tracking)
+            current_time_sec = self.clock()
+            if track is not None:
+                if track.last_action_time is not None and \
+                   current_time_sec - track.last_action_time < self.detection_cooldown:
+                    return track.info
+            elif self.last_detection_time.since(roll_no, current_time_sec) < self.detection_cooldown:
+                return None
+            
+            # Check if already attended
+            self.roll_day(datetime.fromtimestamp(current_time_sec))
+            already_attended = roll_no in self.today_attendance
+            
+            outcome = 'already_attended'
+            if already_attended:
+                # Show "Already Attended" message
+                color = (0, 165, 255)  # Orange
+                status = "✅ ALREADY ATTENDED"
+                
+                # Console message
+                if self.last_shown_message.since(roll_no, current_time_sec) > self.message_interval:
+                    print(f"\n⚠️ {name} (ID: {roll_no}) - ALREADY ATTENDED TODAY")
+                    self.last_shown_message.touch(roll_no, current_time_sec)
+            
+            else:
+                # Mark attendance
+                success, message = self.mark_attendance(roll_no, name, confidence)
+                
+                if success:
+                    outcome = 'marked'
+                    color = (0, 255, 0)  # Green
+                    status = "✅ VERIFIED"
+                    if track is not None and track.first_frame_at is not None:
+                        # Face entered the picture -> attendance recorded
+                        waited = time.time() - track.first_frame_at
+                        self.metrics.observe('time_to_attendance_seconds', waited)
+                        self.checkin_latency.append((roll_no, waited))
+                    
+                    # Console output
+                    print("\n" + "="*70)
+                    print("✅ ATTENDANCE MARKED")
+                    print("="*70)
+                    print(f"   Name: {name}")
+                    print(f"   ID: {roll_no}")
+                    print(f"   Department: {department}")
+                    print(f"   Confidence: {confidence:.2f}%")
+                    print(f"   Time: {datetime.fromtimestamp(current_time_sec).strftime('%I:%M:%S %p')}")
+                    print(f"   System by: @aaka8h")
+                    print("="*70)
+                else:
+                    color = (0, 165, 255)
+                    status = "⚠️ " + message
+            
+            self.last_detection_time.touch(roll_no, current_time_sec)
+            
+            info = {
+                'color': color,
+                'status': status,
+                'name': name,
+                'roll_no': roll_no,
+                'department': department,
+                'confidence': confidence,
+                'outcome': outcome
+            }
+            if track is not None:
+                track.last_action_time = current_time_sec
+                track.info = info
+        
+        return info
+    
+    def verify_faces(self, rgb_frame, tracker=None, detector=None, captured_at=None, seq=None):
+        """Recognise faces and apply attendance rules, returns faces to draw (None: stale frame)"""
+        recognized = self.recognize_faces(rgb_frame, tracker, detector, captured_at, seq)
+        if recognized is None:
+            return None
+        faces = []
+        for face in recognized:
+            if face['person'] is None:
+                faces.append({'location': face['location'], 'info': None, 'quality': face['quality']})
+                continue
+            
+            info = self.handle_match(face['person'], face['distance'], face['track'])
+            if info is not None:
+                faces.append({'location': face['location'], 'info': info})
+        return faces
+    
+    def draw_face_result(self, frame, face):
+        """Draw box and info panel for one verified/unknown face"""
+        top, right, bottom, left = face['location']
+        info = face['info']
+        
+        if info is None and face.get('quality'):
+            # Not encoded yet, tell the person why
+            cv2.rectangle(frame, (left, top), (right, bottom), (160, 160, 160), 2)
+            cv2.putText(frame, face['quality'].upper(), (left + 5, top - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 2)
+            return
+        
+        if info is None:
+            # Unknown face
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 3)
+            cv2.rectangle(frame, (left, top - 40), (right, top), (0, 0, 255), -1)
+            cv2.putText(frame, "UNKNOWN", (left + 5, top - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            return
+        
+        color = info['color']
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 3)
+        
+        # Info box
+        box_h = 140
+        cv2.rectangle(frame, (left, top - box_h), (right, top), color, -1)
+        
+        cv2.putText(frame, info['status'], (left + 5, top - 100),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(frame, info['name'], (left + 5, top - 70),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        cv2.putText(frame, f"ID: {info['roll_no']}", (left + 5, top - 45),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        cv2.putText(frame, f"Dept: {info['department']}", (left + 5, top - 25),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        cv2.putText(frame, f"{info['confidence']:.1f}%", (left + 5, top - 5),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
+    def draw_verification_hud(self, frame, camera_fps, latency_ms):
+        """Header/footer overlay for the auto-verification window
+        
+        Bands are blended in place and text layers are only re-rendered when
+        their strings change (the clock once a second).
+        """
+        hud = self.verify_hud
+        w, h = hud.begin(frame)
+        
+        # Header with branding and watermark
+        hud.text(frame, 'title', 'header', w, [
+            ("AUTO-VERIFICATION SYSTEM", (20, 40), 1.3, (0, 255, 255), 3),
+            ("@aaka8h", (w - 150, 40), 0.8, (100, 200, 255), 2)])
+        
+        clock = hud.clock()
+        hud.text(frame, 'clock', 'header', clock, [(clock, (20, 80), 0.7, (200, 200, 200), 2)])
+        
+        attended, registered = len(self.today_attendance), len(self.registered_faces)
+        hud.text(frame, 'attendance', 'header', (attended, registered), [
+            (f"Attendance: {attended}/{registered}", (20, 110), 0.6, (255, 255, 255), 2)])
+        
+        # Performance
+        fps, latency = round(camera_fps, 1), round(latency_ms)
+        hud.text(frame, 'performance', 'header', (fps, latency), lambda: [
+            (f"Camera: {fps:.1f} FPS", (w - 300, 80), 0.6, (200, 200, 200), 2),
+            (f"Latency: {latency:.0f} ms", (w - 300, 110), 0.6, (200, 200, 200), 2)])
+        
+        # Footer
+        hud.text(frame, 'footer', 'footer', w, [
+            ("System running... | Press ESC to exit | by @aaka8h", (20, hud.footer_h - 30),
+             0.7, (255, 255, 0), 2)])
     
     def auto_verify_attendance(self):
         """Auto-verify faces and mark attendance (real-time)"""
@@ -240,22 +896,16 @@ class ProFaceAttendanceSystem:
             print("\n❌ No faces registered yet! Register first.")
             return
         
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.ensure_vision()
+        self.ensure_gallery()
+        from multicam import is_local_camera
+        from pipeline import VerificationPipeline
         
-        # Prepare known encodings
-        known_encodings = []
-        known_data = []
+        if len(self.camera_sources) > 1:
+            self.auto_verify_multi_camera()
+            return
         
-        for roll_no, data in self.registered_faces.items():
-            for encoding in data['encodings']:
-                known_encodings.append(encoding)
-                known_data.append({
-                    'roll_no': roll_no,
-                    'name': data['name'],
-                    'department': data.get('department', 'N/A')
-                })
+        cap = self.open_camera(record=True)
         
         print("\n" + "="*70)
         print("🔍 AUTO-VERIFICATION MODE ACTIVATED")
@@ -264,169 +914,147 @@ class ProFaceAttendanceSystem:
         print("  • Stand in front of camera")
         print("  • System will auto-detect and verify")
         print("  • Attendance marked automatically (once per day)")
-        print("  • Press ESC to exit")
+        print("  • Press Ctrl+C to exit" if self.headless else "  • Press ESC to exit")
         print("="*70)
         
-        process_this_frame = True
-        last_shown_message = {}
+        self.last_shown_message.clear()
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame = cv2.flip(frame, 1)
-            h, w = frame.shape[:2]
-            
-            # Process every other frame for speed
-            if process_this_frame:
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_frame)
-                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            
-            process_this_frame = not process_this_frame
-            
-            # Create professional overlay
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (w, 140), (0, 0, 0), -1)
-            cv2.rectangle(overlay, (0, h - 80), (w, h), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-            
-            # Header with branding
-            current_time = datetime.now().strftime("%I:%M:%S %p")
-            current_date = datetime.now().strftime("%B %d, %Y")
-            
-            cv2.putText(frame, "AUTO-VERIFICATION SYSTEM", (20, 40),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 255, 255), 3)
-            cv2.putText(frame, f"{current_date} | {current_time}", (20, 80),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
-            cv2.putText(frame, f"Attendance: {len(self.today_attendance)}/{len(self.registered_faces)}", 
-                       (20, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Watermark
-            cv2.putText(frame, "@aaka8h", (w - 150, 40),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (100, 200, 255), 2)
-            
-            # Process each detected face
-            for (encoding, (top, right, bottom, left)) in zip(face_encodings, face_locations):
-                matches = face_recognition.compare_faces(known_encodings, encoding, tolerance=0.6)
-                face_distances = face_recognition.face_distance(known_encodings, encoding)
+        # Capture -> recognition workers -> render (this thread)
+        motion = self.make_motion_gate(self.camera_sources[0])
+        pipeline = VerificationPipeline(self, cap, workers=self.recognition_workers,
+                                        flip=is_local_camera(self.camera_sources[0]), motion=motion)
+        pipeline.start()
+        
+        try:
+            if self.headless:
+                self.run_headless(pipeline.capture_ended.is_set,
+                                  lambda: f"{pipeline.capture_rate.rate:.1f} FPS | "
+                                          f"{pipeline.recognition_rate.rate:.1f} frames/s recognised"
+                                          + (f" | {'active' if motion.active else 'idle'}" if motion else ""))
+            while not self.headless:
+                item = pipeline.next_frame()
+                if item is None:
+                    break
+                _, _, frame = item
                 
-                if len(face_distances) > 0 and True in matches:
-                    best_match_index = np.argmin(face_distances)
+                faces, results_ts = pipeline.latest_results()
+                with self.metrics.time('rendering'):
+                    self.draw_verification_hud(frame, pipeline.capture_rate.rate, pipeline.latency_ms)
+                    for face in faces:
+                        self.draw_face_result(frame, face)
                     
-                    if matches[best_match_index]:
-                        person = known_data[best_match_index]
-                        roll_no = person['roll_no']
-                        name = person['name']
-                        department = person['department']
-                        confidence = (1 - face_distances[best_match_index]) * 100
-                        
-                        # Check cooldown
-                        current_time_sec = time.time()
-                        if roll_no in self.last_detection_time:
-                            if current_time_sec - self.last_detection_time[roll_no] < self.detection_cooldown:
-                                continue
-                        
-                        # Check if already attended
-                        already_attended = roll_no in self.today_attendance
-                        
-                        if already_attended:
-                            # Show "Already Attended" message
-                            color = (0, 165, 255)  # Orange
-                            status = "✅ ALREADY ATTENDED"
-                            
-                            cv2.rectangle(frame, (left, top), (right, bottom), color, 3)
-                            
-                            # Info box
-                            box_h = 140
-                            cv2.rectangle(frame, (left, top - box_h), (right, top), color, -1)
-                            
-                            cv2.putText(frame, status, (left + 5, top - 100),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                            cv2.putText(frame, name, (left + 5, top - 70),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                            cv2.putText(frame, f"ID: {roll_no}", (left + 5, top - 45),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                            cv2.putText(frame, f"Dept: {department}", (left + 5, top - 25),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                            cv2.putText(frame, f"{confidence:.1f}%", (left + 5, top - 5),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                            
-                            # Console message
-                            if roll_no not in last_shown_message or \
-                               current_time_sec - last_shown_message.get(roll_no, 0) > 10:
-                                print(f"\n⚠️ {name} (ID: {roll_no}) - ALREADY ATTENDED TODAY")
-                                last_shown_message[roll_no] = current_time_sec
-                        
-                        else:
-                            # Mark attendance
-                            success, message = self.mark_attendance(roll_no, name, confidence)
-                            
-                            if success:
-                                color = (0, 255, 0)  # Green
-                                status = "✅ VERIFIED"
-                                
-                                # Update total attendance
-                                self.registered_faces[roll_no]['total_attendance'] = \
-                                    self.registered_faces[roll_no].get('total_attendance', 0) + 1
-                                self.save_database()
-                                
-                                # Console output
-                                print("\n" + "="*70)
-                                print("✅ ATTENDANCE MARKED")
-                                print("="*70)
-                                print(f"   Name: {name}")
-                                print(f"   ID: {roll_no}")
-                                print(f"   Department: {department}")
-                                print(f"   Confidence: {confidence:.2f}%")
-                                print(f"   Time: {datetime.now().strftime('%I:%M:%S %p')}")
-                                print(f"   System by: @aaka8h")
-                                print("="*70)
-                            else:
-                                color = (0, 165, 255)
-                                status = "⚠️ " + message
-                            
-                            cv2.rectangle(frame, (left, top), (right, bottom), color, 3)
-                            
-                            # Info box
-                            box_h = 140
-                            cv2.rectangle(frame, (left, top - box_h), (right, top), color, -1)
-                            
-                            cv2.putText(frame, status, (left + 5, top - 100),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                            cv2.putText(frame, name, (left + 5, top - 70),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                            cv2.putText(frame, f"ID: {roll_no}", (left + 5, top - 45),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                            cv2.putText(frame, f"Dept: {department}", (left + 5, top - 25),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                            cv2.putText(frame, f"{confidence:.1f}%", (left + 5, top - 5),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                        
-                        self.last_detection_time[roll_no] = current_time_sec
+                    cv2.imshow("🔍 AUTO-VERIFICATION | @aaka8h", frame)
+                pipeline.rendered(results_ts)
                 
-                else:
-                    # Unknown face
-                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 3)
-                    cv2.rectangle(frame, (left, top - 40), (right, top), (0, 0, 255), -1)
-                    cv2.putText(frame, "UNKNOWN", (left + 5, top - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Footer
-            cv2.putText(frame, "System running... | Press ESC to exit | by @aaka8h", (20, h - 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-            
-            cv2.imshow("🔍 AUTO-VERIFICATION | @aaka8h", frame)
-            
-            if cv2.waitKey(1) & 0xFF == 27:  # ESC
-                break
+                if cv2.waitKey(1) & 0xFF == 27:  # ESC
+                    break
+        finally:
+            pipeline.stop()
+            cap.release()
+            if not self.headless:
+                cv2.destroyAllWindows()
+            self.attendance_writer.flush()
+            print(f"\n📈 Attendance writes: {self.attendance_writer.describe()}")
+            print(f"📈 Frames dropped before recognition: {pipeline.dropped_frames}")
+            if self.tracker is not None:
+                print(f"📈 Faces: {self.tracker.faces_seen} | Encoder calls: {self.tracker.encodings_run} "
+                      f"({self.tracker.encoder_savings * 100:.0f}% reused from tracks)")
+            print(f"📈 Detector: {self.detector.describe()}")
+            if motion is not None:
+                print(f"📈 Motion gate: {motion.describe()}")
+                print(f"📈 Buffered frames dropped on wake-up: {pipeline.drained}")
+            self.report_recordings()
+    
+    def run_headless(self, ended, status, interval=10.0):
+        """Main-thread loop without a display: print a status line until ended() or Ctrl+C"""
+        next_report = time.time() + interval
+        try:
+            while not ended():
+                time.sleep(0.2)
+                # Nobody may walk past at midnight, the day still changes
+                self.roll_day()
+                if time.time() >= next_report:
+                    next_report += interval
+                    print(f"  📈 {status()} | Attendance: "
+                          f"{len(self.today_attendance)}/{len(self.registered_faces)}")
+        except KeyboardInterrupt:
+            self.stop_requested = True
+    
+    def run_daemon(self, retry_delay=5.0):
+        """Verify headless until SIGTERM/Ctrl+C, reopening the camera when it drops"""
+        if len(self.registered_faces) == 0:
+            print("\n❌ No faces registered yet! Register first.")
+            return
+        self.headless = True
+        self.stop_requested = False
+        # systemd/docker stop with SIGTERM: same clean shutdown as Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        print(f"\n🛰️ Daemon mode: {', '.join(map(str, self.camera_sources))} "
+              f"(pid {os.getpid()}, SIGTERM or Ctrl+C to stop)")
+        sessions = 0
+        try:
+            while not self.stop_requested:
+                sessions += 1
+                self.auto_verify_attendance()
+                if self.stop_requested:
+                    break
+                print(f"⚠️ Capture ended, restarting in {retry_delay:.0f}s (session {sessions})")
+                time.sleep(retry_delay)
+        except KeyboardInterrupt:
+            pass
+        self.attendance_writer.flush()
+        print(f"🛑 Daemon stopped after {sessions} sessions | {self.attendance_writer.describe()}")
+    
+    def auto_verify_multi_camera(self):
+        """Auto-verify on every configured camera with one shared gallery"""
+        self.ensure_vision()
+        from multicam import MultiCameraVerifier
         
-        cap.release()
-        cv2.destroyAllWindows()
+        print("\n" + "="*70)
+        print(f"🎥 MULTI-CAMERA VERIFICATION | {len(self.camera_sources)} sources")
+        print("   Developed by: Aakash | Telegram: @aaka8h")
+        print("="*70)
+        for i, source in enumerate(self.camera_sources):
+            print(f"  • CAM {i + 1}: {source}")
+        print("  • Press Ctrl+C to exit" if self.headless else "  • Press ESC to exit")
+        print("="*70)
+        
+        self.last_shown_message.clear()
+        verifier = MultiCameraVerifier(self, self.camera_sources,
+                                       workers=max(self.recognition_workers, len(self.camera_sources)),
+                                       motion_factory=self.make_motion_gate)
+        verifier.start()
+        
+        try:
+            if self.headless:
+                self.run_headless(lambda: verifier.all_ended,
+                                  lambda: " | ".join(f"{feed.name} {feed.recognition_rate.rate:.1f} rec/s"
+                                                     for feed in verifier.feeds))
+            while not self.headless and not verifier.all_ended:
+                with self.metrics.time('rendering'):
+                    cv2.imshow("🎥 MULTI-CAMERA VERIFICATION | @aaka8h", verifier.render_mosaic())
+                if cv2.waitKey(30) & 0xFF == 27:  # ESC
+                    break
+        finally:
+            verifier.stop()
+            if not self.headless:
+                cv2.destroyAllWindows()
+            self.attendance_writer.flush()
+            print("\n" + "="*70)
+            print(f"📈 Attendance writes: {self.attendance_writer.describe()}")
+            for stats in verifier.summary():
+                print(f"📈 {stats['camera']} ({stats['source']}): recognised {stats['recognised']} frames, "
+                      f"dropped {stats['dropped']}, encoder calls {stats['encoder_calls']}/{stats['faces']} faces")
+                if stats['motion']:
+                    print(f"   motion gate: {stats['motion']}")
+                    print(f"   buffered frames dropped on wake-up: {stats['drained']}")
+            self.report_recordings()
+            print("="*70)
     
     def view_attendance_report(self):
         """View today's attendance report"""
+        self.roll_day()
+        self.attendance_writer.flush()
         log_file = self.get_today_log_file()
         
         if not os.path.exists(log_file):
@@ -461,6 +1089,35 @@ class ProFaceAttendanceSystem:
         print(f"Total Present: {len(records)}/{len(self.registered_faces)}")
         print("="*70)
     
+    def view_attendance_analytics(self):
+        """Attendance % over a date range, per person or per department"""
+        self.attendance_writer.flush()
+        if self.attendance_index is None:
+            self.attendance_index = AttendanceIndex(self.attendance_dir)
+        
+        departments = {roll_no: data.get('department', 'N/A')
+                       for roll_no, data in self.registered_faces.items()}
+        added = self.attendance_index.import_logs(departments)
+        if added:
+            print(f"\n📥 Indexed {added} new attendance records")
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        start = input(f"📅 From date (YYYY-MM-DD) [{today[:8]}01]: ").strip() or f"{today[:8]}01"
+        end = input(f"📅 To date (YYYY-MM-DD) [{today}]: ").strip() or today
+        department = input("🏢 Department (blank = all, * = per department): ").strip()
+        
+        try:
+            datetime.strptime(start, "%Y-%m-%d")
+            datetime.strptime(end, "%Y-%m-%d")
+        except ValueError:
+            print("❌ Invalid date format!")
+            return
+        
+        by = 'department' if department == '*' else 'person'
+        print_report(self.attendance_index, start, end, by,
+                     department=department if by == 'person' else None,
+                     people=self.registered_faces)
+    
     def view_users(self):
         """View all registered users"""
         if len(self.registered_faces) == 0:
@@ -498,8 +1155,10 @@ class ProFaceAttendanceSystem:
             confirm = input(f"⚠️ Delete {name} (ID: {roll_no})? (yes/no): ").lower()
             
             if confirm == 'yes':
+                self.gallery.remove_person(roll_no)
                 del self.registered_faces[roll_no]
-                self.save_database()
+                self.store.delete_person(roll_no)
+                self.sync_gallery()
                 print(f"✅ {name} deleted successfully!")
         else:
             print("❌ ID not found!")
@@ -531,7 +1190,82 @@ class ProFaceAttendanceSystem:
         print("="*70)
 
 def main():
-    system = ProFaceAttendanceSystem()
+    parser = argparse.ArgumentParser(description="Professional Face Attendance System")
+    parser.add_argument("--search", choices=["exact", "ivf", "quantized", "sharded"], default="exact",
+                        help="gallery search mode (ivf = approximate, quantized = memory-mapped "
+                             "compact gallery, sharded = one process per core; for very large galleries)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="gallery shard processes (--search sharded, default: all cores)")
+    parser.add_argument("--partition", choices=["hash", "department"], default="hash",
+                        help="how people are grouped onto shards (--search sharded)")
+    parser.add_argument("--quantize", choices=["int8", "float16"], default="int8",
+                        help="vector format of the compact gallery (--search quantized)")
+    parser.add_argument("--rerank", type=int, default=32,
+                        help="candidates re-scored with exact float32 distances (--search quantized)")
+    parser.add_argument("--nprobe", type=int, default=16,
+                        help="IVF lists scanned per query (see ann_index.py report)")
+    parser.add_argument("--detect-budget", type=float, default=60,
+                        help="target face detection time per frame in ms")
+    parser.add_argument("--camera", action="append", dest="cameras", metavar="SOURCE",
+                        help="device index, RTSP/HTTP URL or video file (repeat for several cameras)")
+    parser.add_argument("--record", metavar="PATH.frec",
+                        help="save verification sessions (frames + timestamps) for replay")
+    parser.add_argument("--replay-speed", default="original", metavar="SPEED",
+                        help="pace of .frec camera sources: original, fast or frames per second")
+    parser.add_argument("--headless", action="store_true",
+                        help="no display: skip all drawing and windows (wall-mounted units)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="no menu: verify headless until SIGTERM, restarting dropped cameras "
+                             "and switching the daily log at midnight")
+    parser.add_argument("--no-quality-gate", action="store_true",
+                        help="encode every detected face, even small, blurred, dark or turned-away ones")
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="run detection on every frame even when nothing moves")
+    parser.add_argument("--idle-fps", type=float, default=5.0,
+                        help="camera frames read per second while the scene is idle")
+    parser.add_argument("--fsync", choices=["batch", "interval", "none"], default="batch",
+                        help="attendance log durability: fsync every batched append, about once a "
+                             "second, or never")
+    parser.add_argument("--crowd-workers", type=int, default=0, metavar="N",
+                        help="encode the faces of crowded frames on N worker processes (0 = off)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="load the face models on first register/verify instead of in the background")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT (e.g. 9108, 0 = off)")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="periodically write a JSON metrics snapshot to PATH")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="seconds between JSON snapshots")
+    args = parser.parse_args()
+    # sources.py imports OpenCV, keep these checks here so the menu still starts instantly
+    if args.replay_speed not in ("original", "fast"):
+        try:
+            if float(args.replay_speed) <= 0:
+                raise ValueError
+        except ValueError:
+            parser.error("--replay-speed must be original, fast or a positive frame rate")
+    if args.record and not args.record.endswith(".frec"):
+        parser.error("--record needs a .frec path")
+    
+    system = ProFaceAttendanceSystem(search_mode=args.search, ann_nprobe=args.nprobe,
+                                     quantize=args.quantize, rerank=args.rerank,
+                                     shards=args.shards, partition=args.partition,
+                                     detection_budget_ms=args.detect_budget,
+                                     camera_sources=args.cameras, headless=args.headless or args.daemon,
+                                     quality_gate=not args.no_quality_gate,
+                                     motion_gate=not args.no_motion_gate, idle_fps=args.idle_fps,
+                                     fsync=args.fsync, crowd_workers=args.crowd_workers,
+                                     record_path=args.record, replay_speed=args.replay_speed)
+    system.start_metrics(args.metrics_port, args.metrics_json, args.metrics_interval)
+    if not args.no_warmup:
+        system.start_warmup()
+    
+    if args.daemon:
+        system.run_daemon()
+        system.stop_metrics()
+        system.close_gallery()
+        system.attendance_writer.close()
+        return
     
     while True:
         print("\n" + "="*70)
@@ -544,10 +1278,11 @@ def main():
         print("4. 👥 View All Registered Users")
         print("5. 🗑️ Delete User")
         print("6. ℹ️ About / Credits")
-        print("7. 🚪 Exit")
+        print("7. 📈 Attendance Analytics (date range)")
+        print("8. 🚪 Exit")
         print("="*70)
         
-        choice = input("Select option (1-7): ").strip()
+        choice = input("Select option (1-8): ").strip()
         
         if choice == '1':
             system.register_face()
@@ -562,11 +1297,16 @@ def main():
         elif choice == '6':
             system.show_about()
         elif choice == '7':
+            system.view_attendance_analytics()
+        elif choice == '8':
             print("\n" + "="*70)
             print("👋 Thank you for using Face Attendance System!")
             print("   Developed by: AAKASH (@aaka8h)")
             print("   For support, contact: @aaka8h on Telegram")
             print("="*70)
+            system.stop_metrics()
+            system.close_gallery()
+            system.attendance_writer.close()
             break
         else:
             print("❌ Invalid option!")
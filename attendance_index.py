@@ -0,0 +1,341 @@
+"""Indexed attendance history with range and aggregate reports
+
+The daily attendance_YYYY-MM-DD.txt logs stay the source of truth. They are
+imported incrementally (only bytes appended since the last import) into an
+SQLite table indexed by date, roll number and department. Rollups per day
+and department, and per person and month, keep long-range reports cheap:
+whole months come from the rollup and only the partial edge months are
+counted from the raw rows.
+
+    python attendance_index.py import
+    python attendance_index.py report --from 2026-03-01 --to 2026-03-31 --department CSE
+    python attendance_index.py report --from 2026-01-01 --to 2026-06-30 --by department
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    roll_no TEXT NOT NULL,
+    name TEXT,
+    department TEXT,
+    confidence REAL,
+    PRIMARY KEY (date, roll_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_attendance_roll ON attendance (roll_no, date);
+CREATE INDEX IF NOT EXISTS idx_attendance_dept ON attendance (department, date, roll_no);
+
+CREATE TABLE IF NOT EXISTS daily_department (
+    date TEXT NOT NULL,
+    department TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    PRIMARY KEY (date, department)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS person_month (
+    month TEXT NOT NULL,
+    roll_no TEXT NOT NULL,
+    name TEXT,
+    department TEXT,
+    present INTEGER NOT NULL,
+    PRIMARY KEY (month, roll_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_person_month_dept ON person_month (department, month);
+
+CREATE TABLE IF NOT EXISTS imported_logs (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+LOG_NAME = re.compile(r"attendance_(\d{4}-\d{2}-\d{2})\.txt$")
+
+
+def parse_log_line(line):
+    """Parse 'timestamp | roll_no | name | 93.21%', None if malformed"""
+    parts = line.strip().split('|')
+    if len(parts) < 2:
+        return None
+    stamp = parts[0].strip().split()
+    if len(stamp) < 2:
+        return None
+    confidence = None
+    if len(parts) >= 4:
+        try:
+            confidence = float(parts[3].strip().rstrip('%'))
+        except ValueError:
+            pass
+    return {
+        'date': stamp[0],
+        'time': stamp[1],
+        'roll_no': parts[1].strip(),
+        'name': parts[2].strip() if len(parts) >= 3 else '',
+        'confidence': confidence
+    }
+
+
+def split_range(start, end):
+    """Split [start, end] into (whole months, raw day ranges)"""
+    first = date.fromisoformat(start)
+    last = date.fromisoformat(end)
+    months = []
+    month = date(first.year, first.month, 1)
+    if month < first:
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    full_start = month
+    while True:
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        if next_month - timedelta(days=1) > last:
+            break
+        months.append(month.strftime("%Y-%m"))
+        month = next_month
+
+    if not months:
+        return [], [(start, end)]
+    raw = []
+    if full_start > first:
+        raw.append((start, (full_start - timedelta(days=1)).isoformat()))
+    if month <= last:
+        raw.append((month.isoformat(), end))
+    return months, raw
+
+
+class AttendanceIndex:
+    """SQLite index over the daily attendance logs"""
+
+    def __init__(self, attendance_dir="attendance_logs", db_path=None):
+        self.attendance_dir = attendance_dir
+        self.db_path = db_path or os.path.join(attendance_dir, "attendance_index.db")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def add_records(self, records, departments=None):
+        """Insert parsed records, first check-in per person per day wins"""
+        departments = departments or {}
+        daily = {}
+        monthly = {}
+        added = 0
+        with self._lock, self.conn:
+            for rec in records:
+                department = rec.get('department') or departments.get(rec['roll_no'], 'N/A')
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO attendance (date, time, roll_no, name, department, confidence) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (rec['date'], rec['time'], rec['roll_no'], rec['name'], department, rec['confidence']))
+                if not cur.rowcount:
+                    continue
+                added += 1
+                key = (rec['date'], department)
+                daily[key] = daily.get(key, 0) + 1
+                key = (rec['date'][:7], rec['roll_no'])
+                count, _, _ = monthly.get(key, (0, None, None))
+                monthly[key] = (count + 1, rec['name'], department)
+
+            # Rollups are updated once per batch
+            self.conn.executemany(
+                "INSERT INTO daily_department (date, department, present) VALUES (?, ?, ?) "
+                "ON CONFLICT (date, department) DO UPDATE SET present = present + excluded.present",
+                [(d, dept, n) for (d, dept), n in daily.items()])
+            self.conn.executemany(
+                "INSERT INTO person_month (month, roll_no, name, department, present) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (month, roll_no) DO UPDATE SET present = present + excluded.present",
+                [(m, r, name, dept, n) for (m, r), (n, name, dept) in monthly.items()])
+        return added
+
+    def import_logs(self, departments=None):
+        """Import new lines from every daily log, returns rows added"""
+        with self._lock:
+            offsets = dict(self.conn.execute("SELECT path, offset FROM imported_logs"))
+
+        added = 0
+        for path in sorted(glob.glob(os.path.join(self.attendance_dir, "attendance_*.txt"))):
+            if not LOG_NAME.search(path):
+                continue
+            key = os.path.basename(path)
+            offset = offsets.get(key, 0)
+            size = os.path.getsize(path)
+            if size <= offset:
+                continue
+
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+            # Leave a partially written last line for the next import
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                continue
+            lines = chunk[:end].decode('utf-8', errors='replace').splitlines()
+            records = [rec for rec in map(parse_log_line, lines) if rec]
+
+            added += self.add_records(records, departments)
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO imported_logs (path, offset) VALUES (?, ?)",
+                    (key, offset + end))
+        return added
+
+    def working_days(self, start, end):
+        """Days in the range on which anyone attended"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(DISTINCT date) FROM daily_department WHERE date BETWEEN ? AND ?",
+                (start, end)).fetchone()[0]
+
+    def person_report(self, start, end, department=None, roll_no=None, people=None):
+        """Days present and attendance % per person for a date range
+
+        `people` (the registered_faces dict) adds members with zero days.
+        """
+        filters = ""
+        extra = []
+        if department:
+            filters += " AND department = ?"
+            extra.append(department)
+        if roll_no:
+            filters += " AND roll_no = ?"
+            extra.append(roll_no)
+
+        months, raw_ranges = split_range(start, end)
+        report = {}
+        with self._lock:
+            if months:
+                marks = ",".join("?" * len(months))
+                rows = self.conn.execute(
+                    f"SELECT roll_no, MAX(name), MAX(department), SUM(present) FROM person_month "
+                    f"WHERE month IN ({marks}){filters} GROUP BY roll_no", months + extra).fetchall()
+                for r, n, d, c in rows:
+                    report[r] = {'roll_no': r, 'name': n, 'department': d, 'present': c}
+            for raw_start, raw_end in raw_ranges:
+                rows = self.conn.execute(
+                    f"SELECT roll_no, MAX(name), MAX(department), COUNT(*) FROM attendance "
+                    f"WHERE date BETWEEN ? AND ?{filters} GROUP BY roll_no",
+                    [raw_start, raw_end] + extra).fetchall()
+                for r, n, d, c in rows:
+                    if r in report:
+                        report[r]['present'] += c
+                    else:
+                        report[r] = {'roll_no': r, 'name': n, 'department': d, 'present': c}
+        days = self.working_days(start, end)
+
+        for r, data in (people or {}).items():
+            if r in report:
+                continue
+            if (department and data.get('department') != department) or (roll_no and r != roll_no):
+                continue
+            report[r] = {'roll_no': r, 'name': data['name'],
+                         'department': data.get('department', 'N/A'), 'present': 0}
+
+        for entry in report.values():
+            entry['working_days'] = days
+            entry['percent'] = 100.0 * entry['present'] / days if days else 0.0
+        return sorted(report.values(), key=lambda e: e['roll_no'])
+
+    def department_report(self, start, end, people=None):
+        """Attendance % per department, from the daily rollup"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT department, SUM(present) FROM daily_department "
+                "WHERE date BETWEEN ? AND ? GROUP BY department", (start, end)).fetchall()
+        days = self.working_days(start, end)
+
+        members = {}
+        for data in (people or {}).values():
+            dept = data.get('department', 'N/A')
+            members[dept] = members.get(dept, 0) + 1
+
+        report = []
+        for department, present in rows:
+            count = members.get(department, 0)
+            possible = count * days
+            report.append({
+                'department': department,
+                'members': count,
+                'present': present,
+                'working_days': days,
+                'percent': 100.0 * present / possible if possible else 0.0
+            })
+        return sorted(report, key=lambda e: e['department'])
+
+
+def _load_people():
+    """People metadata (no encodings) from the face database, if there is one"""
+    db_path = os.path.join("face_database", "face_database.db")
+    if not os.path.exists(db_path):
+        return {}
+    from storage import FaceStore
+    store = FaceStore(db_path)
+    try:
+        return store.load_all(encodings=False)
+    finally:
+        store.close()
+
+
+def print_report(index, start, end, by, department=None, roll_no=None, people=None):
+    """Pretty-print a range report in the app's console style"""
+    t0 = datetime.now()
+    print("\n" + "="*70)
+    print(f"📈 ATTENDANCE ANALYTICS | {start} → {end}")
+    print("="*70)
+
+    if by == 'department':
+        report = index.department_report(start, end, people)
+        print(f"{'Department':<20} {'Members':<10} {'Present':<10} {'Days':<8} {'Attendance':<10}")
+        print("-"*70)
+        for e in report:
+            print(f"{e['department']:<20} {e['members']:<10} {e['present']:<10} "
+                  f"{e['working_days']:<8} {e['percent']:.1f}%")
+    else:
+        report = index.person_report(start, end, department, roll_no, people)
+        print(f"{'ID':<15} {'Name':<20} {'Department':<12} {'Present':<10} {'Attendance':<10}")
+        print("-"*70)
+        for e in report:
+            print(f"{e['roll_no']:<15} {e['name']:<20} {e['department']:<12} "
+                  f"{e['present']}/{e['working_days']:<7} {e['percent']:.1f}%")
+
+    elapsed = (datetime.now() - t0).total_seconds() * 1000
+    print("="*70)
+    print(f"Rows: {len(report)} | Query time: {elapsed:.0f} ms")
+    print("="*70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance history reports")
+    parser.add_argument("--logs", default="attendance_logs", help="attendance log directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="import new lines from the daily logs")
+    report = sub.add_parser("report", help="range/aggregate report")
+    report.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD")
+    report.add_argument("--to", dest="end", required=True, help="YYYY-MM-DD")
+    report.add_argument("--by", choices=["person", "department"], default="person")
+    report.add_argument("--department")
+    report.add_argument("--roll-no")
+    args = parser.parse_args()
+
+    people = _load_people()
+    departments = {r: d.get('department', 'N/A') for r, d in people.items()}
+    index = AttendanceIndex(args.logs)
+    added = index.import_logs(departments)
+
+    if args.command == "import":
+        print(f"✅ Imported {added} new attendance records")
+    else:
+        print_report(index, args.start, args.end, args.by, args.department, args.roll_no, people)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Write-behind persistence for attendance check-ins
+
+mark_attendance only updates the in-memory state and queues the record, so
+a slow SD card never stalls a frame. A background thread takes everything
+queued at once, appends it to the daily log in one write, then records the
+check-ins in the face database in one transaction.
+
+fsync policy:
+    batch     fsync the log after every batched append (default)
+    interval  fsync at most every `fsync_interval` seconds
+    none      leave it to the OS
+"""
+import os
+import queue
+import threading
+import time
+
+FSYNC_POLICIES = ('batch', 'interval', 'none')
+
+_STOP = object()
+
+
+class AttendanceWriter:
+    """Queue + writer thread for attendance log lines and check-in rows"""
+
+    def __init__(self, store, metrics=None, fsync='batch', fsync_interval=1.0, max_batch=256,
+                 max_attempts=5):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.store = store
+        self.metrics = metrics
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+
+        self.queue = queue.Queue()
+        self.files = {}  # path -> unbuffered append handle, the current day only
+        self.closed = False
+        self.last_fsync = 0.0
+        self.unsynced = False
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.lost = 0
+        self.max_latency = 0.0
+        if metrics is not None:
+            metrics.gauge('attendance_queue_depth', self.queue.qsize,
+                          help_text="check-ins waiting to be written")
+
+        self.thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, log_file, line, roll_no=None, timestamp=None):
+        """Queue one log line, and a check-in row when roll_no is given"""
+        if self.closed:
+            raise RuntimeError("attendance writer is closed")
+        self.queue.put((time.time(), log_file, line, roll_no, timestamp))
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def flush(self):
+        """Block until everything queued so far is written (or given up on)"""
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Write what is left and stop the thread"""
+        self.closed = True
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def _take_batch(self):
+        """Everything queued right now, how many items were taken and whether to stop"""
+        try:
+            # Wake up for the trailing fsync of the interval policy
+            batch = [self.queue.get(timeout=self.fsync_interval if self.unsynced else None)]
+        except queue.Empty:
+            return [], 0, False
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(item is _STOP for item in batch)
+        return [item for item in batch if item is not _STOP], len(batch), stop
+
+    def _run(self):
+        stop = False
+        while not stop:
+            records, taken, stop = self._take_batch()
+            if not taken:
+                self._try_sync()
+                continue
+            # Bytes already appended per log file, so a retry never repeats a line
+            progress = {}
+            logged = not records
+            attempts = 0
+            while records:
+                try:
+                    t0 = time.perf_counter()
+                    if not logged:
+                        self._write_log(records, progress)
+                        logged = True
+                    self._record(records)
+                    self._done(records, time.perf_counter() - t0)
+                    break
+                except Exception as e:
+                    # Keep the batch and retry, check-ins must not be lost to a busy card
+                    attempts += 1
+                    self.failures += 1
+                    self._close_files()  # reopened on retry, e.g. after a remount
+                    if attempts >= self.max_attempts:
+                        self.lost += len(records)
+                        if self.metrics is not None:
+                            self.metrics.inc('attendance_records_lost', len(records))
+                        print(f"❌ Gave up on {len(records)} attendance records after "
+                              f"{attempts} attempts: {e}")
+                        break
+                    print(f"⚠️ Attendance write failed ({e}), retrying")
+                    time.sleep(min(5.0, 0.5 * attempts))
+            for _ in range(taken):
+                self.queue.task_done()
+        if self.fsync != 'none':
+            self._try_sync()
+        self._close_files()
+
+    def _try_sync(self):
+        try:
+            self._sync()
+        except OSError as e:
+            # Still unsynced, tried again on the next batch or timeout
+            self.failures += 1
+            print(f"⚠️ Attendance log fsync failed ({e})")
+
+    def _sync(self):
+        for f in self.files.values():
+            os.fsync(f.fileno())
+        self.last_fsync = time.time()
+        self.unsynced = False
+
+    def _close_files(self):
+        for f in self.files.values():
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.files = {}
+
+    def _handle(self, log_file):
+        f = self.files.get(log_file)
+        if f is None:
+            # New day, yesterday's log is complete
+            if self.fsync != 'none' and self.files:
+                self._sync()
+            self._close_files()
+            # Unbuffered: a failed write leaves nothing behind to be written twice
+            f = open(log_file, 'ab', buffering=0)
+            self.files = {log_file: f}
+        return f
+
+    def _write_log(self, records, progress):
+        """One append (and maybe one fsync) per log file in the batch"""
+        by_file = {}
+        for _, log_file, line, _, _ in records:
+            by_file.setdefault(log_file, []).append(line)
+        for log_file, lines in by_file.items():
+            data = "".join(lines).encode('utf-8')
+            done = progress.get(log_file, 0)
+            # Opened even when already written, so a retried fsync covers it
+            f = self._handle(log_file)
+            try:
+                while done < len(data):
+                    done += f.write(data[done:])
+            finally:
+                progress[log_file] = done
+        if self.fsync == 'batch' or (self.fsync == 'interval'
+                                     and time.time() - self.last_fsync >= self.fsync_interval):
+            self._sync()
+        elif self.fsync == 'interval':
+            self.unsynced = True
+
+    def _record(self, records):
+        rows = [(roll_no, timestamp) for _, _, _, roll_no, timestamp in records if roll_no]
+        if rows:
+            self.store.record_attendances(rows)
+
+    def _done(self, records, seconds):
+        done = time.time()
+        self.written += len(records)
+        self.batches += 1
+        self.max_latency = max(self.max_latency, max(done - record[0] for record in records))
+        if self.metrics is not None:
+            self.metrics.observe('stage_seconds', seconds, {'stage': 'attendance_write'})
+            self.metrics.inc('attendance_batches')
+            for queued_at, *_ in records:
+                # Check-in to on disk, time spent queued included
+                self.metrics.observe('attendance_write_latency_seconds', done - queued_at)
+
+    def describe(self):
+        return (f"{self.written} records in {self.batches} batches, queue {self.depth}, "
+                f"max latency {self.max_latency * 1000:.0f} ms"
+                + (f", {self.failures} failed writes" if self.failures else "")
+                + (f", {self.lost} records lost" if self.lost else ""))
@@ -0,0 +1,259 @@
+"""Headless batch recognition for recorded videos and photo folders
+
+Work is split into chunks (a time window of a video, or a group of image
+files). Each chunk is decoded, detected and encoded in a worker process;
+the main process streams the results to CSV/JSONL as chunks finish and
+applies the usual mark_attendance rules, in the log of the day each frame
+was captured (video start from --start or the file time, photo file times).
+Streams without a frame count are read sequentially in one chunk.
+
+    python batch.py recording.mp4 event_photos/ --output results.jsonl
+    python batch.py cctv/*.mp4 --sample-fps 5 --workers 8 --output results.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+import cv2
+import face_recognition
+
+from detection import detect_scaled
+from gallery import FaceGallery
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+FIELDS = ['source', 'frame', 'timestamp_s', 'captured_at', 'status', 'roll_no', 'name',
+          'department', 'confidence', 'distance', 'top', 'right', 'bottom', 'left']
+
+# Per-worker state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(gallery_arrays, tolerance, scale, upsample):
+    _worker['gallery'] = FaceGallery.from_arrays(*gallery_arrays)
+    _worker['tolerance'] = tolerance
+    _worker['scale'] = scale
+    _worker['upsample'] = upsample
+
+
+def _recognize(rgb_frame, source, frame_no, timestamp_s, captured_at):
+    """Detect, encode and match faces in one frame, returns records
+
+    `captured_at` is the wall-clock time (epoch seconds) of the frame.
+    """
+    locations = detect_scaled(rgb_frame, _worker['scale'], _worker['upsample'])
+    if not locations:
+        return []
+    encodings = face_recognition.face_encodings(rgb_frame, locations)
+    matches = _worker['gallery'].match_many(encodings, tolerance=_worker['tolerance'])
+
+    records = []
+    for (top, right, bottom, left), (person, distance) in zip(locations, matches):
+        record = {
+            'source': source, 'frame': frame_no, 'timestamp_s': round(timestamp_s, 3),
+            'captured_at': datetime.fromtimestamp(captured_at).isoformat(sep=' ', timespec='seconds'),
+            'status': 'unknown', 'roll_no': None, 'name': None, 'department': None,
+            'confidence': None, 'distance': round(distance, 4),
+            'top': top, 'right': right, 'bottom': bottom, 'left': left
+        }
+        if person is not None:
+            record.update(status='matched', roll_no=person['roll_no'], name=person['name'],
+                          department=person['department'],
+                          confidence=round((1 - distance) * 100, 2))
+        records.append(record)
+    return records
+
+
+def process_chunk(chunk):
+    """Worker entry point, returns (frames processed, records)"""
+    kind, source = chunk[0], chunk[1]
+    records = []
+    frames = 0
+
+    if kind == 'images':
+        for path in chunk[2]:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            records += _recognize(rgb_frame, path, 0, 0.0, os.path.getmtime(path))
+            frames += 1
+        return frames, records
+
+    # Video window [start, end) (end None: to the end of the stream), keep every
+    # `stride`-th frame; `origin` is the wall-clock time of frame 0
+    _, _, start, end, stride, fps, origin = chunk
+    cap = cv2.VideoCapture(source)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    for frame_no in range(start, end) if end is not None else itertools.count(start):
+        # grab() skips the colour conversion for frames we do not keep
+        if not cap.grab():
+            break
+        if frame_no % stride:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        records += _recognize(rgb_frame, source, frame_no, frame_no / fps, origin + frame_no / fps)
+        frames += 1
+    cap.release()
+    return frames, records
+
+
+def plan_chunks(inputs, sample_fps=5.0, chunk_seconds=30, images_per_chunk=16, start=None):
+    """Split every input into independent work chunks
+
+    A video starts at `start` (epoch seconds), by default at its file time
+    minus its duration; a stream with no file starts now.
+    """
+    chunks = []
+    for path in inputs:
+        if os.path.isdir(path):
+            images = []
+            for root, _, files in os.walk(path):
+                images += [os.path.join(root, name) for name in sorted(files)
+                           if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+            for i in range(0, len(images), images_per_chunk):
+                chunks.append(('images', path, images[i:i + images_per_chunk]))
+        elif os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            chunks.append(('images', path, [path]))
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                print(f"⚠️ Cannot open {path}, skipped")
+                continue
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+
+            stride = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+            origin = start
+            if origin is None:
+                origin = os.path.getmtime(path) - max(total, 0) / fps if os.path.exists(path) else time.time()
+            if total <= 0:
+                # No frame count to split by (live stream, some containers): one pass
+                print(f"⚠️ {path}: frame count unknown, reading it sequentially in one chunk")
+                chunks.append(('video', path, 0, None, stride, fps, origin))
+                continue
+            window = max(stride, int(fps * chunk_seconds))
+            for first in range(0, total, window):
+                chunks.append(('video', path, first, min(total, first + window), stride, fps, origin))
+    return chunks
+
+
+class ResultWriter:
+    """Append records to CSV or JSONL as they arrive"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', newline='')
+        self.is_csv = path.lower().endswith('.csv')
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.is_csv:
+            self.writer.writerow({key: record.get(key) for key in FIELDS})
+        else:
+            self.file.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(system, inputs, output, workers=None, sample_fps=5.0, scale=0.5,
+              upsample=1, mark_attendance=True, start=None):
+    """Process inputs with a process pool, returns a summary dict"""
+    chunks = plan_chunks(inputs, sample_fps, start=start)
+    if not chunks:
+        print("❌ Nothing to process!")
+        return None
+
+    workers = workers or os.cpu_count() or 1
+    video_seconds = sum((c[3] - c[2]) / c[5] for c in chunks if c[0] == 'video' and c[3] is not None)
+    writer = ResultWriter(output)
+    frames = faces = marked = 0
+    t0 = time.time()
+
+    print("\n" + "="*70)
+    print(f"🎞️ BATCH MODE | {len(chunks)} chunks on {workers} workers → {output}")
+    print("="*70)
+
+    init_args = (system.gallery.to_arrays(), system.match_tolerance, scale, upsample)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        for done, (chunk_frames, records) in enumerate(pool.imap(process_chunk, chunks), 1):
+            for record in records:
+                if mark_attendance and record['status'] == 'matched':
+                    success, _ = system.mark_attendance(
+                        record['roll_no'], record['name'], record['confidence'],
+                        when=datetime.fromisoformat(record['captured_at']))
+                    if success:
+                        record['status'] = 'marked'
+                        marked += 1
+                writer.write(record)
+            writer.flush()
+
+            frames += chunk_frames
+            faces += len(records)
+            elapsed = time.time() - t0
+            print(f"\r  ⏳ {done}/{len(chunks)} chunks | {frames} frames | "
+                  f"{frames / elapsed if elapsed else 0:.1f} frames/s | {faces} faces", end="")
+
+    writer.close()
+    system.attendance_writer.flush()
+    elapsed = time.time() - t0
+    summary = {
+        'chunks': len(chunks), 'frames': frames, 'faces': faces, 'marked': marked,
+        'seconds': elapsed, 'fps': frames / elapsed if elapsed else 0.0,
+        'video_seconds': video_seconds,
+        'realtime_factor': video_seconds / elapsed if elapsed else 0.0
+    }
+    print("\n" + "="*70)
+    print(f"✅ Done: {frames} frames in {elapsed:.1f}s ({summary['fps']:.1f} frames/s)")
+    if video_seconds:
+        print(f"   Video: {video_seconds:.0f}s processed at {summary['realtime_factor']:.1f}x real time")
+    print(f"   Faces: {faces} | New attendance: {marked}")
+    print("="*70)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch recognition")
+    parser.add_argument("inputs", nargs="+", help="video files, image files or image folders")
+    parser.add_argument("--output", default="batch_results.jsonl", help=".jsonl or .csv")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--sample-fps", type=float, default=5.0,
+                        help="frames per second of video to analyse (0 = every frame)")
+    parser.add_argument("--scale", type=float, default=0.5, help="detection downscale factor")
+    parser.add_argument("--upsample", type=int, default=1, help="HOG upsample count")
+    parser.add_argument("--no-attendance", action="store_true",
+                        help="only report matches, do not mark attendance")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None,
+                        help="wall-clock time of the first video frame, e.g. '2024-03-01 08:00:00' "
+                             "(default: file time minus duration)")
+    args = parser.parse_args()
+
+    from app import ProFaceAttendanceSystem
+    system = ProFaceAttendanceSystem()
+    if len(system.gallery) == 0:
+        print("\n❌ No faces registered yet! Register first.")
+        return
+
+    run_batch(system, args.inputs, args.output, args.workers, args.sample_fps,
+              args.scale, args.upsample, mark_attendance=not args.no_attendance,
+              start=args.start.timestamp() if args.start else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,674 @@
+"""Benchmarks for every stage of the recognition hot path (no camera needed)
+
+Synthetic 720p frames, optional sample images and random 128-d encodings
+are used as input. Every stage is timed on its own and written to JSON
+with percentiles. A saved run can be used as a baseline to flag regressions.
+
+    python benchmark.py run --output bench.json
+    python benchmark.py run --stages matching,overlay --sizes 1000 10000
+    python benchmark.py run --images samples/ --output bench.json --baseline baseline.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.15
+    python benchmark.py soak --days 21
+    python benchmark.py e2e session.frec --database face_database --speed original
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from gallery import FaceGallery, make_synthetic_faces
+
+ALL_STAGES = ['startup', 'face_locations', 'face_encodings', 'crowd', 'matching', 'sharding',
+              'motion', 'overlay', 'save_database', 'attendance_log']
+
+# Cold start in a fresh interpreter: time to menu, then vision load + warm-up
+STARTUP_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import app
+system = app.ProFaceAttendanceSystem()
+ready = time.perf_counter() - t0
+system.ensure_gallery()
+try:
+    system.ensure_vision()
+except ImportError:
+    pass
+print(json.dumps(dict(system.startup_times, menu_ready=ready)))
+"""
+
+
+def summarize(samples):
+    """Percentile summary of a list of durations (seconds -> ms)"""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'n': int(len(ms)),
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def time_it(fn, repeats, warmup=2, setup=None):
+    """Run fn repeatedly, returns the per-call durations"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def synthetic_frame(width=1280, height=720, seed=0):
+    """Noisy BGR frame with a few bright face-sized blobs"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for x in (200, 600, 1000):
+        frame[250:450, x - 80:x + 80] = 200
+    return frame
+
+
+def load_images(folder, limit=20):
+    """RGB sample images from a folder (for realistic detection/encoding)"""
+    import cv2
+    images = []
+    for name in sorted(os.listdir(folder))[:limit]:
+        frame = cv2.imread(os.path.join(folder, name))
+        if frame is not None:
+            images.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return images
+
+
+def _face_recognition():
+    try:
+        import face_recognition
+        return face_recognition
+    except ImportError:
+        return None
+
+
+def bench_face_locations(ctx):
+    fr = _face_recognition()
+    if fr is None:
+        return {'skipped': 'face_recognition not installed'}
+    import cv2
+    results = {}
+    frames = ctx['images'] or [cv2.cvtColor(synthetic_frame(), cv2.COLOR_BGR2RGB)]
+    for scale in (1.0, 0.5, 0.25):
+        inputs = [cv2.resize(f, None, fx=scale, fy=scale) if scale != 1.0 else f for f in frames]
+        state = {'i': 0}
+
+        def run():
+            fr.face_locations(inputs[state['i'] % len(inputs)])
+            state['i'] += 1
+        results[f"hog_scale_{scale}"] = summarize(time_it(run, ctx['repeats']))
+    return results
+
+
+def bench_face_encodings(ctx):
+    fr = _face_recognition()
+    if fr is None:
+        return {'skipped': 'face_recognition not installed'}
+    import cv2
+    rgb = ctx['images'][0] if ctx['images'] else cv2.cvtColor(synthetic_frame(), cv2.COLOR_BGR2RGB)
+    boxes = fr.face_locations(rgb) or [(250, 280, 450, 120), (250, 680, 450, 520), (250, 1080, 450, 920)]
+
+    results = {}
+    for count in (1, len(boxes)):
+        chosen = boxes[:count]
+        results[f"faces_{count}"] = summarize(
+            time_it(lambda: fr.face_encodings(rgb, chosen), ctx['repeats']))
+    return results
+
+
+def bench_crowd(ctx):
+    """Per-frame encoding time by face count, serial vs the crowd worker pool"""
+    fr = _face_recognition()
+    if fr is None:
+        return {'skipped': 'face_recognition not installed'}
+    import cv2
+    from crowd import CrowdEncoder
+    rgb = cv2.cvtColor(synthetic_frame(), cv2.COLOR_BGR2RGB)
+    # 4 x 4 grid of 150 px boxes, a group standing in front of the camera
+    boxes = [(40 + row * 170, 190 + col * 300, 190 + row * 170, 40 + col * 300)
+             for row in range(4) for col in range(4)]
+    workers = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, 16, min(workers, 16)})
+    results = {}
+    crowd = CrowdEncoder(workers=workers, min_faces=1)
+    try:
+        crowd.encode(rgb, boxes[:workers])  # workers load their models
+        for count in counts:
+            chosen = boxes[:count]
+            results[f"serial_{count}_faces"] = summarize(
+                time_it(lambda: fr.face_encodings(rgb, chosen), max(3, ctx['repeats'] // 4)))
+            results[f"crowd_{workers}w_{count}_faces"] = summarize(
+                time_it(lambda: crowd.encode(rgb, chosen), max(3, ctx['repeats'] // 4)))
+    finally:
+        crowd.close()
+    return results
+
+
+def bench_matching(ctx):
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in ctx['sizes']:
+        # Build arrays directly, a dict of 1M samples would dominate the run
+        vectors = rng.normal(0, 0.06, (size, 128)).astype(np.float32)
+        ids = (np.arange(size) // 5).astype(np.int32)
+        people = {pid: {'roll_no': f"S{pid}", 'name': f"P{pid}", 'department': 'N/A'}
+                  for pid in range(int(ids[-1]) + 1)}
+        gallery = FaceGallery.from_arrays(vectors, ids, people)
+        queries = vectors[rng.choice(size, 16)] + rng.normal(0, 0.02, (16, 128)).astype(np.float32)
+
+        single = time_it(lambda: gallery.match(queries[0]), ctx['repeats'])
+        batch = time_it(lambda: gallery.match_many(queries), max(3, ctx['repeats'] // 4))
+        results[f"exact_{size}_1q"] = summarize(single)
+        results[f"exact_{size}_16q"] = summarize(batch)
+
+        if size >= 10000 and ctx.get('ann'):
+            gallery.enable_ann(nprobe=8)
+            results[f"ivf_{size}_1q"] = summarize(time_it(lambda: gallery.match(queries[0]),
+                                                          ctx['repeats']))
+
+        # Memory-mapped int8 codes + float32 rerank, files in the working directory
+        from compact_gallery import CompactGallery, write_gallery
+        directory = f"compact_{size}"
+        compact = CompactGallery(directory, write_gallery(directory, vectors, ids, people, 0))
+        results[f"quantized_{size}_1q"] = summarize(time_it(lambda: compact.match(queries[0]),
+                                                            ctx['repeats']))
+        results[f"quantized_{size}_16q"] = summarize(time_it(lambda: compact.match_many(queries),
+                                                             max(3, ctx['repeats'] // 4)))
+        del gallery, vectors, compact
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def _make_system(people):
+    """ProFaceAttendanceSystem with a synthetic database in a temp dir"""
+    from app import ProFaceAttendanceSystem
+    from storage import FaceStore
+
+    os.makedirs("face_database", exist_ok=True)
+    store = FaceStore(os.path.join("face_database", "face_database.db"))
+    store.save_all(make_synthetic_faces(people))
+    store.close()
+    return ProFaceAttendanceSystem()
+
+
+def bench_startup(ctx):
+    ctx['system']()  # synthetic database in the working directory
+    env = dict(os.environ)
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [repo, env.get('PYTHONPATH')]))
+
+    phases = {}
+    for _ in range(max(3, ctx['repeats'] // 4)):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        for phase, seconds in json.loads(out.strip().splitlines()[-1]).items():
+            phases.setdefault(phase, []).append(seconds)
+    return {phase: summarize(samples) for phase, samples in phases.items()}
+
+
+def bench_sharding(ctx):
+    """Throughput of a 16-face batch by shard count, for checking core scaling"""
+    from sharded_gallery import ShardedGallery
+    results = {}
+    size = max(ctx['sizes'])
+    registered_faces = make_synthetic_faces(size // 5)
+    queries = np.random.default_rng(1).normal(0, 0.06, (16, 128)).astype(np.float32)
+    counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    for shards in [n for n in counts if n <= (os.cpu_count() or 1)]:
+        gallery = ShardedGallery.from_registered_faces(registered_faces, shards)
+        try:
+            results[f"sharded_{size}_{shards}x_16q"] = summarize(
+                time_it(lambda: gallery.match_many(queries), max(3, ctx['repeats'] // 4)))
+        finally:
+            gallery.close()
+    return results
+
+
+def bench_motion(ctx):
+    from motion import MotionGate
+    gate = MotionGate()
+    still = synthetic_frame()
+    moved = synthetic_frame(seed=1)
+    state = {'i': 0}
+
+    def run():
+        # Alternating frames exercise the changed-pixel path every call
+        gate.update(moved if state['i'] % 2 else still)
+        state['i'] += 1
+    return {'update_720p': summarize(time_it(run, ctx['repeats'] * 10))}
+
+
+def bench_overlay(ctx):
+    system = ctx['system']()
+    system.load_display()  # OpenCV only, no face models needed to draw
+    frame0 = synthetic_frame()
+    person = next(iter(system.gallery.people.values()))
+    faces = [{'location': (250, 280, 450, 120), 'info': None},
+             {'location': (250, 680, 450, 520),
+              'info': {'color': (0, 255, 0), 'status': "VERIFIED", 'name': person['name'],
+                       'roll_no': person['roll_no'], 'department': person['department'],
+                       'confidence': 72.5}}]
+    frame = frame0.copy()
+
+    def reset():
+        np.copyto(frame, frame0)
+
+    def hud():
+        system.draw_verification_hud(frame, 30.0, 85.0)
+
+    def boxes():
+        for face in faces:
+            system.draw_face_result(frame, face)
+    return {
+        'hud_720p': summarize(time_it(hud, ctx['repeats'] * 4, setup=reset)),
+        'faces_2': summarize(time_it(boxes, ctx['repeats'] * 4, setup=reset)),
+    }
+
+
+def bench_save_database(ctx):
+    results = {}
+    system = ctx['system']()
+    for people in ctx['people']:
+        system.registered_faces = make_synthetic_faces(people)
+        results[f"full_save_{people}"] = summarize(time_it(system.save_database,
+                                                           max(3, ctx['repeats'] // 4), warmup=1))
+    roll_no = next(iter(system.registered_faces))
+    results['record_attendance_row'] = summarize(
+        time_it(lambda: system.store.record_attendance(roll_no, "2024-01-01 09:00:00"),
+                ctx['repeats'] * 4))
+    return results
+
+
+def bench_attendance_log(ctx):
+    results = {}
+    system = ctx['system']()
+    log_file = system.get_today_log_file()
+    for lines in ctx['log_lines']:
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(log_file, 'w') as f:
+            for i in range(lines):
+                f.write(f"{stamp} | L{i:07d} | Person {i} | 80.00%\n")
+        results[f"load_today_{lines}"] = summarize(
+            time_it(system.load_today_attendance, max(3, ctx['repeats'] // 2), warmup=1))
+
+    system.today_attendance = system.load_today_attendance()
+    counter = {'i': 0}
+
+    def mark():
+        counter['i'] += 1
+        system.mark_attendance(f"N{counter['i']:07d}", "Bench Person", 80.0)
+        # Until the line and the check-in row are on disk, not just queued
+        system.attendance_writer.flush()
+    results['mark_attendance_new_flushed'] = summarize(time_it(mark, ctx['repeats'] * 4))
+
+    def burst():
+        for _ in range(100):
+            counter['i'] += 1
+            system.mark_attendance(f"N{counter['i']:07d}", "Bench Person", 80.0)
+        system.attendance_writer.flush()
+    results['mark_attendance_100_flushed'] = summarize(time_it(burst, max(3, ctx['repeats'] // 2), warmup=1))
+    results['mark_attendance_duplicate'] = summarize(
+        time_it(lambda: system.mark_attendance("L0000000", "Person 0", 80.0), ctx['repeats'] * 4))
+    return results
+
+
+STAGES = {
+    'startup': bench_startup,
+    'face_locations': bench_face_locations,
+    'face_encodings': bench_face_encodings,
+    'crowd': bench_crowd,
+    'matching': bench_matching,
+    'sharding': bench_sharding,
+    'motion': bench_motion,
+    'overlay': bench_overlay,
+    'save_database': bench_save_database,
+    'attendance_log': bench_attendance_log,
+}
+
+
+def environment():
+    info = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    try:
+        import cv2
+        info['opencv'] = cv2.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def run(args):
+    ctx = {
+        'repeats': args.repeats,
+        'sizes': args.sizes,
+        'people': args.people,
+        'log_lines': args.log_lines,
+        'ann': args.ann,
+        'images': [],
+    }
+    if args.images:
+        ctx['images'] = load_images(args.images)
+
+    workdir = tempfile.mkdtemp(prefix="face_bench_")
+    cwd = os.getcwd()
+    systems = []
+
+    def make_system():
+        systems.append(_make_system(args.people[0]))
+        return systems[-1]
+    ctx['system'] = make_system
+
+    stages = args.stages.split(",") if args.stages else ALL_STAGES
+    report = {'meta': environment(), 'results': {}}
+    try:
+        os.chdir(workdir)
+        for stage in stages:
+            print(f"⏱️  {stage} ...", flush=True)
+            t0 = time.time()
+            try:
+                report['results'][stage] = STAGES[stage](ctx)
+            except ImportError as e:
+                report['results'][stage] = {'skipped': str(e)}
+            print(f"   done in {time.time() - t0:.1f}s")
+    finally:
+        os.chdir(cwd)
+        for system in systems:
+            system.attendance_writer.close()
+            system.store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return 1 if compare(baseline, report, args.threshold) else 0
+    return 0
+
+
+def print_report(report):
+    print("\n" + "="*70)
+    print("📊 BENCHMARK RESULTS (ms)")
+    print("="*70)
+    print(f"{'Stage / case':<42} {'p50':>8} {'p90':>8} {'p99':>8}")
+    print("-"*70)
+    for stage, cases in report['results'].items():
+        if 'skipped' in cases:
+            print(f"{stage:<42} skipped: {cases['skipped']}")
+            continue
+        for case, stats in cases.items():
+            print(f"{stage + '/' + case:<42} {stats['p50_ms']:>8.3f} {stats['p90_ms']:>8.3f} "
+                  f"{stats['p99_ms']:>8.3f}")
+    print("="*70)
+
+
+def compare(baseline, current, threshold=0.15, metric='p50_ms'):
+    """Print regressions (current slower than baseline by > threshold)"""
+    regressions = []
+    print("\n" + "="*70)
+    print(f"🔎 COMPARE vs baseline ({baseline['meta'].get('timestamp')}) | threshold {threshold:.0%}")
+    print("="*70)
+    for stage, cases in current['results'].items():
+        base_cases = baseline['results'].get(stage, {})
+        if 'skipped' in cases or 'skipped' in base_cases:
+            continue
+        for case, stats in cases.items():
+            if case not in base_cases:
+                continue
+            before = base_cases[case][metric]
+            after = stats[metric]
+            change = (after - before) / before if before > 0 else 0.0
+            flag = "❌ REGRESSION" if change > threshold else ("✅ faster" if change < -threshold else "")
+            if change > threshold:
+                regressions.append((stage, case, change))
+            print(f"{stage + '/' + case:<42} {before:>9.3f} → {after:>9.3f} {change:>+7.1%} {flag}")
+    print("="*70)
+    print(f"{len(regressions)} regression(s)" if regressions else "✅ No regressions")
+    return regressions
+
+
+def _rss_mb():
+    """Resident set size of this process in MB (Linux), peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def soak(args):
+    """Weeks of kiosk traffic on a simulated clock, fails when RSS keeps growing
+
+    Every simulated frame matches a small group against the gallery, tracks
+    them and applies the attendance rules (cooldowns, midnight rollover,
+    queued writes). Walk-in visitors get a new ID every time, the worst case
+    for per-person state. RSS is sampled after each simulated day.
+    """
+    from tracker import FaceTracker
+
+    workdir = tempfile.mkdtemp(prefix="face_soak_")
+    cwd = os.getcwd()
+    rng = np.random.default_rng(0)
+    samples = []
+    try:
+        os.chdir(workdir)
+        system = _make_system(args.people)
+        people = list(system.gallery.people.values())
+        vectors, ids, _ = system.gallery.to_arrays()
+        clock = {'t': 0.0}
+        system.clock = lambda: clock['t']
+        tracker = FaceTracker()
+        visitors = 0
+
+        print(f"🧪 Soak: {args.days} days x {args.frames_per_day} frames, {len(people)} people")
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for day in range(args.days):
+                # A burst of frames at 5 FPS from 08:00, then on to the next morning
+                clock['t'] = datetime(2024, 1, 1, 8).timestamp() + 86400 * day
+                for _ in range(args.frames_per_day):
+                    clock['t'] += 0.2
+                    group = rng.integers(0, len(vectors), rng.integers(1, 5))
+                    queries = vectors[group] + rng.normal(0, 0.01, (len(group), vectors.shape[1]))
+                    matches = system.gallery.match_many(queries.astype(np.float32))
+                    # Groups stand at new places, so tracks come and go
+                    x = int(rng.integers(0, 1000))
+                    boxes = [(100, x + 150 * (i + 1), 250, x + 150 * i) for i in range(len(group))]
+                    tracks = tracker.update(boxes, clock['t'])
+                    for (person, distance), track in zip(matches, tracks):
+                        if person is not None:
+                            system.handle_match(person, distance, track)
+                    visitors += 1
+                    system.handle_match({'roll_no': f"V{visitors:09d}", 'name': "Visitor",
+                                         'department': "Guest"}, 0.3)
+                system.attendance_writer.flush()
+                gc.collect()
+                samples.append(_rss_mb())
+                print(f"  day {day + 1:>3}: RSS {samples[-1]:7.1f} MB | today {len(system.today_attendance)} "
+                      f"| cooldowns {len(system.last_detection_time)} | messages "
+                      f"{len(system.last_shown_message)} | tracks {len(tracker.tracks)}",
+                      file=sys.stderr)
+        system.attendance_writer.close()
+        system.store.close()
+        logs = len([name for name in os.listdir(system.attendance_dir) if name.endswith(".txt")])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Allocator and caches settle in the first days, growth after that is a leak
+    warm = samples[min(args.warmup_days, len(samples) - 1)]
+    growth = max(samples[-3:]) - warm
+    print(f"📈 {len(samples)} days, {logs} daily logs, RSS {warm:.1f} → {samples[-1]:.1f} MB "
+          f"(growth {growth:+.1f} MB after day {args.warmup_days + 1}, limit {args.max_growth_mb:.0f} MB)")
+    if growth > args.max_growth_mb:
+        print("❌ RSS keeps growing")
+        return 1
+    print("✅ RSS flat")
+    return 0
+
+
+def e2e(args):
+    """The full headless verification loop over a recording
+
+    Runs on a copy of the face database with empty attendance logs, so every
+    person in the recording can be marked. Reports capture and recognition
+    frames/sec and the time from a face's first frame to its check-in.
+    """
+    from app import ProFaceAttendanceSystem
+    from sources import parse_speed
+
+    speed = parse_speed(args.speed)
+    recording = os.path.abspath(args.recording)
+    database = os.path.abspath(args.database)
+    workdir = tempfile.mkdtemp(prefix="face_e2e_")
+    cwd = os.getcwd()
+    try:
+        shutil.copytree(database, os.path.join(workdir, "face_database"))
+        os.chdir(workdir)
+        system = ProFaceAttendanceSystem(search_mode=args.search, camera_sources=[recording],
+                                         headless=True, motion_gate=not args.no_motion_gate,
+                                         quality_gate=not args.no_quality_gate,
+                                         replay_speed=args.speed)
+        system.ensure_vision()
+        t0 = time.time()
+        system.auto_verify_attendance()
+        elapsed = time.time() - t0
+        snapshot = system.metrics.to_dict()
+        system.close_gallery()
+        system.attendance_writer.close()
+        system.store.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    counters = snapshot['counters']
+    waits = sorted(seconds for _, seconds in system.checkin_latency)
+    report = {
+        'meta': dict(environment(), recording=recording, speed=args.speed),
+        'seconds': elapsed,
+        'frames_captured': counters.get('frames_captured', 0),
+        'frames_processed': counters.get('frames_processed', 0),
+        'frames_dropped': counters.get('frames_dropped', 0),
+        'frames_idle': counters.get('frames_idle', 0),
+        'frames_drained': counters.get('frames_drained', 0),
+        'capture_fps': counters.get('frames_captured', 0) / elapsed if elapsed else 0.0,
+        'recognition_fps': counters.get('frames_processed', 0) / elapsed if elapsed else 0.0,
+        'checkins': len(waits),
+        'time_to_attendance_s': {roll_no: round(seconds, 3) for roll_no, seconds in system.checkin_latency},
+        'time_to_attendance': summarize(waits) if waits else None,
+    }
+
+    print("\n" + "="*70)
+    print(f"🎬 END-TO-END | {os.path.basename(recording)} at "
+          + (f"{speed} speed" if isinstance(speed, str) else f"{speed:g} FPS"))
+    print("="*70)
+    print(f"Frames: {report['frames_captured']} captured, {report['frames_processed']} recognised, "
+          f"{report['frames_dropped']} dropped, {report['frames_idle']} idle in {elapsed:.1f}s")
+    print(f"Capture: {report['capture_fps']:.1f} FPS | Recognition: {report['recognition_fps']:.1f} FPS")
+    if waits:
+        stats = report['time_to_attendance']
+        print(f"Time to attendance ({len(waits)} faces, ms): p50 {stats['p50_ms']:.0f} | "
+              f"p90 {stats['p90_ms']:.0f} | max {stats['max_ms']:.0f}")
+        for roll_no, seconds in report['time_to_attendance_s'].items():
+            print(f"  {roll_no:<15} {seconds * 1000:8.0f} ms")
+    else:
+        print("Time to attendance: nobody was marked")
+    print("="*70)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved {args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognition hot path benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run the benchmark suite")
+    run_p.add_argument("--stages", help=f"comma separated subset of {','.join(ALL_STAGES)}")
+    run_p.add_argument("--repeats", type=int, default=20)
+    run_p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                       help="gallery sizes (vectors) for matching")
+    run_p.add_argument("--people", type=int, nargs="+", default=[100, 1000, 5000],
+                       help="database sizes for save_database")
+    run_p.add_argument("--log-lines", type=int, nargs="+", default=[1000, 10000, 100000],
+                       help="daily log sizes for load_today_attendance")
+    run_p.add_argument("--ann", action="store_true", help="also time IVF matching")
+    run_p.add_argument("--images", help="folder with sample face images")
+    run_p.add_argument("--output", help="write JSON results here")
+    run_p.add_argument("--baseline", help="flag regressions against this JSON")
+    run_p.add_argument("--threshold", type=float, default=0.15)
+
+    cmp_p = sub.add_parser("compare", help="compare two saved runs")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=0.15)
+
+    soak_p = sub.add_parser("soak", help="simulate weeks of uptime and check that RSS stays flat")
+    soak_p.add_argument("--days", type=int, default=21)
+    soak_p.add_argument("--frames-per-day", type=int, default=1500)
+    soak_p.add_argument("--people", type=int, default=500)
+    soak_p.add_argument("--warmup-days", type=int, default=2)
+    soak_p.add_argument("--max-growth-mb", type=float, default=4.0)
+
+    e2e_p = sub.add_parser("e2e", help="headless verification loop over a .frec recording")
+    e2e_p.add_argument("recording", help="session saved with app.py --record")
+    e2e_p.add_argument("--database", default="face_database",
+                       help="face database directory the recording is checked against")
+    e2e_p.add_argument("--speed", default="original", help="original, fast or frames per second")
+    e2e_p.add_argument("--search", choices=["exact", "ivf"], default="exact")
+    e2e_p.add_argument("--no-motion-gate", action="store_true")
+    e2e_p.add_argument("--no-quality-gate", action="store_true")
+    e2e_p.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sys.exit(run(args))
+    if args.command == "soak":
+        sys.exit(soak(args))
+    if args.command == "e2e":
+        sys.exit(e2e(args))
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Bulk enrollment from a CSV manifest and one photo folder per person
+
+The manifest has roll_no, name and department columns (an optional
+``photos`` column overrides the folder, default ``<photos_dir>/<roll_no>``).
+Photos are detected and encoded in a process pool. Images with no face or
+with several faces are rejected, as are faces failing the quality gate
+(small, blurred, dark or turned away); the best-scoring photos are the ones
+encoded. A person whose encodings are very close
+to somebody already in the gallery is flagged as a likely duplicate instead of
+being enrolled. Results are written to the face database in batches and every
+finished person is appended to a checkpoint file, so an interrupted run
+resumes where it stopped.
+
+    python bulk_enroll.py students.csv photos/ --workers 8
+    python bulk_enroll.py students.csv photos/ --report enroll_issues.csv
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+import cv2
+import face_recognition
+
+from detection import detect_scaled
+from gallery import FaceGallery
+from quality import QualityGate, crop_face
+from storage import FaceStore
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# Detection runs on a copy at most this many pixels on the long side
+DETECT_MAX_SIDE = 1000
+
+# Per-worker state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(max_samples, quality_gate=True):
+    _worker['max_samples'] = max_samples
+    _worker['gate'] = QualityGate() if quality_gate else None
+
+
+def read_manifest(manifest, photos_dir):
+    """Manifest rows as dicts with roll_no, name, department and photos folder"""
+    people = []
+    with open(manifest, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            if not row.get('roll_no') or not row.get('name'):
+                continue
+            folder = row.get('photos') or os.path.join(photos_dir, row['roll_no'])
+            if not os.path.isabs(folder) and row.get('photos'):
+                folder = os.path.join(photos_dir, folder)
+            people.append({'roll_no': row['roll_no'], 'name': row['name'],
+                           'department': row.get('department', ''), 'photos': folder})
+    return people
+
+
+def list_photos(folder):
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+
+
+def encode_person(person):
+    """Worker entry point, returns (person, encodings, rejected [(path, reason)])"""
+    encodings = []
+    rejected = []
+    photos = list_photos(person['photos'])
+    if not photos:
+        rejected.append((person['photos'], 'no photos'))
+
+    candidates = []  # (score, face crop, box in crop)
+    gate = _worker['gate']
+    for path in photos:
+        frame = cv2.imread(path)
+        if frame is None:
+            rejected.append((path, 'unreadable'))
+            continue
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        scale = min(1.0, DETECT_MAX_SIDE / max(rgb_frame.shape[:2]))
+        locations = detect_scaled(rgb_frame, scale, upsample=1)
+        if len(locations) != 1:
+            rejected.append((path, 'no face' if not locations else f'{len(locations)} faces'))
+            continue
+        quality = gate.assess(rgb_frame, locations[0]) if gate else {'ok': True, 'score': 0.0}
+        if not quality['ok']:
+            rejected.append((path, f"low quality: {quality['reason']}"))
+            continue
+        candidates.append((quality['score'], path, *crop_face(rgb_frame, locations[0])))
+
+    # Encode the best photos first, stop once max_samples are kept
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    for score, path, crop, location in candidates:
+        if len(encodings) >= _worker['max_samples']:
+            break
+        found = face_recognition.face_encodings(crop, [location])
+        if found:
+            encodings.append(found[0])
+        else:
+            rejected.append((path, 'no encoding'))
+    return person, encodings, rejected
+
+
+class Checkpoint:
+    """Append-only JSONL of finished roll numbers"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.done[entry['roll_no']] = entry['status']
+        self.file = open(path, 'a')
+
+    def record(self, entries):
+        for roll_no, status in entries:
+            self.file.write(json.dumps({'roll_no': roll_no, 'status': status}) + "\n")
+            self.done[roll_no] = status
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def find_duplicate(gallery, roll_no, encodings, tolerance):
+    """Closest other person within tolerance of any of the encodings, or None"""
+    if not encodings or len(gallery) == 0:
+        return None
+    best = None
+    for person, distance in gallery.match_many(encodings, tolerance=tolerance):
+        if person is not None and person['roll_no'] != roll_no:
+            if best is None or distance < best[1]:
+                best = (person, distance)
+    return best
+
+
+def run_enrollment(store, people, checkpoint_path, report_path=None, workers=None,
+                   min_samples=1, max_samples=5, duplicate_tolerance=0.45,
+                   allow_duplicates=False, batch_size=100, update=False, quality_gate=True):
+    """Enroll manifest people with a process pool, returns a summary dict"""
+    gallery = FaceGallery.from_registered_faces(store.load_all())
+    checkpoint = Checkpoint(checkpoint_path)
+    existing = set(gallery.id_by_roll)
+
+    todo = [p for p in people if p['roll_no'] not in checkpoint.done
+            and (update or p['roll_no'] not in existing)]
+    skipped = len(people) - len(todo)
+    counts = {'enrolled': 0, 'rejected': 0, 'duplicate': 0}
+    # A resumed run appends to the report of the interrupted one
+    report = report_writer = None
+    if report_path:
+        resuming = bool(checkpoint.done) and os.path.exists(report_path)
+        report = open(report_path, 'a' if resuming else 'w', newline='')
+        report_writer = csv.writer(report)
+        if not resuming:
+            report_writer.writerow(['roll_no', 'path', 'reason'])
+
+    workers = workers or os.cpu_count() or 1
+    print("\n" + "="*70)
+    print(f"👥 BULK ENROLLMENT | {len(todo)} people on {workers} workers "
+          f"({skipped} already done or registered)")
+    print("="*70)
+
+    pending = []   # (roll_no, data) waiting for the next batched write
+    finished = []  # (roll_no, status) waiting for the checkpoint
+
+    def flush():
+        if pending:
+            store.save_people(pending)
+        checkpoint.record(finished)
+        if report:
+            report.flush()
+        pending.clear()
+        finished.clear()
+
+    t0 = time.time()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(max_samples, quality_gate)) as pool:
+        for done, (person, encodings, rejected) in enumerate(
+                pool.imap_unordered(encode_person, todo, chunksize=4), 1):
+            roll_no = person['roll_no']
+            if report_writer:
+                for path, reason in rejected:
+                    report_writer.writerow([roll_no, path, reason])
+
+            duplicate = find_duplicate(gallery, roll_no, encodings, duplicate_tolerance)
+            if len(encodings) < min_samples:
+                status = 'rejected'
+            elif duplicate and not allow_duplicates:
+                status = 'duplicate'
+            else:
+                status = 'enrolled'
+            if duplicate and report_writer:
+                other, distance = duplicate
+                report_writer.writerow([roll_no, '', f"likely duplicate of {other['roll_no']} "
+                                                     f"({other['name']}), distance {distance:.3f}"])
+
+            if status == 'enrolled':
+                data = {
+                    'name': person['name'],
+                    'roll_no': roll_no,
+                    'department': person['department'],
+                    'encodings': encodings,
+                    'registered_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'last_attendance': None,
+                    'total_attendance': 0
+                }
+                if roll_no in gallery.id_by_roll:
+                    gallery.remove_person(roll_no)
+                # Later manifest rows are checked against this person too
+                gallery.add_person(roll_no, data)
+                pending.append((roll_no, data))
+            counts[status] += 1
+            finished.append((roll_no, status))
+
+            if len(finished) >= batch_size:
+                flush()
+            elapsed = time.time() - t0
+            print(f"\r  ⏳ {done}/{len(todo)} | {done / elapsed if elapsed else 0:.1f} people/s | "
+                  f"enrolled {counts['enrolled']} | rejected {counts['rejected']} | "
+                  f"duplicates {counts['duplicate']}", end="")
+    flush()
+    checkpoint.close()
+    if report:
+        report.close()
+
+    elapsed = time.time() - t0
+    summary = dict(counts, skipped=skipped, seconds=elapsed)
+    print("\n" + "="*70)
+    print(f"✅ Enrolled {counts['enrolled']} in {elapsed:.1f}s | rejected {counts['rejected']} | "
+          f"likely duplicates {counts['duplicate']}")
+    if report_path:
+        print(f"   Rejected images and duplicates: {report_path}")
+    print("="*70)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk enrollment from a manifest and photo folders")
+    parser.add_argument("manifest", help="CSV with roll_no, name, department (optional photos column)")
+    parser.add_argument("photos_dir", help="folder containing one sub-folder of photos per roll_no")
+    parser.add_argument("--database", default=os.path.join("face_database", "face_database.db"))
+    parser.add_argument("--checkpoint", default=None,
+                        help="progress file (default: <manifest>.checkpoint.jsonl)")
+    parser.add_argument("--report", default="enroll_report.csv",
+                        help="CSV of rejected images and likely duplicates")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--min-samples", type=int, default=1, help="usable photos needed per person")
+    parser.add_argument("--max-samples", type=int, default=5, help="encodings kept per person")
+    parser.add_argument("--duplicate-tolerance", type=float, default=0.45,
+                        help="flag people closer than this to someone already registered")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="enroll likely duplicates anyway (they are still reported)")
+    parser.add_argument("--batch-size", type=int, default=100, help="people per database transaction")
+    parser.add_argument("--update", action="store_true",
+                        help="re-enroll roll numbers that are already registered")
+    parser.add_argument("--no-quality-gate", action="store_true",
+                        help="accept small, blurred, dark or turned-away faces")
+    args = parser.parse_args()
+
+    people = read_manifest(args.manifest, args.photos_dir)
+    if not people:
+        print("❌ Manifest has no rows with roll_no and name!")
+        return
+
+    os.makedirs(os.path.dirname(args.database) or ".", exist_ok=True)
+    store = FaceStore(args.database)
+    try:
+        run_enrollment(store, people, args.checkpoint or args.manifest + ".checkpoint.jsonl",
+                       args.report, args.workers, args.min_samples, args.max_samples,
+                       args.duplicate_tolerance, args.allow_duplicates, args.batch_size, args.update,
+                       not args.no_quality_gate)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Quantized, memory-mapped gallery for very large databases
+
+The in-memory FaceGallery needs every encoding loaded from the database
+first (float64 rows, ~1 KB per sample plus object overhead) and then copied
+into a float32 matrix. This format keeps the vectors on disk in the
+gallery directory:
+
+    gallery.json              manifest: database version, dtype, scale, people
+    gallery-<gen>.codes.npy   int8 (or float16) codes, N x 128, scanned per query
+    gallery-<gen>.exact.npy   float32 originals, only the reranked rows are read
+    gallery-<gen>.rows.npy    person id per row
+    gallery-<gen>.norms.npy   squared norms of the dequantized codes
+    gallery.delta.npz         changes since <gen>: new people's vectors, removed ids
+
+Both vector files are memory-mapped at startup, so loading costs a JSON
+parse and the resident set is ~136 bytes per sample (int8) instead of ~1.6 KB.
+A query scores all codes in chunks, keeps the `rerank` closest rows and
+picks the best one by exact float32 distance. People registered or deleted
+after the files were written are kept in a small in-memory FaceGallery and a
+tombstone mask. save() persists just those in the delta file, and only
+rewrites the whole gallery (compact()) once they pass `compact_rows` rows
+or on shutdown.
+"""
+import json
+import os
+
+import numpy as np
+
+from gallery import ENCODING_SIZE, FaceGallery
+
+MANIFEST = "gallery.json"
+DELTA = "gallery.delta.npz"
+DTYPES = ('int8', 'float16')
+
+
+def quantize(vectors, dtype='int8'):
+    """(codes, per-dimension scale) for float32 vectors"""
+    if dtype == 'float16':
+        return vectors.astype(np.float16), np.ones(ENCODING_SIZE, dtype=np.float32)
+    peak = np.abs(vectors).max(axis=0) if len(vectors) else np.zeros(ENCODING_SIZE)
+    scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def _prefix(directory, generation):
+    return os.path.join(directory, f"gallery-{generation}")
+
+
+def write_gallery(directory, vectors, ids, people, version, dtype='int8'):
+    """Write a new generation of the compact files, returns its manifest"""
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    generation = previous['generation'] + 1 if previous else 1
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+    codes, scale = quantize(vectors, dtype)
+    decoded = codes.astype(np.float32) * scale
+    prefix = _prefix(directory, generation)
+    np.save(prefix + ".codes.npy", codes)
+    np.save(prefix + ".exact.npy", vectors)
+    np.save(prefix + ".rows.npy", np.asarray(ids, dtype=np.int32))
+    np.save(prefix + ".norms.npy", np.einsum('ij,ij->i', decoded, decoded))
+
+    manifest = {
+        'generation': generation,
+        'version': version,
+        'dtype': dtype,
+        'size': len(vectors),
+        'scale': scale.tolist(),
+        'people': {str(pid): info for pid, info in people.items()},
+    }
+    # The manifest is the commit point: a crash before it leaves the old generation live
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+    if previous:
+        _remove_generation(directory, previous['generation'])
+        try:
+            os.remove(os.path.join(directory, DELTA))  # folded into this generation
+        except OSError:
+            pass
+    return manifest
+
+
+def _remove_generation(directory, generation):
+    for suffix in (".codes.npy", ".exact.npy", ".rows.npy", ".norms.npy"):
+        try:
+            os.remove(_prefix(directory, generation) + suffix)
+        except OSError:
+            pass  # still mapped (Windows) or already gone
+
+
+def write_delta(directory, generation, version, vectors, ids, people, removed):
+    """Atomically replace the delta file of `generation`"""
+    meta = json.dumps({'generation': generation, 'version': version,
+                       'people': {str(pid): info for pid, info in people.items()}})
+    path = os.path.join(directory, DELTA)
+    with open(path + ".tmp", 'wb') as f:
+        np.savez(f, vectors=np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE),
+                 ids=np.asarray(ids, dtype=np.int32), removed=np.asarray(sorted(removed), dtype=np.int32),
+                 meta=np.array(meta))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def read_delta(directory, generation):
+    """(meta, vectors, ids, removed) of the delta file, None if missing or for another generation"""
+    try:
+        with np.load(os.path.join(directory, DELTA)) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['generation'] != generation:
+                return None
+            return meta, data['vectors'], data['ids'], data['removed']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class CompactGallery:
+    """FaceGallery-compatible matcher over memory-mapped quantized vectors"""
+
+    def __init__(self, directory, manifest, rerank=32, chunk_rows=16384, compact_rows=4096):
+        self.directory = directory
+        self.rerank = rerank
+        self.chunk_rows = chunk_rows
+        self.compact_rows = compact_rows
+        self._load(manifest)
+
+    def _load(self, manifest):
+        prefix = _prefix(self.directory, manifest['generation'])
+        self.generation = manifest['generation']
+        self.version = manifest['version']
+        self.dtype = manifest['dtype']
+        self.scale = np.asarray(manifest['scale'], dtype=np.float32)
+        self.codes = np.load(prefix + ".codes.npy", mmap_mode='r')
+        self.exact = np.load(prefix + ".exact.npy", mmap_mode='r')
+        self.row_ids = np.load(prefix + ".rows.npy")
+        self.norms = np.load(prefix + ".norms.npy")
+        if not (len(self.codes) == len(self.exact) == len(self.row_ids) == manifest['size']):
+            raise ValueError(f"{prefix}: files do not match the manifest")
+        self.alive = np.ones(len(self.codes), dtype=bool)
+        self.dead = 0
+        self.removed = set()
+
+        self.people = {int(pid): info for pid, info in manifest['people'].items()}
+        self.id_by_roll = {info['roll_no']: pid for pid, info in self.people.items()}
+        self._next_id = max(self.people, default=-1) + 1
+        # Registered since the files were written
+        self.delta = FaceGallery(capacity=64)
+
+        delta = read_delta(self.directory, self.generation)
+        if delta is not None:
+            meta, vectors, ids, removed = delta
+            self.version = meta['version']
+            for person_id in removed.tolist():
+                self._tombstone(person_id)
+            if len(vectors):
+                self.delta = FaceGallery.from_arrays(
+                    vectors, ids, {int(pid): info for pid, info in meta['people'].items()})
+
+    @classmethod
+    def open(cls, directory, version=None, **kwargs):
+        """Map the newest generation and its delta, None if missing or older than `version`"""
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return None
+        try:
+            gallery = cls(directory, manifest, **kwargs)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Compact gallery unreadable, rebuilding: {e}")
+            return None
+        if version is not None and gallery.version != version:
+            return None
+        return gallery
+
+    @classmethod
+    def build(cls, directory, registered_faces, version, dtype='int8', **kwargs):
+        """Write the files from a registered faces dict and map them"""
+        vectors, ids, people = FaceGallery.from_registered_faces(registered_faces).to_arrays()
+        return cls(directory, write_gallery(directory, vectors, ids, people, version, dtype), **kwargs)
+
+    def __len__(self):
+        return len(self.codes) - self.dead + len(self.delta)
+
+    @property
+    def nbytes(self):
+        """Resident bytes scanned per query (codes, ids and norms)"""
+        return self.codes.nbytes + self.row_ids.nbytes + self.norms.nbytes
+
+    def add_person(self, roll_no, data):
+        self.remove_person(roll_no)
+        return self.delta.add_person(roll_no, data)
+
+    def remove_person(self, roll_no):
+        self.delta.remove_person(roll_no)
+        person_id = self.id_by_roll.get(roll_no)
+        if person_id is not None:
+            self._tombstone(person_id)
+
+    def _tombstone(self, person_id):
+        info = self.people.pop(person_id, None)
+        if info is None:
+            return
+        del self.id_by_roll[info['roll_no']]
+        self.removed.add(person_id)
+        rows = self.row_ids == person_id
+        self.alive[rows] = False
+        self.dead += int(rows.sum())
+
+    def to_arrays(self):
+        """(vectors, ids, people) of everything live, like FaceGallery.to_arrays()"""
+        vectors = [np.asarray(self.exact[self.alive] if self.dead else self.exact)]
+        ids = [self.row_ids[self.alive]]
+        people = dict(self.people)
+        next_id = self._next_id
+        delta_ids = self.delta.ids[:len(self.delta)]
+        for pid, info in self.delta.people.items():
+            rows = delta_ids == pid
+            vectors.append(self.delta.vectors[rows])
+            ids.append(np.full(int(rows.sum()), next_id, dtype=np.int32))
+            people[next_id] = info
+            next_id += 1
+        return (np.concatenate(vectors).astype(np.float32, copy=False),
+                np.concatenate(ids), people)
+
+    def save(self, version):
+        """Persist pending changes: the small delta file, a new generation once it is large"""
+        if self.version == version:
+            return
+        if len(self.delta) + self.dead > self.compact_rows:
+            self.compact(version)
+            return
+        vectors, ids, people = self.delta.to_arrays()
+        write_delta(self.directory, self.generation, version, vectors, ids, people, self.removed)
+        self.version = version
+
+    def compact(self, version):
+        """Write the next generation with pending changes folded in and map it"""
+        if self.version == version and not self.dead and not len(self.delta):
+            return
+        vectors, ids, people = self.to_arrays()
+        manifest = write_gallery(self.directory, vectors, ids, people, version, self.dtype)
+        self._load(manifest)
+
+    def _coarse(self, queries):
+        """Approximate squared distances minus |q|^2 (queries x rows)"""
+        scaled = queries * self.scale
+        size = len(self.codes)
+        scores = np.empty((len(queries), size), dtype=np.float32)
+        block = np.empty((min(self.chunk_rows, size), ENCODING_SIZE), dtype=np.float32)
+        for start in range(0, size, self.chunk_rows):
+            codes = self.codes[start:start + self.chunk_rows]
+            chunk = block[:len(codes)]
+            chunk[...] = codes  # int8 -> float32 one chunk at a time
+            np.matmul(scaled, chunk.T, out=scores[:, start:start + len(codes)])
+        scores *= -2.0
+        scores += self.norms
+        if self.dead:
+            scores[:, ~self.alive] = np.inf
+        return scores
+
+    def search(self, queries):
+        """Best row and exact distance per query over the mapped rows"""
+        count = len(queries)
+        size = len(self.codes)
+        if size == self.dead:
+            return np.full(count, -1), np.full(count, np.inf, dtype=np.float32)
+
+        scores = self._coarse(queries)
+        k = min(self.rerank, size)
+        if k < size:
+            candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(size), (count, size))
+
+        # Exact float32 distances on the few candidate rows only
+        vectors = self.exact[candidates.ravel()].reshape(count, k, ENCODING_SIZE)
+        dist = np.sqrt(np.einsum('qkd,qkd->qk', vectors - queries[:, None, :],
+                                 vectors - queries[:, None, :]))
+        dist[~self.alive[candidates]] = np.inf
+        best = np.argmin(dist, axis=1)
+        return candidates[np.arange(count), best], dist[np.arange(count), best]
+
+    def match_many(self, encodings, tolerance=0.6):
+        """Best match per query as a list of (person, distance)"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(self) == 0 or len(queries) == 0:
+            return [(None, float('inf')) for _ in range(len(queries))]
+
+        best_rows, best_dist = self.search(queries)
+        recent = self.delta.match_many(queries, tolerance=np.inf) if len(self.delta) else None
+
+        results = []
+        for i, (row, distance) in enumerate(zip(best_rows, best_dist)):
+            distance = float(distance)
+            person = self.people[int(self.row_ids[row])] if row >= 0 and distance < np.inf else None
+            if recent and recent[i][1] < distance:
+                person, distance = recent[i]
+            results.append((person if distance <= tolerance else None, distance))
+        return results
+
+    def match(self, encoding, tolerance=0.6):
+        """Best match for one encoding as (person, distance)"""
+        return self.match_many([encoding], tolerance)[0]
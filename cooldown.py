@@ -0,0 +1,40 @@
+"""Expiring, size-bounded "last seen" timestamps per key
+
+Replaces the plain dicts of per-person cooldowns and console messages: an
+entry older than `ttl` no longer matters, so it is dropped, and at most
+`max_keys` entries are kept however many people walk past in a month.
+"""
+from collections import OrderedDict
+
+
+class Cooldowns:
+    """key -> last timestamp, oldest first"""
+
+    def __init__(self, ttl, max_keys=4096):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._stamps = OrderedDict()
+
+    def touch(self, key, now):
+        self._stamps[key] = now
+        self._stamps.move_to_end(key)
+        self.prune(now)
+
+    def since(self, key, now):
+        """Seconds since `key` was touched, inf when unknown or expired"""
+        stamp = self._stamps.get(key)
+        if stamp is None or now - stamp > self.ttl:
+            return float('inf')
+        return now - stamp
+
+    def prune(self, now):
+        stamps = self._stamps
+        while stamps and (len(stamps) > self.max_keys
+                          or now - next(iter(stamps.values())) > self.ttl):
+            stamps.popitem(last=False)
+
+    def clear(self):
+        self._stamps.clear()
+
+    def __len__(self):
+        return len(self._stamps)
@@ -0,0 +1,116 @@
+"""Parallel face encoding for crowded frames
+
+face_encodings runs landmarks + the 128-d network one face after the other,
+so a frame with 15 faces costs 15 encodings in a row. CrowdEncoder copies the
+frame once into a shared-memory slot, sends each worker only the slot name
+and one face box, and gathers the encodings in box order: per-frame time
+stays roughly flat up to one face per worker. Frames with fewer than
+`min_faces` faces are encoded in-process, where the round trip is not worth it.
+A face that cannot be encoded comes back as None.
+"""
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+
+import face_recognition
+import numpy as np
+
+# Per-worker state: attached shared memory by slot index
+_worker = {}
+
+
+def _init_worker(num_jitters, model):
+    _worker['slots'] = {}
+    _worker['num_jitters'] = num_jitters
+    _worker['model'] = model
+
+
+def _attach(index, name):
+    """Mapping of slot `index`, re-attached when the slot was grown (new name)"""
+    shm = _worker['slots'].get(index)
+    if shm is not None and shm.name != name:
+        shm.close()
+        shm = None
+    if shm is None:
+        shm = _worker['slots'][index] = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def _encode_face(task):
+    """Worker entry point: encoding of one face of the frame in a slot"""
+    index, name, shape, location = task
+    shm = _attach(index, name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    encodings = face_recognition.face_encodings(frame, [location], num_jitters=_worker['num_jitters'],
+                                                model=_worker['model'])
+    return encodings[0] if encodings else None
+
+
+class _Slot:
+    """Shared frame buffer, grown (re-created) when a bigger frame arrives"""
+
+    def __init__(self, index):
+        self.index = index
+        self.shm = None
+
+    def load(self, rgb_frame):
+        if self.shm is None or self.shm.size < rgb_frame.nbytes:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=rgb_frame.nbytes)
+        np.copyto(np.ndarray(rgb_frame.shape, dtype=np.uint8, buffer=self.shm.buf), rgb_frame)
+        return self.shm.name
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class CrowdEncoder:
+    """Worker pool encoding the faces of one frame in parallel"""
+
+    def __init__(self, workers=None, min_faces=3, slots=4, num_jitters=1, model='small'):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_faces = min_faces
+        self.num_jitters = num_jitters
+        self.model = model
+        # Spawned, not forked: the caller has capture and recognition threads running
+        ctx = multiprocessing.get_context('spawn')
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(num_jitters, model))
+        # One slot per concurrent caller (recognition worker threads)
+        self.slots = queue.Queue()
+        self._all_slots = []
+        for index in range(slots):
+            slot = _Slot(index)
+            self._all_slots.append(slot)
+            self.slots.put(slot)
+        self.frames = 0
+        self.faces = 0
+
+    def encode(self, rgb_frame, locations):
+        """Encodings for `locations` in order, like face_recognition.face_encodings"""
+        if len(locations) < self.min_faces:
+            return face_recognition.face_encodings(rgb_frame, locations, num_jitters=self.num_jitters,
+                                                   model=self.model)
+        rgb_frame = np.ascontiguousarray(rgb_frame, dtype=np.uint8)
+        slot = self.slots.get()
+        try:
+            name = slot.load(rgb_frame)
+            encodings = self.pool.map(_encode_face, [(slot.index, name, rgb_frame.shape, tuple(location))
+                                                     for location in locations], chunksize=1)
+        finally:
+            self.slots.put(slot)
+        self.frames += 1
+        self.faces += len(locations)
+        return encodings
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+        for slot in self._all_slots:
+            slot.close()
@@ -0,0 +1,163 @@
+"""Adaptive-resolution face detection with a per-frame latency budget
+
+Detection runs on a downscaled frame, or only on a region of interest
+around recently seen faces, and boxes are mapped back to full resolution
+so encoding still uses full-resolution pixels. A small controller walks a
+ladder of (scale, upsample, model) settings to stay under `budget_ms`, and
+steps up again when faces get too small for the current setting.
+"""
+import threading
+import time
+
+import cv2
+import face_recognition
+
+
+def build_levels(scales=(0.25, 0.33, 0.5, 0.75, 1.0), allow_cnn=False):
+    """Detector settings ordered from cheapest to most expensive"""
+    # Cost of HOG grows with the effective resolution. Upsampling a
+    # downscaled frame is wasted work, so only upsample at full scale.
+    levels = [(scale, 0, 'hog') for scale in sorted(scales)]
+    levels.append((max(scales), 1, 'hog'))
+
+    if allow_cnn:
+        levels += [(scale, 0, 'cnn') for scale in scales if scale >= 0.5]
+    return levels
+
+
+def detect_scaled(rgb_frame, scale=1.0, upsample=1, model='hog', region=None):
+    """face_locations on a downscaled frame (or region), boxes at full resolution
+
+    region is (top, right, bottom, left) in full-resolution pixels.
+    """
+    h, w = rgb_frame.shape[:2]
+    top, right, bottom, left = region if region is not None else (0, w, h, 0)
+    crop = rgb_frame[top:bottom, left:right]
+    if crop.size == 0:
+        return []
+
+    if scale != 1.0:
+        small = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small = crop
+    boxes = face_recognition.face_locations(small, number_of_times_to_upsample=upsample,
+                                            model=model)
+
+    mapped = []
+    for (t, r, b, l) in boxes:
+        mapped.append((
+            max(0, min(h, int(t / scale) + top)),
+            max(0, min(w, int(r / scale) + left)),
+            max(0, min(h, int(b / scale) + top)),
+            max(0, min(w, int(l / scale) + left))
+        ))
+    return mapped
+
+
+class AdaptiveDetector:
+    """face_locations wrapper that adapts its cost to a time budget"""
+
+    def __init__(self, budget_ms=60, allow_cnn=False, start_scale=0.5,
+                 min_face_px=80, roi_margin=0.6, full_scan_interval=0.5,
+                 recent_face_ttl=1.0, smoothing=0.3):
+        self.budget_ms = budget_ms
+        self.levels = build_levels(allow_cnn=allow_cnn)
+        self.level = next(i for i, level in enumerate(self.levels)
+                          if level[0] >= start_scale and level[1] == 0)
+
+        # HOG needs roughly 80px faces without upsampling
+        self.min_face_px = min_face_px
+        self.roi_margin = roi_margin
+        self.full_scan_interval = full_scan_interval
+        self.recent_face_ttl = recent_face_ttl
+        self.smoothing = smoothing
+
+        self.avg_ms = None
+        self.last_ms = 0.0
+        self.last_full_scan = 0.0
+        self.recent_boxes = []
+        self.recent_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def setting(self):
+        """Current (scale, upsample, model)"""
+        return self.levels[self.level]
+
+    def describe(self):
+        scale, upsample, model = self.setting
+        return f"{scale:.2f}x {model} up{upsample} ({self.avg_ms or 0:.0f}/{self.budget_ms} ms)"
+
+    def _detect_region(self, rgb_frame, region, setting):
+        scale, upsample, model = setting
+        return detect_scaled(rgb_frame, scale, upsample, model, region)
+
+    def _roi(self, shape):
+        """Bounding region around recent faces, expanded by the margin"""
+        h, w = shape[:2]
+        top = min(box[0] for box in self.recent_boxes)
+        right = max(box[1] for box in self.recent_boxes)
+        bottom = max(box[2] for box in self.recent_boxes)
+        left = min(box[3] for box in self.recent_boxes)
+        pad_x = int((right - left) * self.roi_margin) + 20
+        pad_y = int((bottom - top) * self.roi_margin) + 20
+        return (max(0, top - pad_y), min(w, right + pad_x),
+                min(h, bottom + pad_y), max(0, left - pad_x))
+
+    def detect(self, rgb_frame):
+        """Face boxes at full resolution in (top, right, bottom, left) order"""
+        h, w = rgb_frame.shape[:2]
+        now = time.time()
+
+        with self._lock:
+            setting = self.setting
+            use_roi = bool(self.recent_boxes) \
+                and now - self.recent_time < self.recent_face_ttl \
+                and now - self.last_full_scan < self.full_scan_interval
+            region = self._roi(rgb_frame.shape) if use_roi else (0, w, h, 0)
+            if not use_roi:
+                self.last_full_scan = now
+
+        t0 = time.perf_counter()
+        boxes = self._detect_region(rgb_frame, region, setting)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        with self._lock:
+            if boxes:
+                self.recent_boxes = boxes
+                self.recent_time = now
+            # Only full scans drive the controller, ROI scans are cheaper
+            if not use_roi:
+                self._adapt(elapsed_ms, boxes, setting)
+        return boxes
+
+    def _adapt(self, elapsed_ms, boxes, setting):
+        """Move one step along the level ladder"""
+        self.last_ms = elapsed_ms
+        if self.avg_ms is None:
+            self.avg_ms = elapsed_ms
+        else:
+            self.avg_ms += self.smoothing * (elapsed_ms - self.avg_ms)
+
+        scale, upsample, _ = setting
+        effective = scale * 2 ** upsample
+        smallest = min((min(b - t, r - l) for (t, r, b, l) in boxes), default=None)
+        faces_too_small = smallest is not None and smallest * effective < self.min_face_px * 1.2
+
+        # Never step down into a level where the current faces get too small
+        lower_ok = True
+        if self.level > 0 and smallest is not None:
+            lower_scale, lower_upsample, _ = self.levels[self.level - 1]
+            lower_ok = smallest * lower_scale * 2 ** lower_upsample >= self.min_face_px * 1.2
+
+        if faces_too_small and self.level < len(self.levels) - 1 \
+                and self.avg_ms < 2 * self.budget_ms:
+            # Small or far faces: back off the downscaling first
+            self.level += 1
+        elif self.avg_ms > self.budget_ms * 1.1 and self.level > 0 \
+                and (lower_ok or self.avg_ms > 2 * self.budget_ms):
+            self.level -= 1
+            self.avg_ms = None
+        elif self.avg_ms < self.budget_ms * 0.5 and self.level < len(self.levels) - 1:
+            self.level += 1
+            self.avg_ms = None
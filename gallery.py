@@ -0,0 +1,187 @@
+"""Vectorized face gallery used for matching registered faces"""
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+class FaceGallery:
+    """All registered face samples in one contiguous float32 matrix"""
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self.matrix = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.ids = np.full(capacity, -1, dtype=np.int32)
+        self.size = 0
+
+        # identity id -> {'roll_no', 'name', 'department'}
+        self.people = {}
+        self.id_by_roll = {}
+        self._next_id = 0
+
+        # Optional approximate index (see ann_index.py)
+        self.ann = None
+        self.ann_min_size = 0
+
+    @classmethod
+    def from_registered_faces(cls, registered_faces):
+        """Build gallery from the registered faces dict"""
+        total = sum(len(data['encodings']) for data in registered_faces.values())
+        gallery = cls(capacity=max(total, 1024))
+        for roll_no, data in registered_faces.items():
+            gallery.add_person(roll_no, data)
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, vectors, ids, people):
+        """Rebuild a gallery from to_arrays() output (e.g. in a worker process)"""
+        gallery = cls(capacity=max(len(vectors), 1024))
+        gallery.size = len(vectors)
+        gallery.matrix[:gallery.size] = vectors
+        gallery.sq_norms[:gallery.size] = np.einsum('ij,ij->i', vectors, vectors)
+        gallery.ids[:gallery.size] = ids
+        gallery.people = dict(people)
+        gallery.id_by_roll = {info['roll_no']: pid for pid, info in gallery.people.items()}
+        gallery._next_id = max(gallery.people, default=-1) + 1
+        return gallery
+
+    def to_arrays(self):
+        """Compact picklable copy: (vectors, ids, people)"""
+        return self.vectors.copy(), self.ids[:self.size].copy(), dict(self.people)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def vectors(self):
+        """View of the filled part of the matrix"""
+        return self.matrix[:self.size]
+
+    def _grow(self, needed):
+        """Grow storage so that `needed` rows fit"""
+        capacity = len(self.matrix)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        ids = np.full(capacity, -1, dtype=np.int32)
+        ids[:self.size] = self.ids[:self.size]
+
+        self.matrix, self.sq_norms, self.ids = matrix, sq_norms, ids
+
+    def add_person(self, roll_no, data):
+        """Append all encodings of one person, returns the new row range"""
+        if roll_no in self.id_by_roll:
+            self.remove_person(roll_no)
+
+        encodings = np.asarray(data['encodings'], dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        person_id = self._next_id
+        self._next_id += 1
+        self.people[person_id] = {
+            'roll_no': roll_no,
+            'name': data['name'],
+            'department': data.get('department', 'N/A')
+        }
+        self.id_by_roll[roll_no] = person_id
+
+        start = self.size
+        end = start + len(encodings)
+        self._grow(end)
+        self.matrix[start:end] = encodings
+        self.sq_norms[start:end] = np.einsum('ij,ij->i', encodings, encodings)
+        self.ids[start:end] = person_id
+        self.size = end
+
+        if self.ann is not None:
+            self.ann.on_add(start, end)
+        return start, end
+
+    def remove_person(self, roll_no):
+        """Drop all rows of one person, returns the keep mask (or None)"""
+        person_id = self.id_by_roll.pop(roll_no, None)
+        if person_id is None:
+            return None
+        del self.people[person_id]
+
+        # Order-preserving compaction keeps row numbers predictable
+        keep = self.ids[:self.size] != person_id
+        remaining = int(keep.sum())
+        self.matrix[:remaining] = self.matrix[:self.size][keep]
+        self.sq_norms[:remaining] = self.sq_norms[:self.size][keep]
+        self.ids[:remaining] = self.ids[:self.size][keep]
+        self.ids[remaining:self.size] = -1
+        self.size = remaining
+
+        if self.ann is not None:
+            self.ann.on_remove(keep)
+        return keep
+
+    def enable_ann(self, min_size=0, **kwargs):
+        """Use an IVF index for galleries with at least `min_size` rows"""
+        from ann_index import IVFIndex
+        self.ann = IVFIndex(self, **kwargs)
+        self.ann_min_size = min_size
+        return self.ann
+
+    def disable_ann(self):
+        """Go back to exact brute-force matching"""
+        self.ann = None
+
+    def distances(self, encodings):
+        """Euclidean distances (queries x gallery) in a single pass"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        sq = self.sq_norms[:self.size][None, :] + q_norms[:, None] - 2.0 * (queries @ self.vectors.T)
+        np.maximum(sq, 0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def match_many(self, encodings, tolerance=0.6):
+        """Best match per query as a list of (person, distance)"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if self.size == 0 or len(queries) == 0:
+            return [(None, float('inf')) for _ in range(len(queries))]
+
+        if self.ann is not None and self.size >= self.ann_min_size:
+            best_rows, best_dist = self.ann.search(queries)
+        else:
+            dist = self.distances(queries)
+            best_rows = np.argmin(dist, axis=1)
+            best_dist = dist[np.arange(len(queries)), best_rows]
+
+        results = []
+        for row, distance in zip(best_rows, best_dist):
+            distance = float(distance)
+            if row >= 0 and distance <= tolerance:
+                results.append((self.people[int(self.ids[row])], distance))
+            else:
+                results.append((None, distance))
+        return results
+
+    def match(self, encoding, tolerance=0.6):
+        """Best match for one encoding as (person, distance)"""
+        return self.match_many([encoding], tolerance)[0]
+
+
+def make_synthetic_faces(people, samples=5, seed=0):
+    """Random registered_faces dict with face-like 128-d clusters"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 0.06, (people, ENCODING_SIZE))
+    departments = ['CSE', 'ECE', 'ME', 'CE', 'EE']
+    registered_faces = {}
+    for i, center in enumerate(centers):
+        roll_no = f"S{i:06d}"
+        registered_faces[roll_no] = {
+            'name': f"Person {i}",
+            'roll_no': roll_no,
+            'department': departments[i % len(departments)],
+            'encodings': list(center + rng.normal(0, 0.02, (samples, ENCODING_SIZE))),
+            'registered_date': "2024-01-01 09:00:00",
+            'last_attendance': None,
+            'total_attendance': 0
+        }
+    return registered_faces
@@ -0,0 +1,265 @@
+"""Low-overhead runtime metrics with a Prometheus text endpoint
+
+Stages are timed into fixed-bucket histograms (one lock + one bisect per
+observation), so the instrumentation can stay on in production.
+
+    curl http://127.0.0.1:9108/metrics        # Prometheus text format
+    curl http://127.0.0.1:9108/metrics.json   # same data as JSON
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "face_attendance"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for bound, c in zip(self.buckets + (float('inf'),), counts):
+            running += c
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+    def quantile(self, q):
+        """Approximate quantile (upper bucket bound)"""
+        snap = self.snapshot()
+        if snap['count'] == 0:
+            return 0.0
+        target = q * snap['count']
+        for bound, running in snap['buckets']:
+            if running >= target:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Histograms, counters and gauges keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.help = {'stage_seconds': "per-stage latency in seconds",
+                     'faces_per_frame': "faces detected per processed frame"}
+        self.started = time.time()
+
+    def _key(self, name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def histogram(self, name, labels=None, buckets=LATENCY_BUCKETS, help_text=""):
+        key = self._key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(key, Histogram(buckets))
+                self.help.setdefault(name, help_text)
+        return hist
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        self.histogram(name, labels, buckets).observe(value)
+
+    def inc(self, name, amount=1, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, fn, labels=None, help_text=""):
+        """Register a callback evaluated at scrape time"""
+        with self._lock:
+            self.gauges[self._key(name, labels)] = fn
+            self.help.setdefault(name, help_text)
+
+    @contextmanager
+    def time(self, stage, labels=None):
+        """Time a block into the stage latency histogram"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage_labels = {'stage': stage}
+            if labels:
+                stage_labels.update(labels)
+            self.observe("stage_seconds", time.perf_counter() - t0, stage_labels)
+
+    def render_prometheus(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+
+        seen = set()
+        for (name, labels), hist in sorted(histograms, key=lambda item: item[0]):
+            full = f"{PREFIX}_{name}"
+            if full not in seen:
+                lines.append(f"# HELP {full} {self.help.get(name) or name}")
+                lines.append(f"# TYPE {full} histogram")
+                seen.add(full)
+            snap = hist.snapshot()
+            base = dict(labels)
+            for bound, running in snap['buckets']:
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{full}_bucket{_labels(dict(base, le=le))} {running}")
+            lines.append(f"{full}_sum{_labels(base)} {snap['sum']:.6f}")
+            lines.append(f"{full}_count{_labels(base)} {snap['count']}")
+
+        for (name, labels), value in sorted(counters, key=lambda item: item[0]):
+            full = f"{PREFIX}_{name}_total"
+            if full not in seen:
+                lines.append(f"# TYPE {full} counter")
+                seen.add(full)
+            lines.append(f"{full}{_labels(dict(labels))} {value}")
+
+        for (name, labels), fn in sorted(gauges, key=lambda item: item[0]):
+            full = f"{PREFIX}_{name}"
+            if full not in seen:
+                lines.append(f"# HELP {full} {self.help.get(name) or name}")
+                lines.append(f"# TYPE {full} gauge")
+                seen.add(full)
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines.append(f"{full}{_labels(dict(labels))} {value}")
+
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """JSON-friendly snapshot with approximate p50/p95 per histogram"""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+
+        def key_name(name, labels):
+            return name + _labels(dict(labels))
+
+        data = {'timestamp': time.time(), 'uptime_s': time.time() - self.started,
+                'histograms': {}, 'counters': {}, 'gauges': {}}
+        for (name, labels), hist in histograms:
+            snap = hist.snapshot()
+            data['histograms'][key_name(name, labels)] = {
+                'count': snap['count'],
+                'mean': snap['sum'] / snap['count'] if snap['count'] else 0.0,
+                'p50': hist.quantile(0.5),
+                'p95': hist.quantile(0.95),
+            }
+        for (name, labels), value in counters:
+            data['counters'][key_name(name, labels)] = value
+        for (name, labels), fn in gauges:
+            try:
+                data['gauges'][key_name(name, labels)] = float(fn())
+            except Exception:
+                pass
+        return data
+
+
+class MetricsServer:
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(registry_ref.to_dict(), default=str).encode()
+                    content_type = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = registry_ref.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JsonDumper:
+    """Write registry snapshots to a JSON file every `interval` seconds"""
+
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def dump(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.registry.to_dict(), f, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stop.set()
+        self.dump()
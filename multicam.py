@@ -0,0 +1,264 @@
+"""Several capture sources served by one process and one shared gallery
+
+Every camera has its own capture thread, tracker and detector, but all of
+them share the gallery, the today_attendance set and the attendance log of
+one ProFaceAttendanceSystem. Recognition workers take frames from the
+cameras in round-robin order and a camera never has more than one frame in
+flight, so a crowded entrance cannot starve the others.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detection import AdaptiveDetector
+from motion import drain
+from pipeline import RateMeter
+from tracker import FaceTracker
+
+
+def is_local_camera(source):
+    """Device indexes are webcams (mirrored view), anything else is a stream/file"""
+    return isinstance(source, int) or (isinstance(source, str) and source.isdigit())
+
+
+class CameraFeed:
+    """One capture source with its own tracker, detector and newest frame"""
+
+    def __init__(self, index, source, cap, detection_budget_ms=60, motion=None):
+        self.index = index
+        self.source = source
+        self.name = f"CAM {index + 1}"
+        self.cap = cap
+        self.flip = is_local_camera(source)
+
+        self.tracker = FaceTracker(reverify_interval=5.0)
+        self.detector = AdaptiveDetector(budget_ms=detection_budget_ms)
+        # Optional MotionGate: idle cameras keep displaying but skip recognition
+        self.motion = motion
+
+        # Newest captured frame waiting for recognition (one slot, stale frames dropped)
+        self.pending = None
+        self.in_flight = False
+        self.dropped = 0
+        self.drained = 0  # buffered frames dropped on wake-up
+
+        # Newest frame for display and newest results
+        self.display_frame = None
+        self.results = []
+        self.results_seq = -1
+        self.results_capture_ts = None
+        self.latency_ms = 0.0
+        self.ended = False
+
+        self.capture_rate = RateMeter()
+        self.recognition_rate = RateMeter()
+
+
+class FairScheduler:
+    """Round-robin hand-out of the newest frame of each camera"""
+
+    def __init__(self, feeds):
+        self.feeds = feeds
+        self.cond = threading.Condition()
+        self.next_index = 0
+        self.served = [0] * len(feeds)
+
+    def submit(self, feed, item):
+        """Replace the camera's pending frame with a newer one, True if one was dropped"""
+        with self.cond:
+            dropped = feed.pending is not None
+            if dropped:
+                feed.dropped += 1
+            feed.pending = item
+            feed.display_frame = item
+            self.cond.notify()
+        return dropped
+
+    def show(self, feed, item):
+        """Display-only frame of an idle camera, nothing is queued for recognition"""
+        with self.cond:
+            feed.display_frame = item
+            feed.results = []
+            feed.results_seq = item[0]
+
+    def next_job(self, timeout=0.1):
+        """Next (feed, frame item) in round-robin order, None on timeout"""
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                count = len(self.feeds)
+                for offset in range(count):
+                    feed = self.feeds[(self.next_index + offset) % count]
+                    if feed.pending is not None and not feed.in_flight:
+                        item, feed.pending = feed.pending, None
+                        feed.in_flight = True
+                        self.next_index = (feed.index + 1) % count
+                        self.served[feed.index] += 1
+                        return feed, item
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def done(self, feed):
+        with self.cond:
+            feed.in_flight = False
+            self.cond.notify()
+
+
+class MultiCameraVerifier:
+    """Capture threads per camera + a shared, fairly scheduled worker pool"""
+
+    def __init__(self, system, sources, workers=None, tile_size=(640, 360), motion_factory=None):
+        self.system = system
+        self.feeds = [CameraFeed(i, source, system.open_camera(source, record=True), system.detection_budget_ms,
+                                 motion_factory(source) if motion_factory else None)
+                      for i, source in enumerate(sources)]
+        for feed in self.feeds:
+            if feed.motion is not None:
+                system.metrics.gauge('motion_active', lambda m=feed.motion: int(m.active),
+                                     labels={'camera': feed.name},
+                                     help_text="1 while detection runs, 0 while idle")
+                system.metrics.gauge('idle_seconds', lambda m=feed.motion: m.idle_seconds,
+                                     labels={'camera': feed.name},
+                                     help_text="time spent idle this session")
+                system.metrics.gauge('active_seconds', lambda m=feed.motion: m.active_seconds,
+                                     labels={'camera': feed.name},
+                                     help_text="time spent active this session")
+        self.workers = workers or max(2, len(self.feeds))
+        self.tile_size = tile_size
+        self.scheduler = FairScheduler(self.feeds)
+        self.running = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.running.set()
+        for feed in self.feeds:
+            self.threads.append(threading.Thread(target=self._capture_loop, args=(feed,),
+                                                 name=f"capture-{feed.index}", daemon=True))
+        for i in range(self.workers):
+            self.threads.append(threading.Thread(target=self._recognition_loop,
+                                                 name=f"recognition-{i}", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running.clear()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+        for feed in self.feeds:
+            feed.cap.release()
+
+    def _capture_loop(self, feed):
+        seq = 0
+        slept = False
+        metrics = self.system.metrics
+        labels = {'camera': feed.name}
+        while self.running.is_set():
+            with metrics.time('capture', labels):
+                ret, frame = feed.cap.read()
+            if not ret:
+                feed.ended = True
+                break
+            captured_at = time.time()
+            if feed.flip:
+                frame = cv2.flip(frame, 1)
+            item = (seq, captured_at, frame)
+            active = feed.motion is None or feed.motion.update(frame, captured_at)
+            if active and slept:
+                # Woke up after an idle sleep: drop the frames that sat in the buffer
+                drained = drain(feed.cap) + 1
+                feed.drained += drained
+                metrics.inc('frames_drained', drained, labels=labels)
+                slept = False
+                continue
+            if active:
+                if self.scheduler.submit(feed, item):
+                    metrics.inc('frames_dropped', labels=labels)
+            else:
+                self.scheduler.show(feed, item)
+                metrics.inc('frames_idle', labels=labels)
+            metrics.inc('frames_captured', labels=labels)
+            feed.capture_rate.tick(captured_at)
+            seq += 1
+            if feed.motion is not None:
+                wait = feed.motion.idle_wait(captured_at)
+                if wait:
+                    time.sleep(wait)
+                    slept = True
+
+    def _recognition_loop(self):
+        while self.running.is_set():
+            job = self.scheduler.next_job()
+            if job is None:
+                continue
+            feed, (seq, captured_at, frame) = job
+            try:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                faces = self.system.verify_faces(rgb_frame, feed.tracker, feed.detector, captured_at, seq)
+                if faces is None:
+                    continue
+                if faces and feed.motion is not None:
+                    feed.motion.face_seen(captured_at)
+                if seq > feed.results_seq:
+                    feed.results = faces
+                    feed.results_seq = seq
+                    feed.results_capture_ts = captured_at
+                feed.recognition_rate.tick()
+                self.system.metrics.inc('frames_processed', labels={'camera': feed.name})
+            finally:
+                self.scheduler.done(feed)
+
+    @property
+    def all_ended(self):
+        return all(feed.ended for feed in self.feeds)
+
+    def render_mosaic(self):
+        """Grid of all cameras with their face results under a shared header"""
+        tiles = []
+        tw, th = self.tile_size
+        now = time.time()
+        for feed in self.feeds:
+            item = feed.display_frame
+            if item is None:
+                tile = np.zeros((th, tw, 3), dtype=np.uint8)
+            else:
+                frame = item[2].copy()
+                for face in feed.results:
+                    self.system.draw_face_result(frame, face)
+                tile = cv2.resize(frame, (tw, th), interpolation=cv2.INTER_AREA)
+                if feed.results_capture_ts is not None:
+                    latency = (now - feed.results_capture_ts) * 1000
+                    feed.latency_ms = 0.8 * feed.latency_ms + 0.2 * latency if feed.latency_ms else latency
+
+            cv2.rectangle(tile, (0, 0), (tw, 30), (0, 0, 0), -1)
+            cv2.putText(tile, f"{feed.name} | {feed.capture_rate.rate:.0f} FPS | "
+                              f"{feed.recognition_rate.rate:.1f} rec/s | {feed.latency_ms:.0f} ms",
+                        (8, 21), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            tiles.append(tile)
+
+        cols = int(np.ceil(np.sqrt(len(tiles))))
+        rows = int(np.ceil(len(tiles) / cols))
+        tiles += [np.zeros((th, tw, 3), dtype=np.uint8)] * (rows * cols - len(tiles))
+        grid = np.vstack([np.hstack(tiles[r * cols:(r + 1) * cols]) for r in range(rows)])
+
+        # Shared header
+        header = np.zeros((50, grid.shape[1], 3), dtype=np.uint8)
+        cv2.putText(header, f"MULTI-CAMERA VERIFICATION | Attendance: "
+                            f"{len(self.system.today_attendance)}/{len(self.system.registered_faces)}",
+                    (15, 33), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        cv2.putText(header, "@aaka8h", (grid.shape[1] - 120, 33),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 200, 255), 2)
+        return np.vstack([header, grid])
+
+    def summary(self):
+        """Per-camera served/dropped counts for the session report"""
+        return [{'camera': feed.name, 'source': feed.source,
+                 'recognised': self.scheduler.served[feed.index], 'dropped': feed.dropped,
+                 'encoder_calls': feed.tracker.encodings_run, 'faces': feed.tracker.faces_seen,
+                 'motion': feed.motion.describe() if feed.motion is not None else None,
+                 'drained': feed.drained}
+                for feed in self.feeds]
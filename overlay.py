@@ -0,0 +1,120 @@
+"""Cached HUD overlays for the live windows
+
+The dark header/footer bands are blended in place on their rows only (no
+full-frame copy or full-frame addWeighted), static text is rendered once
+per frame size, and dynamic text is re-rendered only when its string
+changes, e.g. the clock once a second. Each layer is pasted through a mask
+cropped to the text, so per-frame work is a few small copies.
+"""
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class TextLayer:
+    """Text pre-rendered into a crop of the band, pasted through its coverage mask"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.key = None
+        self.box = None
+
+    def render(self, key, texts):
+        """Draw texts [(text, org, scale, color, thickness)] unless key is unchanged"""
+        if key == self.key:
+            return
+        self.key = key
+        self.box = None
+        if not texts:
+            return
+
+        # Bounding box of all strings, clipped to the band
+        x0, y0, x1, y1 = self.width, self.height, 0, 0
+        for text, (x, y), scale, _, thickness in texts:
+            (tw, th), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+            x0, y0 = min(x0, x - thickness), min(y0, y - th - thickness)
+            x1, y1 = max(x1, x + tw + thickness), max(y1, y + baseline + thickness)
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(self.width, x1), min(self.height, y1)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        pixels = np.zeros((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        for text, (x, y), scale, color, thickness in texts:
+            org = (x - x0, y - y0)
+            cv2.putText(pixels, text, org, FONT, scale, color, thickness)
+            cv2.putText(mask, text, org, FONT, scale, 255, thickness)
+        # Coverage kept for the background, anti-aliased edges blend like putText
+        keep = cv2.cvtColor(255 - mask, cv2.COLOR_GRAY2BGR)
+        self.box = (y0, y1, x0, x1, pixels, keep)
+
+    def paste(self, roi):
+        if self.box is None:
+            return
+        y0, y1, x0, x1, pixels, keep = self.box
+        region = roi[y0:y1, x0:x1]
+        cv2.multiply(region, keep, dst=region, scale=1 / 255)
+        cv2.add(region, pixels, dst=region)
+
+
+class HudRenderer:
+    """Header/footer bands with static and keyed dynamic text layers"""
+
+    def __init__(self, header_h=140, footer_h=80, alpha=0.7, shade_footer=True):
+        self.header_h = header_h
+        self.footer_h = footer_h
+        self.keep = 1.0 - alpha
+        self.shaded = ('header', 'footer') if shade_footer else ('header',)
+        self.size = None
+        self.layers = {}
+        self._black = {}
+        self._second = None
+        self._clock = ""
+
+    def _band(self, frame, name):
+        # Same rows as the filled cv2.rectangle((0, 0), (w, header_h)) it replaces
+        h = frame.shape[0]
+        return frame[:self.header_h + 1] if name == 'header' else frame[h - self.footer_h:]
+
+    def begin(self, frame):
+        """Darken the bands in place, returns the frame width and height"""
+        h, w = frame.shape[:2]
+        if self.size != (w, h):
+            self.size = (w, h)
+            self.layers = {}
+            self._black = {}
+        for name in self.shaded:
+            band = self._band(frame, name)
+            # Same blend as a black rectangle + addWeighted, on the band rows only
+            black = self._black.get(name)
+            if black is None:
+                black = self._black[name] = np.zeros_like(band)
+            cv2.addWeighted(black, 1.0 - self.keep, band, self.keep, 0, dst=band)
+        return w, h
+
+    def text(self, frame, name, band, key, texts):
+        """Paste layer `name` into `band`, re-rendering it only when key changes
+
+        texts use coordinates relative to the band and may be a callable so
+        the strings are only formatted on a re-render.
+        """
+        layer = self.layers.get(name)
+        band_roi = self._band(frame, band)
+        if layer is None:
+            layer = self.layers[name] = TextLayer(band_roi.shape[1], band_roi.shape[0])
+        if key != layer.key:
+            layer.render(key, texts() if callable(texts) else texts)
+        layer.paste(band_roi)
+
+    def clock(self, fmt="%B %d, %Y | %I:%M:%S %p"):
+        """Formatted local time, recomputed only when the second changes"""
+        second = int(time.time())
+        if second != self._second:
+            self._second = second
+            self._clock = datetime.fromtimestamp(second).strftime(fmt)
+        return self._clock
@@ -0,0 +1,225 @@
+"""Threaded capture -> recognition -> render pipeline for auto-verification"""
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from motion import drain
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking"""
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        """Put item, discarding stale ones when full; returns how many were dropped"""
+        dropped = 0
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return dropped
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                        dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """Get the next item, returns None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RateMeter:
+    """Events per second over a sliding window"""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.times = deque()
+
+    def tick(self, now=None):
+        now = now if now is not None else time.time()
+        self.times.append(now)
+        while self.times and now - self.times[0] > self.window:
+            self.times.popleft()
+
+    @property
+    def rate(self):
+        if len(self.times) < 2:
+            return 0.0
+        span = self.times[-1] - self.times[0]
+        return (len(self.times) - 1) / span if span > 0 else 0.0
+
+
+class VerificationPipeline:
+    """Capture thread + recognition worker pool + render loop
+
+    The capture thread feeds two bounded queues: one for the recognition
+    workers and one for the display. Both keep only the newest frame, so
+    workers never process stale frames and the display never waits on
+    recognition. The caller's thread acts as the render/UI stage because
+    OpenCV windows must be driven from the main thread.
+
+    With a MotionGate, frames of an empty scene skip the recognition queue
+    and capture slows to the gate's idle rate until something moves.
+    """
+
+    def __init__(self, system, cap, workers=2, flip=True, motion=None):
+        self.system = system
+        self.metrics = system.metrics
+        self.cap = cap
+        self.workers = workers
+        self.flip = flip
+        self.motion = motion
+        if motion is not None:
+            self.metrics.gauge('motion_active', lambda: int(motion.active),
+                               help_text="1 while detection runs, 0 while idle")
+            self.metrics.gauge('idle_seconds', lambda: motion.idle_seconds,
+                               help_text="time spent idle this session")
+            self.metrics.gauge('active_seconds', lambda: motion.active_seconds,
+                               help_text="time spent active this session")
+
+        self.work_queue = LatestQueue(maxsize=1)
+        self.display_queue = LatestQueue(maxsize=1)
+        self.running = threading.Event()
+        self.threads = []
+
+        # Newest recognition results (guarded by results_lock)
+        self.results_lock = threading.Lock()
+        self.results = []
+        self.results_seq = -1
+        self.results_capture_ts = None
+
+        self.capture_rate = RateMeter()
+        self.recognition_rate = RateMeter()
+        self.render_rate = RateMeter()
+        self.latency_ms = 0.0
+        self.capture_ended = threading.Event()
+        # Buffered frames dropped on wake-up (not part of the idle/active split)
+        self.drained = 0
+
+    def start(self):
+        """Start capture and recognition threads"""
+        # Frame numbers restart at 0, the process-wide orders must follow
+        self.system.tracker.order.reset()
+        self.system.frame_order.reset()
+        self.running.set()
+        self.threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for i in range(self.workers):
+            self.threads.append(threading.Thread(target=self._recognition_loop,
+                                                 name=f"recognition-{i}", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Stop all threads and wait for them"""
+        self.running.clear()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+
+    def _capture_loop(self):
+        seq = 0
+        slept = False
+        while self.running.is_set():
+            with self.metrics.time('capture'):
+                ret, frame = self.cap.read()
+            if not ret:
+                self.capture_ended.set()
+                break
+            captured_at = time.time()
+            if self.flip:
+                frame = cv2.flip(frame, 1)
+
+            item = (seq, captured_at, frame)
+            self.metrics.inc('frames_captured')
+            active = self.motion is None or self.motion.update(frame, captured_at)
+            if active and slept:
+                # Woke up after an idle sleep: this frame and the ones behind it sat in
+                # the driver buffer, drop them so recognition starts on a current frame
+                drained = drain(self.cap) + 1
+                self.drained += drained
+                self.metrics.inc('frames_drained', drained)
+                slept = False
+                continue
+            if active:
+                dropped = self.work_queue.put(item)
+                if dropped:
+                    self.metrics.inc('frames_dropped', dropped)
+            else:
+                self.metrics.inc('frames_idle')
+                with self.results_lock:
+                    self.results = []
+                    self.results_seq = seq
+            self.display_queue.put(item)
+            self.capture_rate.tick(captured_at)
+            seq += 1
+            if self.motion is not None:
+                # Idle: slow capture down instead of reading at full camera rate
+                wait = self.motion.idle_wait(captured_at)
+                if wait:
+                    time.sleep(wait)
+                    slept = True
+
+    def _recognition_loop(self):
+        while self.running.is_set():
+            item = self.work_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            seq, captured_at, frame = item
+
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            faces = self.system.verify_faces(rgb_frame, captured_at=captured_at, seq=seq)
+            if faces is None:
+                continue  # a newer frame already moved the tracks on
+            if faces and self.motion is not None:
+                self.motion.face_seen(captured_at)
+
+            with self.results_lock:
+                # Workers may finish out of order, keep only the newest
+                if seq > self.results_seq:
+                    self.results = faces
+                    self.results_seq = seq
+                    self.results_capture_ts = captured_at
+            self.recognition_rate.tick()
+            self.metrics.inc('frames_processed')
+
+    def latest_results(self):
+        """Newest face results and the capture time of their frame"""
+        with self.results_lock:
+            return self.results, self.results_capture_ts
+
+    def next_frame(self, timeout=0.5):
+        """Newest captured frame for display, None when capture ended"""
+        while self.running.is_set():
+            item = self.display_queue.get(timeout=timeout)
+            if item is not None:
+                return item
+            if self.capture_ended.is_set():
+                return None
+        return None
+
+    def rendered(self, results_capture_ts):
+        """Record a displayed frame and its end-to-end latency"""
+        now = time.time()
+        self.render_rate.tick(now)
+        if results_capture_ts is not None:
+            # Capture of the recognised frame -> pixels on screen
+            latency = (now - results_capture_ts) * 1000
+            self.metrics.observe('end_to_end_seconds', latency / 1000)
+            self.latency_ms = 0.8 * self.latency_ms + 0.2 * latency if self.latency_ms else latency
+
+    @property
+    def dropped_frames(self):
+        return self.work_queue.dropped
@@ -0,0 +1,161 @@
+"""Cheap face-quality checks run before the 128-d encoder
+
+Each face box is scored on size, sharpness (variance of the Laplacian on a
+fixed-size grey crop), brightness and head pose (yaw/roll from the 5-point
+landmarks). Checks run cheapest first and stop at the first hard failure,
+so tiny, blurred or badly turned faces never reach the encoder. The score
+(0..1) ranks enrollment samples.
+"""
+import math
+
+import cv2
+import face_recognition
+import numpy as np
+
+# Blur is measured on the face resized to this side so it does not depend on face size
+NORMALIZED_SIDE = 96
+
+
+def _ramp(value, low, high):
+    """Linear 0..1 between low and high, clamped"""
+    if high == low:
+        return 1.0
+    return float(min(1.0, max(0.0, (value - low) / (high - low))))
+
+
+class QualityGate:
+    """Thresholds plus the scoring function"""
+
+    def __init__(self, min_size=60, min_blur=40.0, min_brightness=40, max_brightness=220,
+                 max_yaw=0.35, max_roll=25.0, min_score=0.0, check_pose=True):
+        self.min_size = min_size
+        self.min_blur = min_blur
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+        self.min_score = min_score
+        self.check_pose = check_pose
+
+    def assess(self, rgb_frame, location):
+        """Quality dict for one (top, right, bottom, left) box
+
+        Keys: ok, reason (None when ok), score and the raw measurements.
+        """
+        top, right, bottom, left = location
+        size = min(bottom - top, right - left)
+        result = {'ok': False, 'reason': None, 'score': 0.0, 'size': size,
+                  'blur': None, 'brightness': None, 'yaw': None, 'roll': None}
+
+        if size < self.min_size:
+            result['reason'] = "too small"
+            return result
+
+        crop = rgb_frame[max(0, top):bottom, max(0, left):right]
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+        brightness = float(gray.mean())
+        result['brightness'] = brightness
+        if brightness < self.min_brightness:
+            result['reason'] = "too dark"
+            return result
+        if brightness > self.max_brightness:
+            result['reason'] = "too bright"
+            return result
+
+        small = cv2.resize(gray, (NORMALIZED_SIDE, NORMALIZED_SIDE), interpolation=cv2.INTER_AREA)
+        blur = float(cv2.Laplacian(small, cv2.CV_64F).var())
+        result['blur'] = blur
+        if blur < self.min_blur:
+            result['reason'] = "blurry"
+            return result
+
+        pose_score = 1.0
+        if self.check_pose:
+            pose = self.pose(rgb_frame, location)
+            if pose is not None:
+                yaw, roll = pose
+                result['yaw'], result['roll'] = yaw, roll
+                if abs(yaw) > self.max_yaw:
+                    result['reason'] = "turned away"
+                    return result
+                if abs(roll) > self.max_roll:
+                    result['reason'] = "tilted"
+                    return result
+                pose_score = 1.0 - 0.5 * (abs(yaw) / self.max_yaw + abs(roll) / self.max_roll) / 2
+
+        mid = (self.min_brightness + self.max_brightness) / 2
+        brightness_score = 1.0 - abs(brightness - mid) / (self.max_brightness - mid)
+        score = (_ramp(size, self.min_size, 2 * self.min_size)
+                 + _ramp(blur, self.min_blur, 4 * self.min_blur)
+                 + brightness_score + pose_score) / 4
+        result['score'] = score
+        if score < self.min_score:
+            result['reason'] = "low quality"
+            return result
+        result['ok'] = True
+        return result
+
+    @staticmethod
+    def pose(rgb_frame, location):
+        """(yaw, roll degrees) from the 5-point landmarks, None without landmarks
+
+        yaw is the nose offset from the eye midpoint in inter-eye distances
+        (0 = frontal).
+        """
+        landmarks = face_recognition.face_landmarks(rgb_frame, [location], model='small')
+        if not landmarks:
+            return None
+        points = landmarks[0]
+        left_eye = np.mean(points['left_eye'], axis=0)
+        right_eye = np.mean(points['right_eye'], axis=0)
+        nose = np.asarray(points['nose_tip'][0], dtype=np.float64)
+
+        dx, dy = right_eye - left_eye
+        eye_distance = math.hypot(dx, dy)
+        if eye_distance < 1:
+            return None
+        eye_mid = (left_eye + right_eye) / 2
+        # Nose offset along the eye line, normalised by eye distance
+        yaw = float(((nose - eye_mid) @ np.array([dx, dy])) / eye_distance ** 2)
+        roll = math.degrees(math.atan2(dy, dx))
+        if roll > 90:
+            roll -= 180
+        elif roll < -90:
+            roll += 180
+        return yaw, roll
+
+
+def crop_face(rgb_frame, location, margin=0.5):
+    """Copy of the face plus a margin, and the box inside that crop
+
+    Lets enrollment keep many candidate samples without holding full frames.
+    """
+    h, w = rgb_frame.shape[:2]
+    top, right, bottom, left = location
+    pad_y, pad_x = int((bottom - top) * margin), int((right - left) * margin)
+    y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+    y1, x1 = min(h, bottom + pad_y), min(w, right + pad_x)
+    return rgb_frame[y0:y1, x0:x1].copy(), (top - y0, right - x0, bottom - y0, left - x0)
+
+
+def pick_diverse(candidates, count, min_yaw=0.08, min_roll=5.0, min_gap=1.0):
+    """Up to `count` candidates, best score first, no two near-duplicates
+
+    A candidate is kept only when it differs from every kept one in pose
+    (yaw or roll) or was taken at least `min_gap` seconds apart. Candidates
+    are dicts with 'score', 'time', 'yaw' and 'roll' (None without pose).
+    """
+    def distinct(a, b):
+        if abs(a['time'] - b['time']) >= min_gap:
+            return True
+        if a['yaw'] is None or b['yaw'] is None:
+            return False
+        return abs(a['yaw'] - b['yaw']) >= min_yaw or abs(a['roll'] - b['roll']) >= min_roll
+
+    kept = []
+    for candidate in sorted(candidates, key=lambda c: c['score'], reverse=True):
+        if all(distinct(candidate, other) for other in kept):
+            kept.append(candidate)
+            if len(kept) == count:
+                break
+    return kept
@@ -0,0 +1,393 @@
+"""Local recognition service for thin kiosk clients
+
+Clients POST a JPEG (or PNG) frame, or an already cropped face, and get the
+identities and attendance status back as JSON. The server owns one
+ProFaceAttendanceSystem, so the gallery, the daily attendance list and the
+cooldown rules are shared by every kiosk.
+
+Requests from all clients go through one bounded queue. Batch workers take
+up to --max-batch requests, waiting at most --max-wait-ms after the first
+one, then detect and encode each image and match all the faces of the batch
+in a single gallery call. When the queue is full, the request is rejected at
+once with 503 and Retry-After, so overload never builds unbounded latency.
+
+    python recognition_server.py --port 8080
+    python recognition_server.py --unix-socket /run/face.sock
+
+    curl --data-binary @frame.jpg http://127.0.0.1:8080/recognize
+    curl --data-binary @face.jpg "http://127.0.0.1:8080/recognize?mode=crop"
+    curl http://127.0.0.1:8080/stats
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+import cv2
+import face_recognition
+import numpy as np
+
+from detection import detect_scaled
+from metrics import COUNT_BUCKETS
+from pipeline import RateMeter
+
+MAX_BODY = 10 * 1024 * 1024
+
+
+class _Job:
+    """One client image waiting for a batch"""
+
+    def __init__(self, rgb_frame, mode):
+        self.rgb_frame = rgb_frame
+        self.mode = mode
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        # A job is either taken by a batch or abandoned by its timed-out client, never both
+        self._state_lock = threading.Lock()
+        self.claimed = False
+        self.abandoned = False
+
+    def claim(self):
+        """Taken by a batch worker, False when the client already gave up"""
+        with self._state_lock:
+            if not self.abandoned:
+                self.claimed = True
+            return self.claimed
+
+    def abandon(self):
+        """Client timed out, False when a batch already started on it"""
+        with self._state_lock:
+            if not self.claimed:
+                self.abandoned = True
+            return self.abandoned
+
+
+class RecognitionService:
+    """Bounded request queue + micro-batching workers on a shared system"""
+
+    def __init__(self, system, max_batch=8, max_wait_ms=10, max_queue=64, workers=2,
+                 scale=0.5, upsample=1, request_timeout=5.0):
+        self.system = system
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.scale = scale
+        self.upsample = upsample
+        self.request_timeout = request_timeout
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.running = threading.Event()
+        self.threads = []
+
+        self.stats_lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self.faces = 0
+        self.queue_waits = deque(maxlen=2000)
+        self.service_times = deque(maxlen=2000)
+        self.throughput = RateMeter(window=10.0)
+
+    def start(self):
+        self.running.set()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._batch_loop, name=f"batch-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self.running.clear()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+
+    def submit(self, image_bytes, mode="frame"):
+        """Decode, enqueue and wait for one image, returns (http status, body)"""
+        frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return 400, {'error': "body is not a JPEG/PNG image"}
+        job = _Job(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), mode)
+
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            self.system.metrics.inc('server_rejected')
+            return 503, {'error': "overloaded", 'queue_depth': self.queue.qsize()}
+
+        if not job.done.wait(self.request_timeout):
+            # Still queued: drop it, so nothing gets marked behind the client's back.
+            # Already being processed: its result (and check-in) is on the way
+            if job.abandon() or not job.done.wait(self.request_timeout):
+                with self.stats_lock:
+                    self.errors += 1
+                return 504, {'error': "timed out waiting for a batch"}
+        return job.result
+
+    def _batch_loop(self):
+        while self.running.is_set():
+            try:
+                first = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        system = self.system
+        batch = [job for job in batch if job.claim()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        encodings = []
+        failed = 0
+        # Detection and encoding are per image, a bad image only fails its own request
+        per_job = []
+        for job in batch:
+            try:
+                h, w = job.rgb_frame.shape[:2]
+                if job.mode == "crop":
+                    locations = [(0, w, h, 0)]
+                else:
+                    with system.metrics.time('detection', {'source': 'server'}):
+                        locations = detect_scaled(job.rgb_frame, self.scale, self.upsample)
+                found = []
+                if locations:
+                    with system.metrics.time('encoding', {'source': 'server'}):
+                        found = face_recognition.face_encodings(job.rgb_frame, locations)
+            except Exception as e:
+                failed += 1
+                job.result = (500, {'error': str(e)})
+                continue
+            per_job.append((job, locations[:len(found)], len(encodings)))
+            encodings += found
+
+        # Matching is one call for the whole batch
+        try:
+            with system.metrics.time('matching', {'source': 'server'}):
+                matches = system.gallery.match_many(encodings, tolerance=system.match_tolerance) \
+                    if encodings else []
+        except Exception as e:
+            matches = None
+            for job, _, _ in per_job:
+                failed += 1
+                job.result = (500, {'error': str(e)})
+
+        for job, locations, offset in per_job if matches is not None else []:
+            try:
+                faces = [self._face_result(location, *matches[offset + i])
+                         for i, location in enumerate(locations)]
+                job.result = (200, {'faces': faces})
+            except Exception as e:
+                failed += 1
+                job.result = (500, {'error': str(e)})
+        if failed:
+            with self.stats_lock:
+                self.errors += failed
+
+        finished = time.perf_counter()
+        with self.stats_lock:
+            self.batches += 1
+            self.batched_jobs += len(batch)
+            self.requests += len(batch)
+            self.faces += len(encodings)
+            for job in batch:
+                self.queue_waits.append(started - job.enqueued)
+                self.service_times.append(finished - job.enqueued)
+                self.throughput.tick()
+        system.metrics.observe('server_batch_size', len(batch), buckets=COUNT_BUCKETS)
+        for job in batch:
+            system.metrics.observe('server_queue_seconds', started - job.enqueued)
+            job.done.set()
+
+    def _face_result(self, location, person, distance):
+        top, right, bottom, left = (int(v) for v in location)
+        result = {'box': {'top': top, 'right': right, 'bottom': bottom, 'left': left},
+                  'status': 'unknown', 'distance': round(float(distance), 4)}
+        if person is None:
+            return result
+
+        roll_no = person['roll_no']
+        # Decided under the attendance lock, so two kiosks cannot both get 'marked'
+        info = self.system.handle_match(person, distance)
+        status = info['outcome'] if info else 'recognized'  # None: inside the cooldown window
+        result.update(status=status, roll_no=roll_no, name=person['name'],
+                      department=person['department'],
+                      confidence=round((1 - float(distance)) * 100, 2),
+                      message=info['status'] if info else None)
+        return result
+
+    def stats(self):
+        """Throughput, batch size and queue latency summary"""
+        with self.stats_lock:
+            waits = np.asarray(self.queue_waits) * 1000
+            service = np.asarray(self.service_times) * 1000
+            data = {
+                'uptime_s': round(time.time() - self.started, 1),
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'faces': self.faces,
+                'batches': self.batches,
+                'mean_batch_size': round(self.batched_jobs / self.batches, 2) if self.batches else 0.0,
+                'throughput_rps': round(self.throughput.rate, 2),
+                'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+            }
+        for name, values in (('queue_wait_ms', waits), ('latency_ms', service)):
+            if len(values):
+                data[name] = {'p50': round(float(np.percentile(values, 50)), 2),
+                              'p95': round(float(np.percentile(values, 95)), 2),
+                              'max': round(float(values.max()), 2)}
+        return data
+
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, content_type="application/json", headers=None):
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/stats":
+                self._send(200, service.stats())
+            elif path == "/metrics":
+                self._send(200, service.system.metrics.render_prometheus().encode(),
+                           "text/plain; version=0.0.4")
+            else:
+                self._send(404, {'error': "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/recognize":
+                self._send(404, {'error': "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY:
+                self._send(413 if length > MAX_BODY else 400, {'error': "expected an image body"})
+                return
+            body = self.rfile.read(length)
+            mode = parse_qs(url.query).get("mode", ["frame"])[0]
+            status, result = service.submit(body, "crop" if mode == "crop" else "frame")
+            headers = {"Retry-After": "1"} if status == 503 else None
+            self._send(status, result, headers=headers)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+
+# Many kiosks connect at once, overload is answered with 503 rather than resets
+class _TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+def make_server(service, host="127.0.0.1", port=8080, unix_socket=None):
+    """HTTP server on localhost or on a Unix socket"""
+    handler = _make_handler(service)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        return _UnixHTTPServer(unix_socket, handler)
+    return _TCPHTTPServer((host, port), handler)
+
+
+def post_frame(url, image_bytes, mode="frame", timeout=10.0):
+    """Minimal client: POST an encoded image, returns (status, parsed JSON)"""
+    request = Request(f"{url.rstrip('/')}/recognize?mode={mode}", data=image_bytes,
+                      headers={"Content-Type": "image/jpeg"})
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except Exception as e:
+        if hasattr(e, 'code') and hasattr(e, 'read'):
+            return e.code, json.loads(e.read() or b"{}")
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local recognition service for thin clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=8, help="requests per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=10,
+                        help="longest wait for a batch to fill after its first request")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="queued requests before new ones get 503")
+    parser.add_argument("--workers", type=int, default=2, help="batch worker threads")
+    parser.add_argument("--scale", type=float, default=0.5, help="detection downscale factor")
+    parser.add_argument("--upsample", type=int, default=1, help="HOG upsample count")
+    parser.add_argument("--search", choices=["exact", "ivf", "quantized", "sharded"], default="exact",
+                        help="gallery search mode (see app.py --help)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="gallery shard processes (--search sharded, default: all cores)")
+    args = parser.parse_args()
+
+    from app import ProFaceAttendanceSystem
+    system = ProFaceAttendanceSystem(search_mode=args.search, shards=args.shards)
+    system.ensure_vision()
+    service = RecognitionService(system, args.max_batch, args.max_wait_ms, args.max_queue,
+                                 args.workers, args.scale, args.upsample).start()
+    server = make_server(service, args.host, args.port, args.unix_socket)
+
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"📡 Recognition service on {where} | batch ≤{args.max_batch} "
+          f"within {args.max_wait_ms:.0f} ms | queue {args.max_queue}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        system.attendance_writer.close()
+        system.close_gallery()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+        print(f"\n📈 {json.dumps(service.stats())}")
+
+
+if __name__ == "__main__":
+    main()
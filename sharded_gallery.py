@@ -0,0 +1,339 @@
+"""Gallery matching sharded across worker processes
+
+One process scans at most one core's worth of vectors per frame, and every
+extra face in the frame adds another full scan. Here the rows are split
+into shards, each held in a shared-memory block and scanned by its own
+single-threaded worker process. A batch of queries is sent to all workers
+at once and their per-shard top-k rows are merged, so a scan costs about
+1/shards of the single-process one.
+
+People are grouped by department or by a hash bucket of the roll number
+and groups are packed onto shards. The parent writes rows straight into
+the shared blocks on add/delete, and moves whole groups from the fullest to
+the emptiest shard when one grows more than `max_skew` above the average.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from gallery import ENCODING_SIZE
+
+PARTITIONS = ('hash', 'department')
+HASH_BUCKETS = 64
+
+# Vector, squared norm and person id per row
+ROW_BYTES = ENCODING_SIZE * 4 + 4 + 4
+
+# One BLAS thread per worker, the shards are the parallelism
+THREAD_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def _views(buf, capacity):
+    """(vectors, sq_norms, ids) arrays over a shard block"""
+    vectors = np.ndarray((capacity, ENCODING_SIZE), dtype=np.float32, buffer=buf)
+    sq_norms = np.ndarray(capacity, dtype=np.float32, buffer=buf,
+                          offset=capacity * ENCODING_SIZE * 4)
+    ids = np.ndarray(capacity, dtype=np.int32, buffer=buf,
+                     offset=capacity * (ENCODING_SIZE + 1) * 4)
+    return vectors, sq_norms, ids
+
+
+def _top_k(vectors, sq_norms, ids, queries, k):
+    """(person ids, distances), each queries x k, sorted by distance"""
+    if len(vectors) == 0:
+        empty = np.empty((len(queries), 0))
+        return empty.astype(np.int32), empty.astype(np.float32)
+    q_norms = np.einsum('ij,ij->i', queries, queries)
+    sq = sq_norms[None, :] + q_norms[:, None] - 2.0 * (queries @ vectors.T)
+    k = min(k, len(vectors))
+    rows = np.argpartition(sq, k - 1, axis=1)[:, :k] if k < len(vectors) \
+        else np.broadcast_to(np.arange(len(vectors)), sq.shape)
+    best = np.take_along_axis(sq, rows, axis=1)
+    order = np.argsort(best, axis=1)
+    rows = np.take_along_axis(rows, order, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return ids[rows], np.sqrt(np.maximum(best, 0))
+
+
+def _shard_worker(conn, name, capacity):
+    """Worker process: answers ('search', queries, size, k) for one shard"""
+    shm = shared_memory.SharedMemory(name=name)
+    vectors, sq_norms, ids = _views(shm.buf, capacity)
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'search':
+                _, queries, size, k = message
+                conn.send(_top_k(vectors[:size], sq_norms[:size], ids[:size], queries, k))
+            elif message[0] == 'attach':
+                # The parent grew the shard into a new block
+                vectors = sq_norms = ids = None
+                shm.close()
+                shm = shared_memory.SharedMemory(name=message[1])
+                vectors, sq_norms, ids = _views(shm.buf, message[2])
+                conn.send(True)
+            else:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        vectors = sq_norms = ids = None
+        shm.close()
+
+
+class _Shard:
+    """Parent side of one shard: its shared block and its worker"""
+
+    def __init__(self, ctx, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * ROW_BYTES)
+        self.vectors, self.sq_norms, self.ids = _views(self.shm.buf, capacity)
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_shard_worker, args=(child, self.shm.name, capacity),
+                                   name="gallery-shard", daemon=True)
+        self.process.start()
+        child.close()
+
+    def _release(self):
+        self.vectors = self.sq_norms = self.ids = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        shm = shared_memory.SharedMemory(create=True, size=capacity * ROW_BYTES)
+        vectors, sq_norms, ids = _views(shm.buf, capacity)
+        vectors[:self.size] = self.vectors[:self.size]
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        ids[:self.size] = self.ids[:self.size]
+
+        self.conn.send(('attach', shm.name, capacity))
+        self.conn.recv()
+        self._release()
+        self.shm, self.capacity = shm, capacity
+        self.vectors, self.sq_norms, self.ids = vectors, sq_norms, ids
+
+    def append(self, vectors, person_id):
+        end = self.size + len(vectors)
+        if end > self.capacity:
+            self._grow(end)
+        self.vectors[self.size:end] = vectors
+        self.sq_norms[self.size:end] = np.einsum('ij,ij->i', vectors, vectors)
+        self.ids[self.size:end] = person_id
+        self.size = end
+
+    def take(self, person_ids):
+        """Remove the rows of person_ids, returns them as (vectors, ids)"""
+        ids = self.ids[:self.size]
+        mask = np.isin(ids, list(person_ids))
+        taken = self.vectors[:self.size][mask].copy(), ids[mask].copy()
+        keep = ~mask
+        remaining = int(keep.sum())
+        # Order-preserving compaction, workers only read up to the size they are sent
+        self.vectors[:remaining] = self.vectors[:self.size][keep]
+        self.sq_norms[:remaining] = self.sq_norms[:self.size][keep]
+        self.ids[:remaining] = ids[keep]
+        self.size = remaining
+        return taken
+
+    def close(self):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=2)
+        self.conn.close()
+        self._release()
+
+
+class ShardedGallery:
+    """FaceGallery-compatible matcher with one worker process per shard"""
+
+    def __init__(self, shards=None, partition='hash', capacity=1024, max_skew=0.25, min_rows=256):
+        if partition not in PARTITIONS:
+            raise ValueError(f"partition must be one of {PARTITIONS}")
+        self.partition = partition
+        self.max_skew = max_skew
+        self.min_rows = min_rows
+
+        self.people = {}
+        self.id_by_roll = {}
+        self._next_id = 0
+        self.group_of = {}        # person id -> group (department or hash bucket)
+        self.members = {}         # group -> set of person ids
+        self.group_rows = {}      # group -> rows
+        self.shard_of_group = {}  # group -> shard index
+        self.rebalances = 0
+
+        # Spawned workers import numpy afresh with single-threaded BLAS
+        ctx = multiprocessing.get_context('spawn')
+        saved = {name: os.environ.get(name) for name in THREAD_ENV}
+        os.environ.update({name: "1" for name in THREAD_ENV})
+        try:
+            self.shards = [_Shard(ctx, capacity) for _ in range(shards or os.cpu_count() or 1)]
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def from_registered_faces(cls, registered_faces, shards=None, partition='hash', **kwargs):
+        """Pack the groups onto shards first, then fill them without moves"""
+        shards = shards or os.cpu_count() or 1
+        total = sum(len(data['encodings']) for data in registered_faces.values())
+        gallery = cls(shards, partition, capacity=max(1024, 2 * total // shards), **kwargs)
+
+        sizes = {}
+        for roll_no, data in registered_faces.items():
+            group = gallery._group(roll_no, data)
+            sizes[group] = sizes.get(group, 0) + len(data['encodings'])
+        loads = [0] * shards
+        for group in sorted(sizes, key=sizes.get, reverse=True):
+            index = loads.index(min(loads))
+            gallery.shard_of_group[group] = index
+            loads[index] += sizes[group]
+
+        for roll_no, data in registered_faces.items():
+            gallery._add(roll_no, data)
+        return gallery
+
+    def _group(self, roll_no, data):
+        if self.partition == 'department':
+            return data.get('department') or 'N/A'
+        return zlib.crc32(str(roll_no).encode()) % HASH_BUCKETS
+
+    def __len__(self):
+        return sum(shard.size for shard in self.shards)
+
+    @property
+    def loads(self):
+        """Rows per shard"""
+        return [shard.size for shard in self.shards]
+
+    def _add(self, roll_no, data):
+        encodings = np.asarray(data['encodings'], dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        person_id = self._next_id
+        self._next_id += 1
+        self.people[person_id] = {
+            'roll_no': roll_no,
+            'name': data['name'],
+            'department': data.get('department', 'N/A')
+        }
+        self.id_by_roll[roll_no] = person_id
+
+        group = self._group(roll_no, data)
+        if group not in self.shard_of_group:
+            loads = self.loads
+            self.shard_of_group[group] = loads.index(min(loads))
+        self.group_of[person_id] = group
+        self.members.setdefault(group, set()).add(person_id)
+        self.group_rows[group] = self.group_rows.get(group, 0) + len(encodings)
+        self.shards[self.shard_of_group[group]].append(encodings, person_id)
+
+    def _remove(self, roll_no):
+        person_id = self.id_by_roll.pop(roll_no, None)
+        if person_id is None:
+            return
+        del self.people[person_id]
+        group = self.group_of.pop(person_id)
+        self.members[group].discard(person_id)
+        vectors, _ = self.shards[self.shard_of_group[group]].take([person_id])
+        self.group_rows[group] -= len(vectors)
+
+    def add_person(self, roll_no, data):
+        with self._lock:
+            self._remove(roll_no)
+            self._add(roll_no, data)
+            self._rebalance()
+
+    def remove_person(self, roll_no):
+        with self._lock:
+            self._remove(roll_no)
+            self._rebalance()
+
+    def _rebalance(self):
+        """Move groups from the fullest to the emptiest shard while skewed"""
+        moved = False
+        while True:
+            loads = self.loads
+            mean = sum(loads) / len(loads)
+            heavy, light = loads.index(max(loads)), loads.index(min(loads))
+            gap = loads[heavy] - loads[light]
+            if loads[heavy] - mean <= self.max_skew * mean or gap < self.min_rows:
+                break
+            # Any group smaller than the gap narrows it, the one closest to half evens it out
+            candidates = [g for g, index in self.shard_of_group.items()
+                          if index == heavy and 0 < self.group_rows.get(g, 0) < gap]
+            if not candidates:
+                break
+            group = min(candidates, key=lambda g: abs(self.group_rows[g] - gap / 2))
+            vectors, ids = self.shards[heavy].take(self.members[group])
+            for person_id in np.unique(ids):
+                self.shards[light].append(vectors[ids == person_id], int(person_id))
+            self.shard_of_group[group] = light
+            moved = True
+        if moved:
+            self.rebalances += 1
+
+    def search(self, queries, k=1):
+        """Top-k (person ids, distances) per query, merged over all shards"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        with self._lock:
+            active = [shard for shard in self.shards if shard.size]
+            # Scatter first so all shards scan at the same time, then gather
+            for shard in active:
+                shard.conn.send(('search', queries, shard.size, k))
+            parts = [shard.conn.recv() for shard in active]
+        if not parts:
+            return (np.full((len(queries), 0), -1, dtype=np.int32),
+                    np.empty((len(queries), 0), dtype=np.float32))
+        ids = np.concatenate([p[0] for p in parts], axis=1)
+        dist = np.concatenate([p[1] for p in parts], axis=1)
+        order = np.argsort(dist, axis=1)[:, :k]
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(dist, order, axis=1)
+
+    def match_many(self, encodings, tolerance=0.6):
+        """Best match per query as a list of (person, distance)"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(self) == 0 or len(queries) == 0:
+            return [(None, float('inf')) for _ in range(len(queries))]
+        ids, dist = self.search(queries, k=1)
+        results = []
+        for person_id, distance in zip(ids[:, 0], dist[:, 0]):
+            distance = float(distance)
+            person = self.people.get(int(person_id))
+            results.append((person if distance <= tolerance else None, distance))
+        return results
+
+    def match(self, encoding, tolerance=0.6):
+        """Best match for one encoding as (person, distance)"""
+        return self.match_many([encoding], tolerance)[0]
+
+    def to_arrays(self):
+        """Compact picklable copy: (vectors, ids, people)"""
+        with self._lock:
+            vectors = np.concatenate([shard.vectors[:shard.size] for shard in self.shards])
+            ids = np.concatenate([shard.ids[:shard.size] for shard in self.shards])
+        return vectors, ids, dict(self.people)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self._closed:
+            return
+        self._closed = True
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,222 @@
+"""Frame sources: live cameras, session recordings and their replay
+
+Every source reads like cv2.VideoCapture (read() -> (ok, frame), grab(),
+release(), isOpened()), so the verification pipeline, multi-camera feeds and
+registration take any of them unchanged.
+
+A recording (.frec) is one file of JPEG frames with their capture times:
+
+    b"FREC1\n"
+    per frame: <float64 timestamp> <uint32 size> <size bytes of JPEG>
+
+ReplaySource feeds a recording back at its original pace, at a fixed frame
+rate or as fast as frames can be decoded, so the whole loop can be timed on
+a machine without a webcam.
+"""
+import struct
+import time
+
+import cv2
+import numpy as np
+
+MAGIC = b"FREC1\n"
+RECORDING_EXT = ".frec"
+_FRAME = struct.Struct("<dI")
+REPLAY_SPEEDS = ('original', 'fast')
+
+
+def is_recording(source):
+    return isinstance(source, str) and source.endswith(RECORDING_EXT)
+
+
+def parse_speed(text):
+    """'original', 'fast' or a frame rate such as '15'"""
+    if text in REPLAY_SPEEDS:
+        return text
+    try:
+        fps = float(text)
+    except ValueError:
+        raise ValueError(f"replay speed must be {' or '.join(REPLAY_SPEEDS)} or frames per second")
+    if fps <= 0:
+        raise ValueError("replay frame rate must be positive")
+    return fps
+
+
+class CameraSource:
+    """Device index, RTSP/HTTP URL or video file through OpenCV"""
+
+    def __init__(self, source):
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if isinstance(source, int):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+            # Fewer stale frames queued while the motion gate sleeps (not every backend honours it)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.timestamp = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        self.timestamp = time.time()
+        return ret, frame
+
+    def grab(self):
+        ret = self.cap.grab()
+        self.timestamp = time.time()
+        return ret
+
+    def release(self):
+        self.cap.release()
+
+
+class Recorder:
+    """Pass frames through from another source and append them to a recording
+
+    An existing recording is extended, so sessions restarted by the daemon
+    end up in one file (replay skips the gaps between them).
+    """
+
+    def __init__(self, source, path, quality=90):
+        self.source = source
+        self.path = path
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            with open(path, 'rb') as existing:
+                if existing.read(len(MAGIC)) != MAGIC:
+                    self.file.close()
+                    raise ValueError(f"{path}: exists and is not a frame recording")
+        self.frames = 0
+        self.bytes = self.file.tell()
+
+    @property
+    def timestamp(self):
+        return self.source.timestamp
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def read(self):
+        ret, frame = self.source.read()
+        if ret and self.file is not None:
+            ok, jpeg = cv2.imencode(".jpg", frame, self.params)
+            if ok:
+                stamp = self.source.timestamp if self.source.timestamp is not None else time.time()
+                self.file.write(_FRAME.pack(stamp, len(jpeg)))
+                self.file.write(jpeg.tobytes())
+                self.frames += 1
+                self.bytes += _FRAME.size + len(jpeg)
+        return ret, frame
+
+    def grab(self):
+        """Skipped frame, not recorded (the motion gate drains them while idle)"""
+        grab = getattr(self.source, 'grab', None)
+        return grab() if grab is not None else self.source.read()[0]
+
+    def release(self):
+        self.source.release()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def describe(self):
+        return f"{self.frames} frames, {self.bytes / 1e6:.1f} MB → {self.path}"
+
+
+class ReplaySource:
+    """Frames of a recording, paced like the original, at `speed` fps or unpaced
+
+    At original speed a jump of more than `max_gap` seconds between frames
+    (the next session appended to the file, or a clock change) is not slept
+    through: pacing restarts from that frame.
+    """
+
+    def __init__(self, path, speed='original', loop=False, max_gap=5.0):
+        self.path = path
+        self.speed = parse_speed(speed) if isinstance(speed, str) else speed
+        self.loop = loop
+        self.max_gap = max_gap
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path}: not a frame recording")
+        self.frames = 0
+        self.timestamp = None
+        self._first_stamp = None
+        self._started = None
+        self._index = 0
+
+    def isOpened(self):
+        return self.file is not None
+
+    def _next(self):
+        """(timestamp, JPEG bytes) of the next frame, None at the end"""
+        header = self.file.read(_FRAME.size)
+        if len(header) < _FRAME.size and self.loop and self.frames:
+            self.file.seek(len(MAGIC))
+            self._first_stamp = None
+            header = self.file.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return None
+        stamp, size = _FRAME.unpack(header)
+        data = self.file.read(size)
+        if len(data) < size:
+            return None  # recording cut off mid-frame
+        return stamp, data
+
+    def _advance(self):
+        """JPEG bytes of the next frame once it is due, None at the end"""
+        if self.file is None:
+            return None
+        item = self._next()
+        if item is None:
+            return None
+        stamp, data = item
+
+        now = time.time()
+        gap = stamp - self.timestamp if self.timestamp is not None else 0.0
+        if self._first_stamp is None or (self.speed == 'original' and not 0 <= gap <= self.max_gap):
+            self._first_stamp, self._started, self._index = stamp, now, 0
+        if self.speed == 'original':
+            due = self._started + (stamp - self._first_stamp)
+        elif self.speed == 'fast':
+            due = now
+        else:
+            due = self._started + self._index / self.speed
+        if due > now:
+            time.sleep(due - now)
+
+        self._index += 1
+        self.frames += 1
+        self.timestamp = stamp
+        return data
+
+    def read(self):
+        data = self._advance()
+        if data is None:
+            return False, None
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def grab(self):
+        """Step over the next frame (paced like read()) without decoding it"""
+        return self._advance() is not None
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def open_source(source, speed='original'):
+    """Replay for .frec recordings, OpenCV capture for everything else"""
+    if is_recording(source):
+        return ReplaySource(source, speed)
+    return CameraSource(source)
@@ -0,0 +1,167 @@
+"""Transactional face database (SQLite in WAL mode)
+
+People and their encodings are stored as rows, so an attendance check-in
+is a single small UPDATE instead of re-pickling the whole database. An
+existing face_encodings.pkl is migrated automatically on first start.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    roll_no TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    department TEXT,
+    registered_date TEXT,
+    last_attendance TEXT,
+    total_attendance INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS encodings (
+    roll_no TEXT NOT NULL REFERENCES people(roll_no) ON DELETE CASCADE,
+    sample INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (roll_no, sample)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('encodings_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', abs(random()));
+"""
+
+
+class FaceStore:
+    """Row-level storage for registered faces"""
+
+    def __init__(self, db_path, legacy_pickle=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+        if legacy_pickle and os.path.exists(legacy_pickle):
+            self.migrate_pickle(legacy_pickle)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM people").fetchone()[0]
+
+    def migrate_pickle(self, pickle_path):
+        """Import a legacy face_encodings.pkl once, then rename it"""
+        with open(pickle_path, 'rb') as f:
+            registered_faces = pickle.load(f)
+
+        if self.count() == 0:
+            self.save_all(registered_faces)
+            print(f"📦 Migrated {len(registered_faces)} users from {pickle_path}")
+        os.replace(pickle_path, pickle_path + ".migrated")
+
+    def encodings_version(self):
+        """'<database id>-<counter>', changes with every change to people or encodings
+
+        Check-ins do not change it. The random database id keeps files derived
+        from a deleted and recreated database from looking current.
+        """
+        with self._lock:
+            meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        return f"{meta['database_id']:x}-{meta['encodings_version']}"
+
+    def _bump_version(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'encodings_version'")
+
+    def load_all(self, encodings=True):
+        """Load everything as the registered_faces dict
+
+        With encodings=False the 'encodings' lists stay empty, for callers that
+        get the vectors from the compact gallery files instead.
+        """
+        with self._lock:
+            people = self.conn.execute(
+                "SELECT roll_no, name, department, registered_date, last_attendance, "
+                "total_attendance FROM people").fetchall()
+            rows = self.conn.execute(
+                "SELECT roll_no, vector FROM encodings ORDER BY roll_no, sample").fetchall() \
+                if encodings else []
+
+        registered_faces = {}
+        for roll_no, name, department, registered_date, last_attendance, total in people:
+            registered_faces[roll_no] = {
+                'name': name,
+                'roll_no': roll_no,
+                'department': department,
+                'encodings': [],
+                'registered_date': registered_date,
+                'last_attendance': last_attendance,
+                'total_attendance': total
+            }
+        for roll_no, blob in rows:
+            if roll_no in registered_faces:
+                registered_faces[roll_no]['encodings'].append(np.frombuffer(blob, dtype=np.float64).copy())
+        return registered_faces
+
+    def _insert_person(self, roll_no, data):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO people (roll_no, name, department, registered_date, "
+            "last_attendance, total_attendance) VALUES (?, ?, ?, ?, ?, ?)",
+            (roll_no, data['name'], data.get('department'), data.get('registered_date'),
+             data.get('last_attendance'), data.get('total_attendance', 0)))
+        self.conn.execute("DELETE FROM encodings WHERE roll_no = ?", (roll_no,))
+        self.conn.executemany(
+            "INSERT INTO encodings (roll_no, sample, vector) VALUES (?, ?, ?)",
+            [(roll_no, i, np.asarray(encoding, dtype=np.float64).tobytes())
+             for i, encoding in enumerate(data['encodings'])])
+
+    def save_person(self, roll_no, data):
+        """Insert or replace one person with their encodings"""
+        with self._lock, self.conn:
+            self._insert_person(roll_no, data)
+            self._bump_version()
+
+    def save_people(self, people):
+        """Insert or replace many (roll_no, data) pairs in one transaction"""
+        with self._lock, self.conn:
+            for roll_no, data in people:
+                self._insert_person(roll_no, data)
+            self._bump_version()
+
+    def save_all(self, registered_faces):
+        """Replace the whole database in one transaction"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM encodings")
+            self.conn.execute("DELETE FROM people")
+            for roll_no, data in registered_faces.items():
+                self._insert_person(roll_no, data)
+            self._bump_version()
+
+    def delete_person(self, roll_no):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM people WHERE roll_no = ?", (roll_no,))
+            self._bump_version()
+
+    def record_attendance(self, roll_no, timestamp):
+        """Small row update for one check-in (last_attendance never moves back)"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE people SET last_attendance = MAX(COALESCE(last_attendance, ''), ?), "
+                "total_attendance = total_attendance + 1 "
+                "WHERE roll_no = ?", (timestamp, roll_no))
+
+    def record_attendances(self, rows):
+        """Many (roll_no, timestamp) check-ins in one transaction"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE people SET last_attendance = MAX(COALESCE(last_attendance, ''), ?), "
+                "total_attendance = total_attendance + 1 "
+                "WHERE roll_no = ?", [(timestamp, roll_no) for roll_no, timestamp in rows])
@@ -0,0 +1,243 @@
+"""Unit tests for the pieces the benchmark times
+
+    python -m pytest -q test_units.py
+"""
+import os
+import time
+
+import numpy as np
+import pytest
+
+from attendance_index import split_range
+from attendance_writer import AttendanceWriter
+from compact_gallery import CompactGallery
+from cooldown import Cooldowns
+from gallery import ENCODING_SIZE, FaceGallery, make_synthetic_faces
+from metrics import MetricsRegistry
+from storage import FaceStore
+from tracker import FrameOrder
+
+
+@pytest.fixture(scope="module")
+def faces():
+    return make_synthetic_faces(300)
+
+
+@pytest.fixture(scope="module")
+def queries(faces):
+    """Noisy samples of registered people, then vectors far from everyone"""
+    rng = np.random.default_rng(1)
+    known = [data['encodings'][0] + rng.normal(0, 0.01, ENCODING_SIZE)
+             for data in list(faces.values())[:40]]
+    unknown = list(rng.normal(0.5, 0.06, (10, ENCODING_SIZE)))
+    return np.asarray(known + unknown, dtype=np.float32)
+
+
+def _roll_nos(matches):
+    return [person['roll_no'] if person is not None else None for person, _ in matches]
+
+
+def test_exact_gallery_finds_registered_people(faces, queries):
+    matches = FaceGallery.from_registered_faces(faces).match_many(queries)
+    assert _roll_nos(matches) == list(faces)[:40] + [None] * 10
+
+
+def test_ivf_compact_and_sharded_agree_with_exact(faces, queries, tmp_path):
+    expected = _roll_nos(FaceGallery.from_registered_faces(faces).match_many(queries))
+
+    ivf = FaceGallery.from_registered_faces(faces)
+    ivf.enable_ann(nprobe=64)
+    assert _roll_nos(ivf.match_many(queries)) == expected
+
+    compact = CompactGallery.build(str(tmp_path), faces, "test-1")
+    assert len(compact) == len(ivf)
+    assert _roll_nos(compact.match_many(queries)) == expected
+
+    from sharded_gallery import ShardedGallery
+    sharded = ShardedGallery.from_registered_faces(faces, shards=2)
+    try:
+        assert _roll_nos(sharded.match_many(queries)) == expected
+    finally:
+        sharded.close()
+
+
+def test_compact_gallery_reopens_with_delta(faces, queries, tmp_path):
+    directory = str(tmp_path)
+    compact = CompactGallery.build(directory, faces, "test-1")
+    first, second = list(faces)[:2]
+    compact.remove_person(first)
+    compact.add_person("NEW", dict(faces[second], roll_no="NEW", name="New"))
+    compact.save("test-2")
+
+    assert CompactGallery.open(directory, "test-1") is None
+    reopened = CompactGallery.open(directory, "test-2")
+    names = _roll_nos(reopened.match_many(queries[:2]))
+    assert names[0] is None
+    assert names[1] in (second, "NEW")
+    assert len(reopened) == len(compact)
+
+
+def test_cooldowns_expire_and_stay_bounded():
+    cooldowns = Cooldowns(ttl=3, max_keys=2)
+    cooldowns.touch("a", 100.0)
+    assert cooldowns.since("a", 101.0) == 1.0
+    assert cooldowns.since("a", 104.0) == float('inf')
+    assert cooldowns.since("b", 101.0) == float('inf')
+
+    cooldowns.touch("b", 101.0)
+    cooldowns.touch("c", 101.5)
+    assert len(cooldowns) == 2
+    assert cooldowns.since("a", 101.5) == float('inf')
+    cooldowns.touch("d", 110.0)
+    assert len(cooldowns) == 1
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FaceStore(str(tmp_path / "faces.db"))
+    store.save_all({"R1": {'name': "One", 'encodings': []}})
+    yield store
+    store.close()
+
+
+def test_attendance_writer_writes_lines_and_rows(store, tmp_path):
+    writer = AttendanceWriter(store)
+    log_file = str(tmp_path / "attendance_2024-01-01.txt")
+    writer.append(log_file, "2024-01-01 09:00:00 | R1 | One | 80.00%\n", "R1", "2024-01-01 09:00:00")
+    writer.append(log_file, "2024-01-01 09:00:01 | X9 | Guest | 70.00%\n")
+    writer.flush()
+
+    with open(log_file) as f:
+        assert [line.split(" | ")[1] for line in f] == ["R1", "X9"]
+    person = store.load_all(encodings=False)["R1"]
+    assert person['total_attendance'] == 1
+    assert person['last_attendance'] == "2024-01-01 09:00:00"
+
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.append(log_file, "late\n")
+
+
+def test_attendance_writer_gives_up_on_a_broken_database(store, tmp_path):
+    def broken(rows):
+        raise OSError("disk full")
+    store.record_attendances = broken
+    writer = AttendanceWriter(store, max_attempts=2)
+    log_file = str(tmp_path / "attendance_2024-01-01.txt")
+    writer.append(log_file, "2024-01-01 09:00:00 | R1 | One | 80.00%\n", "R1", "2024-01-01 09:00:00")
+    deadline = time.time() + 10
+    while writer.lost == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    writer.close()
+
+    assert writer.lost == 1
+    with open(log_file) as f:
+        assert len(f.readlines()) == 1  # not duplicated by the retries
+
+
+def test_split_range_months_and_raw_days():
+    assert split_range("2024-01-01", "2024-03-31") == (["2024-01", "2024-02", "2024-03"], [])
+    assert split_range("2024-01-15", "2024-03-10") == (
+        ["2024-02"], [("2024-01-15", "2024-01-31"), ("2024-03-01", "2024-03-10")])
+    assert split_range("2024-12-05", "2025-01-31") == (["2025-01"], [("2024-12-05", "2024-12-31")])
+    assert split_range("2024-02-03", "2024-02-20") == ([], [("2024-02-03", "2024-02-20")])
+
+
+def test_recording_round_trip(tmp_path):
+    from sources import Recorder, ReplaySource
+
+    class Frames:
+        """Stand-in capture: flat grey frames with fixed timestamps"""
+        timestamp = None
+
+        def __init__(self, count):
+            self.count = count
+            self.index = 0
+
+        def isOpened(self):
+            return True
+
+        def read(self):
+            if self.index == self.count:
+                return False, None
+            self.index += 1
+            self.timestamp = 1000.0 + self.index * 0.1
+            return True, np.full((48, 64, 3), self.index * 20, dtype=np.uint8)
+
+        def release(self):
+            pass
+
+    path = str(tmp_path / "session.frec")
+    for session in range(2):  # a restarted session is appended to the same file
+        recorder = Recorder(Frames(5), path)
+        while recorder.read()[0]:
+            pass
+        recorder.release()
+        assert recorder.frames == 5
+
+    replay = ReplaySource(path, speed='fast')
+    frames, stamps = [], []
+    while True:
+        ok, frame = replay.read()
+        if not ok:
+            break
+        frames.append(frame)
+        stamps.append(replay.timestamp)
+    replay.release()
+
+    assert len(frames) == 10
+    assert stamps[:5] == pytest.approx([1000.1, 1000.2, 1000.3, 1000.4, 1000.5])
+    assert [int(frame.mean()) for frame in frames[:5]] == pytest.approx([20, 40, 60, 80, 100], abs=2)
+    assert frames[0].shape == (48, 64, 3)
+
+    with open(os.path.join(tmp_path, "other.frec"), 'wb') as f:
+        f.write(b"not a recording")
+    with pytest.raises(ValueError):
+        ReplaySource(str(tmp_path / "other.frec"))
+
+
+class _OrderedSystem:
+    """Just what VerificationPipeline needs: verify_faces gated by the frame order"""
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+        self.tracker = type('Tracker', (), {'order': FrameOrder()})()
+        self.frame_order = FrameOrder()
+        self.admitted = 0
+
+    def verify_faces(self, rgb_frame, captured_at=None, seq=None):
+        order = self.tracker.order
+        with order.lock:
+            if not order.admit(seq):
+                return None
+            self.admitted += 1
+        return []
+
+
+class _Frames:
+    """`count` black frames, then the end of the stream"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def read(self):
+        if self.count == 0:
+            return False, None
+        self.count -= 1
+        time.sleep(0.002)
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def test_second_verification_session_is_not_stale():
+    from pipeline import VerificationPipeline
+
+    system = _OrderedSystem()
+    for session in range(2):
+        admitted = system.admitted
+        pipeline = VerificationPipeline(system, _Frames(100), workers=1, flip=False)
+        pipeline.start()
+        assert pipeline.capture_ended.wait(10)
+        time.sleep(0.2)
+        pipeline.stop()
+        assert system.admitted > admitted, f"session {session} dropped every frame"
+    assert system.tracker.order.stale == 0
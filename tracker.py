@@ -0,0 +1,188 @@
+"""Lightweight IoU/centroid face tracker
+
+Boxes use the face_recognition (top, right, bottom, left) order. A track
+keeps its identity between frames so the 128-d encoder and the gallery
+match only run for new tracks or when the re-verify interval expires.
+"""
+import itertools
+import threading
+import time
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top = max(a[0], b[0])
+    right = min(a[1], b[1])
+    bottom = min(a[2], b[2])
+    left = max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def box_center(box):
+    top, right, bottom, left = box
+    return (left + right) / 2.0, (top + bottom) / 2.0
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.created = now
+        self.last_seen = now
+        self.missed = 0
+
+        # Identity attached to the track
+        self.person = None
+        self.distance = None
+        self.last_verified = None
+
+        # Per-track attendance cooldown and last display info
+        self.last_action_time = None
+        self.info = None
+
+        # Capture time of the first frame the face was in, for time-to-attendance
+        self.first_frame_at = None
+
+    def assign(self, person, distance, now):
+        """Attach (or refresh) the recognised identity"""
+        if self.person is None or person is None or person['roll_no'] != self.person['roll_no']:
+            # Identity changed, forget cached display info
+            self.last_action_time = None
+            self.info = None
+        self.person = person
+        self.distance = distance
+        self.last_verified = now
+
+
+class FrameOrder:
+    """Runs the stateful stages of one camera (detection, tracking) a frame at a time
+
+    Recognition workers finish frames out of order. A frame older than the
+    last one applied is dropped instead of moving tracks back to stale boxes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_seq = -1
+        self.stale = 0
+
+    def admit(self, seq):
+        """Call with the lock held, False for a frame older than the last one"""
+        if seq is None:
+            return True
+        if seq <= self.last_seq:
+            self.stale += 1
+            return False
+        self.last_seq = seq
+        return True
+
+    def reset(self):
+        """Start a new session, whose frame numbers start again at 0"""
+        with self.lock:
+            self.last_seq = -1
+
+
+class FaceTracker:
+    """Greedy IoU tracker with centroid fallback for fast movement"""
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, max_age=2.0,
+                 reverify_interval=5.0, unknown_reverify_interval=1.0):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.unknown_reverify_interval = unknown_reverify_interval
+
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Detection + update of this tracker's camera, in capture order
+        self.order = FrameOrder()
+
+        # Counters to check how much encoder work is saved
+        self.faces_seen = 0
+        self.encodings_run = 0
+
+    def _match_score(self, track, box):
+        iou = box_iou(track.box, box)
+        if iou >= self.iou_threshold:
+            return 1.0 + iou
+
+        # Centroid fallback: moved less than half a face width
+        tx, ty = box_center(track.box)
+        bx, by = box_center(box)
+        width = max(track.box[1] - track.box[3], 1)
+        shift = ((tx - bx) ** 2 + (ty - by) ** 2) ** 0.5
+        if shift < 0.5 * width:
+            return 1.0 - shift / width
+        return 0.0
+
+    def update(self, boxes, now=None):
+        """Associate boxes with tracks, returns one track per box (same order)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            pairs = []
+            for track in self.tracks.values():
+                for i, box in enumerate(boxes):
+                    score = self._match_score(track, box)
+                    if score > 0:
+                        pairs.append((score, track.id, i))
+            pairs.sort(reverse=True)
+
+            assigned = [None] * len(boxes)
+            used_tracks = set()
+            for score, track_id, i in pairs:
+                if assigned[i] is not None or track_id in used_tracks:
+                    continue
+                track = self.tracks[track_id]
+                track.box = boxes[i]
+                track.last_seen = now
+                track.missed = 0
+                assigned[i] = track
+                used_tracks.add(track_id)
+
+            # Age out tracks that were not seen
+            for track_id in list(self.tracks):
+                if track_id in used_tracks:
+                    continue
+                track = self.tracks[track_id]
+                track.missed += 1
+                if track.missed > self.max_missed or now - track.last_seen > self.max_age:
+                    del self.tracks[track_id]
+
+            # New tracks for unmatched boxes
+            for i, box in enumerate(boxes):
+                if assigned[i] is None:
+                    track = Track(next(self._ids), box, now)
+                    self.tracks[track.id] = track
+                    assigned[i] = track
+
+            self.faces_seen += len(boxes)
+            return assigned
+
+    def needs_encoding(self, track, now=None):
+        """True for new tracks and tracks due for re-verification"""
+        now = now if now is not None else time.time()
+        if track.last_verified is None:
+            return True
+        interval = self.reverify_interval if track.person is not None \
+            else self.unknown_reverify_interval
+        return now - track.last_verified >= interval
+
+    def record_encodings(self, count):
+        with self._lock:
+            self.encodings_run += count
+
+    @property
+    def encoder_savings(self):
+        """Fraction of detected faces that reused a tracked identity"""
+        if self.faces_seen == 0:
+            return 0.0
+        return 1.0 - self.encodings_run / self.faces_seen